@@ -7,3 +7,7 @@ class MaykinCommonConfig(AppConfig):
     def ready(self):
         from . import checks  # noqa
         from . import settings  # noqa
+        from .client_ip import get_resolver
+
+        # parse the trusted proxy networks once, at startup
+        get_resolver()
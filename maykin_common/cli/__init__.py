@@ -0,0 +1,45 @@
+"""
+Command line companion to the ``maykin-common`` Django utilities.
+
+The command line script is deliberately written in pure Python without loading Django
+at all (for performance), as opposed to providing Django management commands. Large
+Django projects may see slow startup times in the order of 2-10s due to (expensive)
+imports when loading all the code. This pairs very badly with health checks machinery
+which tend to have timeouts of a couple of seconds.
+
+The ``health-check`` command is typically run as a probe, in a new interpreter every few
+seconds. :func:`main` runs it with the standard library only, and only imports the
+command line framework (:mod:`maykin_common.cli.commands`) for the other commands and
+for ``--help``.
+"""
+
+import sys
+from collections.abc import Sequence
+
+__all__ = ["app", "main"]
+
+
+def main(args: Sequence[str] | None = None) -> None:
+    """
+    Entry point of the ``maykin-common`` script.
+    """
+    if args is None:
+        args = sys.argv[1:]
+
+    if args[:1] == ["health-check"]:
+        from .health_check import run
+
+        if (exit_code := run(args[1:])) is not None:
+            sys.exit(exit_code)
+
+    from .commands import app
+
+    app(args=list(args))
+
+
+def __getattr__(name: str):
+    if name == "app":
+        from .commands import app
+
+        return app
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -1,28 +1,30 @@
 """
-Command line companion to the ``maykin-common`` Django utilities.
+Commands of the ``maykin-common`` command line script, built with typer.
 
-The command line script is deliberately written in pure Python without loading Django
-at all (for performance), as opposed to providing Django management commands. Large
-Django projects may see slow startup times in the order of 2-10s due to (expensive)
-imports when loading all the code. This pairs very badly with health checks machinery
-which tend to have timeouts of a couple of seconds.
+Import this module lazily - see :mod:`maykin_common.cli`.
 """
 
+import http.client
 import importlib.metadata
+import json
 import socket
 import time
 from pathlib import Path
-from typing import Annotated
-from urllib.parse import urlparse, urlunparse
+from typing import TYPE_CHECKING, Annotated
 
-import requests
 import typer
 
+from . import health_check as http_health_check
+
+if TYPE_CHECKING:
+    from maykin_common.health_checks.celery.lag import LagSummary
+
 app = typer.Typer()
 
 _WORKER_EXIT_CODE_EVENT_LOOP_BROKEN = 1
 _WORKER_EXIT_CODE_PING_FAILURE = 2
 _WORKER_EXIT_CODE_NOT_READY = 4
+_WORKER_EXIT_CODE_EVENT_LOOP_LAGGING = 8
 
 
 @app.command()
@@ -36,11 +38,11 @@ def health_check(
     endpoint: Annotated[
         str,
         typer.Option(help="Endpoint/path to test for connection and status code."),
-    ] = "/_healthz/livez/",
+    ] = http_health_check.DEFAULT_ENDPOINT,
     timeout: Annotated[
         int,
         typer.Option(help="Timeout for the GET request (in seconds)."),
-    ] = 3,
+    ] = http_health_check.DEFAULT_TIMEOUT,
 ):
     """
     Execute an HTTP health check call against the provided endpoint.
@@ -48,40 +50,8 @@ def health_check(
     If no host or domain is provided with the ``endpoint`` option, a default of
     ``http://localhost:8000`` will be used.
     """
-
-    # URLs must start with a scheme, otherwise urlparse chokes :-)
-    if not (endpoint.startswith("http://") or endpoint.startswith("https://")):
-        endpoint = f"http://{endpoint}"
-
-    parsed = urlparse(endpoint)
-    normalized_url = urlunparse(
-        (
-            parsed.scheme,
-            parsed.netloc or "localhost:8000",
-            parsed.path or "/_healthz/livez/",
-            parsed.params,
-            parsed.query,
-            parsed.fragment,
-        )
-    )
-
-    try:
-        response = requests.get(normalized_url, timeout=timeout)
-    except requests.RequestException as exc:
-        typer.secho(f"DOWN ({exc.__class__.__name__})", fg=typer.colors.RED, err=True)
-        exit(1)
-
-    if up := response.ok:
-        typer.secho(
-            f"UP, response status code: {response.status_code}",
-            fg=typer.colors.GREEN,
-        )
-    else:
-        typer.secho(
-            f"DOWN, response status code: {response.status_code}",
-            fg=typer.colors.RED,
-            err=True,
-        )
+    up, message = http_health_check.check(endpoint, timeout=timeout)
+    typer.secho(message, fg=typer.colors.GREEN if up else typer.colors.RED, err=not up)
 
     exit_code = 0 if up else 1
     exit(exit_code)
@@ -105,6 +75,14 @@ def worker_health_check(
             "'MKN_HEALTH_CHECKS_WORKER_EVENT_LOOP_PROBE_FREQUENCY_SECONDS' setting."
         ),
     ] = 60 + 10,
+    max_lag: Annotated[
+        float | None,
+        typer.Option(
+            help="How late the timers of the event loop may fire, in seconds: the "
+            "median lag measured by the `EventLoopProbe` since its last update of the "
+            "liveness file. Not checked by default."
+        ),
+    ] = None,
     skip_event_loop_liveness: Annotated[
         bool,
         typer.Option(
@@ -142,6 +120,15 @@ def worker_health_check(
     skip_readiness: Annotated[
         bool, typer.Option(help="Opt-in to the readiness check.")
     ] = True,
+    # in-process status
+    status_socket: Annotated[
+        Path | None,
+        typer.Option(
+            help="The Unix socket of the worker status server, should match the "
+            "'MKN_HEALTH_CHECKS_WORKER_STATUS_SOCKET' setting. When provided, all "
+            "checks use the status reported by the worker in a single request."
+        ),
+    ] = None,
 ):
     """
     Run health checks for the Celery worker.
@@ -152,7 +139,8 @@ def worker_health_check(
 
     * Check the `liveness-file` to detect issues in the worker event loop. If the event
       loop is broken, the worker will definitely not be processing tasks and a restart
-      is necessary.
+      is necessary. With `max-lag`, a sluggish event loop is detected too, before it
+      stops completely.
     * Ping the worker using Celery's inspection machinery. Pinging verifies the broker
       connection, as it performs a complete roundtrip. Broker connection loss can
       sometimes be solved by restarting the worker.
@@ -160,8 +148,25 @@ def worker_health_check(
       indicates the worker is not (yet) ready to process tasks. It may have been stopped
       or is still starting up.
 
+    With `status-socket`, the same checks are answered by the worker main process
+    itself: the age of the last event loop tick, the broker connection of the consumer
+    (instead of the ping) and the readiness. This avoids loading Celery and a roundtrip
+    through the broker.
+
     If any check fails, the command exist with a non-zero exit code.
     """
+    if status_socket is not None:
+        exit(
+            _check_worker_status(
+                status_socket,
+                timeout=ping_timeout,
+                max_age=None if skip_event_loop_liveness else max_age,
+                max_lag=None if skip_event_loop_liveness else max_lag,
+                check_connection=not skip_ping,
+                check_readiness=not skip_readiness,
+            )
+        )
+
     # always instantiate an app as a sanity check
     try:
         from celery import Celery
@@ -201,6 +206,11 @@ def worker_health_check(
                 fg=typer.colors.GREEN,
             )
 
+        if max_lag is not None and not _check_lag(
+            _read_lag(liveness_file), max_lag=max_lag
+        ):
+            exit(_WORKER_EXIT_CODE_EVENT_LOOP_LAGGING)
+
     if not skip_ping:
         replies = celery_app.control.ping(
             destination=[worker_name], timeout=ping_timeout
@@ -232,6 +242,96 @@ def worker_health_check(
     exit(0)
 
 
+def _check_worker_status(
+    status_socket: Path,
+    *,
+    timeout: int,
+    max_age: int | None,
+    max_lag: float | None,
+    check_connection: bool,
+    check_readiness: bool,
+) -> int:
+    from .worker_status import get_worker_status
+
+    try:
+        status = get_worker_status(status_socket, timeout=timeout)
+    except (OSError, http.client.HTTPException, ValueError) as exc:
+        # the main process does not respond
+        typer.secho(
+            f"Could not get the worker status from '{status_socket}' "
+            f"({exc.__class__.__name__}).",
+            fg=typer.colors.RED,
+            err=True,
+        )
+        return _WORKER_EXIT_CODE_EVENT_LOOP_BROKEN
+
+    if max_age is not None:
+        if status["event_loop"]["age"] > max_age:
+            typer.secho(
+                "The last event loop tick is older than max-age.",
+                fg=typer.colors.RED,
+                err=True,
+            )
+            return _WORKER_EXIT_CODE_EVENT_LOOP_BROKEN
+        typer.secho("The event loop appears to be running.", fg=typer.colors.GREEN)
+
+    if max_lag is not None and not _check_lag(
+        status["event_loop"]["lag"], max_lag=max_lag
+    ):
+        return _WORKER_EXIT_CODE_EVENT_LOOP_LAGGING
+
+    if check_connection:
+        consumer = status["consumer"]
+        if not consumer["connected"]:
+            typer.secho(
+                f"The worker is not connected to the broker (consumer "
+                f"{consumer['state']}).",
+                fg=typer.colors.RED,
+                err=True,
+            )
+            return _WORKER_EXIT_CODE_PING_FAILURE
+        typer.secho("The worker is connected to the broker.", fg=typer.colors.GREEN)
+
+    if check_readiness:
+        if not status["ready"]:
+            typer.secho(
+                "The worker is not ready.",
+                fg=typer.colors.RED,
+                err=True,
+            )
+            return _WORKER_EXIT_CODE_NOT_READY
+        typer.secho(
+            "The worker appears ready to process tasks.",
+            fg=typer.colors.GREEN,
+        )
+
+    return 0
+
+
+def _read_lag(liveness_file: Path) -> "LagSummary | None":
+    try:
+        return json.loads(liveness_file.read_text())["lag"]
+    except (OSError, ValueError, KeyError, TypeError):
+        # written by a version without lag measurement, or while we read it
+        return None
+
+
+def _check_lag(lag: "LagSummary | None", *, max_lag: float) -> bool:
+    if lag is None or not lag["samples"]:
+        typer.secho("The event loop lag was not measured yet.", fg=typer.colors.YELLOW)
+        return True
+    if lag["p50"] > max_lag:
+        typer.secho(
+            f"The event loop lags {lag['p50']:g}s (max {lag['max']:g}s), more than "
+            "max-lag.",
+            fg=typer.colors.RED,
+            err=True,
+        )
+        return False
+    typer.secho(f"The event loop lags {lag['p50']:g}s.", fg=typer.colors.GREEN)
+    return True
+
+
 @app.command(name="beat-health-check")
 def beat_health_check(
     file: Annotated[
@@ -288,7 +388,3 @@ def beat_health_check(
             fg=typer.colors.GREEN,
         )
         exit(0)
-
-
-if __name__ == "__main__":  # pragma: no cover
-    app()
@@ -0,0 +1,116 @@
+"""
+HTTP health check of the ``health-check`` command, using the standard library only.
+"""
+
+import http.client
+import sys
+from collections.abc import Sequence
+from urllib.parse import urljoin, urlsplit, urlunsplit
+
+DEFAULT_ENDPOINT = "/_healthz/livez/"
+DEFAULT_TIMEOUT = 3
+# like a browser, but without the risk of looping for long
+MAX_REDIRECTS = 5
+REDIRECT_STATUSES = frozenset({301, 302, 303, 307, 308})
+
+
+def normalize_url(endpoint: str) -> str:
+    """
+    Complete ``endpoint`` to a full URL, on ``http://localhost:8000`` by default.
+    """
+    # URLs must start with a scheme, otherwise urlsplit chokes :-)
+    if not (endpoint.startswith("http://") or endpoint.startswith("https://")):
+        endpoint = f"http://{endpoint}"
+
+    parsed = urlsplit(endpoint)
+    return urlunsplit(
+        (
+            parsed.scheme,
+            parsed.netloc or "localhost:8000",
+            parsed.path or DEFAULT_ENDPOINT,
+            parsed.query,
+            parsed.fragment,
+        )
+    )
+
+
+def _get(url: str, timeout: float) -> tuple[int, str | None]:
+    parsed = urlsplit(url)
+    connection_class = (
+        http.client.HTTPSConnection
+        if parsed.scheme == "https"
+        else http.client.HTTPConnection
+    )
+    connection = connection_class(parsed.netloc, timeout=timeout)
+    path = parsed.path or "/"
+    if parsed.query:
+        path = f"{path}?{parsed.query}"
+    try:
+        connection.request("GET", path, headers={"User-Agent": "maykin-common"})
+        response = connection.getresponse()
+        return response.status, response.getheader("Location")
+    finally:
+        connection.close()
+
+
+def get_status_code(
+    url: str, timeout: float, max_redirects: int = MAX_REDIRECTS
+) -> int:
+    """
+    Send a ``GET`` request to ``url`` and return the status code of the response.
+
+    Up to ``max_redirects`` redirects are followed, each with the full ``timeout``.
+    When there are more, or a redirect has no ``Location``, the redirect status code is
+    returned.
+
+    :raises OSError: The connection failed or timed out.
+    :raises http.client.HTTPException: The response is not valid HTTP.
+    """
+    for _ in range(max_redirects):
+        status_code, location = _get(url, timeout)
+        if status_code not in REDIRECT_STATUSES or not location:
+            return status_code
+        url = urljoin(url, location)
+    return _get(url, timeout)[0]
+
+
+def check(endpoint: str, timeout: float) -> tuple[bool, str]:
+    """
+    Check the health of ``endpoint``, return whether it is up and a status line.
+    """
+    try:
+        status_code = get_status_code(normalize_url(endpoint), timeout=timeout)
+    except (OSError, http.client.HTTPException) as exc:
+        return False, f"DOWN ({exc.__class__.__name__})"
+
+    # redirects are followed, one that is left means the endpoint can't be reached
+    if up := 200 <= status_code < 300:
+        return up, f"UP, response status code: {status_code}"
+    return up, f"DOWN, response status code: {status_code}"
+
+
+def run(args: Sequence[str]) -> int | None:
+    """
+    Run the ``health-check`` command with the command line ``args``.
+
+    Returns the exit code, or ``None`` when the arguments are not understood (e.g.
+    ``--help`` or invalid values), to let the command line framework handle them.
+    """
+    options = {"--endpoint": DEFAULT_ENDPOINT, "--timeout": str(DEFAULT_TIMEOUT)}
+    remaining = iter(args)
+    for arg in remaining:
+        name, has_value, value = arg.partition("=")
+        if name not in options:
+            return None
+        if not has_value and (value := next(remaining, None)) is None:
+            return None
+        options[name] = value
+
+    try:
+        timeout = int(options["--timeout"])
+    except ValueError:
+        return None
+
+    up, message = check(options["--endpoint"], timeout=timeout)
+    print(message, file=sys.stdout if up else sys.stderr)
+    return 0 if up else 1
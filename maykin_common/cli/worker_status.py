@@ -0,0 +1,44 @@
+"""
+Query the status server of a Celery worker, using the standard library only.
+
+See :mod:`maykin_common.health_checks.celery.status` for the server side.
+"""
+
+import http.client
+import json
+import socket
+from pathlib import Path
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from maykin_common.health_checks.celery.status import WorkerStatus
+
+
+class _UnixHTTPConnection(http.client.HTTPConnection):
+    def __init__(self, socket_path: Path, timeout: float):
+        super().__init__("localhost", timeout=timeout)
+        self.socket_path = socket_path
+
+    def connect(self):
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.settimeout(self.timeout)
+        self.sock.connect(str(self.socket_path))
+
+
+def get_worker_status(socket_path: Path, timeout: float) -> "WorkerStatus":
+    """
+    Fetch the status of the worker serving on the Unix socket ``socket_path``.
+
+    :raises OSError: The socket is absent or the worker did not respond in time.
+    :raises http.client.HTTPException: The response is not valid HTTP.
+    :raises ValueError: The response is not a valid status.
+    """
+    connection = _UnixHTTPConnection(socket_path, timeout=timeout)
+    try:
+        connection.request("GET", "/")
+        response = connection.getresponse()
+        if response.status != 200:
+            raise ValueError(f"Unexpected response status code {response.status}")
+        return json.loads(response.read())
+    finally:
+        connection.close()
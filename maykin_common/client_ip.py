@@ -0,0 +1,182 @@
+"""
+Resolve the IP address of the client that made a request.
+
+Behind one or more reverse proxies, ``REMOTE_ADDR`` holds the address of the nearest
+proxy rather than the client. The proxies record the address they received the request
+from in a header like ``X-Forwarded-For``, but anyone can send such a header, so it may
+only be trusted for the hops that are known proxies.
+
+The resolver in this module walks the configured headers right-to-left, skipping the
+addresses that belong to the trusted proxy networks, and returns the first address that
+is not a trusted proxy. As long as no trusted proxies are configured and django-axes is
+installed, the django-axes (django-ipware) configuration is used instead, like before
+the resolver existed. The trusted networks are parsed once per process (see
+:func:`get_resolver`), and the resolved address is cached on the request so that
+repeated lookups during a request-response cycle are free.
+
+Relevant settings:
+
+* :attr:`maykin_common.settings.MKN_CLIENT_IP_TRUSTED_PROXIES`
+* :attr:`maykin_common.settings.MKN_CLIENT_IP_HEADERS`
+* :attr:`maykin_common.settings.MKN_CLIENT_IP_FUNCTION`
+"""
+
+import functools
+import ipaddress
+from collections.abc import Callable, Iterable, Sequence
+
+from django.apps import apps
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+from django.http import HttpRequest
+from django.utils.module_loading import import_string
+
+from maykin_common.settings import get_setting
+
+__all__ = ["ClientIPResolver", "get_client_ip_address", "get_resolver"]
+
+type IPNetwork = ipaddress.IPv4Network | ipaddress.IPv6Network
+
+_REQUEST_CACHE_ATTRIBUTE = "_maykin_common_client_ip"
+
+
+@functools.lru_cache(maxsize=4096)
+def _parse_address(value: str) -> str | None:
+    """
+    Validate and normalize a single address as found in a header or ``REMOTE_ADDR``.
+
+    Parsing is relatively expensive compared to the rest of the resolution, and the
+    same addresses come by many times, so the outcome is memoized.
+    """
+    value = value.strip()
+    if not value:
+        return None
+    try:
+        return str(ipaddress.ip_address(value))
+    except ValueError:
+        return None
+
+
+class ClientIPResolver:
+    """
+    Determine the client IP address from the request metadata.
+
+    :param trusted_proxies: IP addresses or networks (in CIDR notation) of the reverse
+      proxies that are allowed to set the forwarding headers.
+    :param headers: The ``request.META`` keys to inspect, in order of preference, when
+      the request comes from a trusted proxy. Each header is expected to contain a
+      comma separated list of addresses, like ``X-Forwarded-For``.
+    """
+
+    def __init__(self, trusted_proxies: Iterable[str], headers: Sequence[str]):
+        self.trusted_networks: tuple[IPNetwork, ...] = tuple(
+            ipaddress.ip_network(cidr, strict=False) for cidr in trusted_proxies
+        )
+        self.headers = tuple(headers)
+        # The same handful of proxy addresses are checked over and over again, so
+        # remember the outcome rather than checking every network every time.
+        self.is_trusted = functools.lru_cache(maxsize=1024)(self._is_trusted)
+
+    def _is_trusted(self, address: str) -> bool:
+        ip = ipaddress.ip_address(address)
+        return any(ip in network for network in self.trusted_networks)
+
+    def _resolve_from_header(self, value: str) -> str | None:
+        """
+        Walk the comma separated addresses right-to-left and find the client.
+
+        The rightmost entry was added by the proxy closest to us. Every entry that is a
+        trusted proxy is skipped, the first untrusted entry is the client. If every
+        entry is trusted, the leftmost one is as close to the client as we can get.
+        """
+        end = len(value)
+        candidate: str | None = None
+        while end > 0:
+            start = value.rfind(",", 0, end) + 1
+            address = _parse_address(value[start:end])
+            if address is None:
+                # garbage in the header means we can't trust anything to the left of it
+                break
+            candidate = address
+            if not self.is_trusted(address):
+                break
+            end = start - 1
+        return candidate
+
+    def resolve(self, request: HttpRequest) -> str | None:
+        remote_addr = request.META.get("REMOTE_ADDR") or None
+        # without proxies, there is nothing to resolve - the WSGI/ASGI server provides
+        # the peer address
+        if remote_addr is None or not self.trusted_networks:
+            return remote_addr
+        if (remote_addr := _parse_address(remote_addr)) is None:
+            return None
+        if not self.is_trusted(remote_addr):
+            return remote_addr
+
+        for header in self.headers:
+            if not (value := request.META.get(header)):
+                continue
+            if (client_ip := self._resolve_from_header(value)) is not None:
+                return client_ip
+        return remote_addr
+
+
+@functools.cache
+def get_resolver() -> ClientIPResolver:
+    """
+    Build the resolver from the settings, once per process.
+    """
+    return ClientIPResolver(
+        trusted_proxies=get_setting("MKN_CLIENT_IP_TRUSTED_PROXIES"),
+        headers=get_setting("MKN_CLIENT_IP_HEADERS"),
+    )
+
+
+@functools.cache
+def _get_custom_function() -> Callable[[HttpRequest], str | None] | None:
+    if dotted_path := get_setting("MKN_CLIENT_IP_FUNCTION"):
+        return import_string(dotted_path)
+    # projects that relied on django-axes to resolve the address behind their proxies
+    # keep doing so until they configure the trusted proxies
+    if not get_setting("MKN_CLIENT_IP_TRUSTED_PROXIES") and apps.is_installed("axes"):
+        from axes.helpers import get_client_ip_address as get_axes_client_ip_address
+
+        return get_axes_client_ip_address
+    return None
+
+
+@receiver(setting_changed, dispatch_uid="maykin_common.client_ip._reset_resolver")
+def _reset_resolver(sender, setting: str, **kwargs):
+    # mostly for tests, settings *should* not change in production code
+    match setting:
+        case (
+            "MKN_CLIENT_IP_TRUSTED_PROXIES"
+            | "MKN_CLIENT_IP_HEADERS"
+            | "MKN_CLIENT_IP_FUNCTION"
+            | "INSTALLED_APPS"
+        ):
+            get_resolver.cache_clear()
+            _get_custom_function.cache_clear()
+        case _:  # pragma: no cover
+            pass
+
+
+def get_client_ip_address(request: HttpRequest) -> str | None:
+    """
+    Get the IP address of the client, or ``None`` if it cannot be determined.
+
+    The result is cached on the request.
+    """
+    try:
+        return getattr(request, _REQUEST_CACHE_ATTRIBUTE)
+    except AttributeError:
+        pass
+
+    if (custom_function := _get_custom_function()) is not None:
+        client_ip = custom_function(request)
+    else:
+        client_ip = get_resolver().resolve(request)
+
+    setattr(request, _REQUEST_CACHE_ATTRIBUTE, client_ip)
+    return client_ip
@@ -0,0 +1,62 @@
+"""
+Measure the lag of the Celery worker event loop.
+
+A dead event loop stops updating the liveness file, but a sluggish one still does -
+while ETA/countdown tasks and other timers fire minutes late. The
+:class:`~maykin_common.health_checks.celery.probes.EventLoopProbe` therefore schedules a
+timer every ``MKN_HEALTH_CHECKS_WORKER_EVENT_LOOP_LAG_INTERVAL_SECONDS`` and records how
+late it fires: the lag. The samples of the last liveness interval are summarized in the
+liveness file and the worker status:
+
+.. code-block:: json
+
+    {"lag": {"p50": 0.002, "p99": 0.015, "max": 0.015, "samples": 60}}
+
+``maykin-common worker-health-check --max-lag`` compares the median lag to its limit.
+"""
+
+import math
+import threading
+from collections import deque
+from typing import TypedDict
+
+__all__ = ["LagHistogram", "LagSummary"]
+
+
+class LagSummary(TypedDict):
+    p50: float
+    p99: float
+    max: float
+    samples: int
+
+
+class LagHistogram:
+    """
+    Rolling window of the ``size`` most recent lag samples, in seconds.
+    """
+
+    def __init__(self, size: int):
+        self._samples: deque[float] = deque(maxlen=size)
+        # the status server reads the samples from another thread
+        self._lock = threading.Lock()
+
+    def add(self, lag: float) -> None:
+        with self._lock:
+            self._samples.append(lag)
+
+    def summary(self) -> LagSummary:
+        with self._lock:
+            samples = sorted(self._samples)
+        if not samples:
+            return {"p50": 0.0, "p99": 0.0, "max": 0.0, "samples": 0}
+        return {
+            "p50": round(_quantile(samples, 0.5), 3),
+            "p99": round(_quantile(samples, 0.99), 3),
+            "max": round(samples[-1], 3),
+            "samples": len(samples),
+        }
+
+
+def _quantile(samples: list[float], q: float) -> float:
+    # nearest-rank method, the samples are sorted
+    return samples[max(math.ceil(q * len(samples)) - 1, 0)]
@@ -1,5 +1,8 @@
 import atexit
+import json
 import logging
+import math
+import time
 from pathlib import Path
 from typing import TYPE_CHECKING
 
@@ -12,6 +15,10 @@ from kombu.asynchronous.timer import Entry as TimerEntry, Timer
 
 from maykin_common.settings import get_setting
 
+from ..metrics import record_event_loop_lag
+from .lag import LagHistogram
+from .status import StatusServer, get_worker_status
+
 logger = logging.getLogger(__name__)
 
 if TYPE_CHECKING:
@@ -61,6 +68,17 @@ class EventLoopProbe(bootsteps.StartStopStep):
     See the `upstream <https://docs.celeryq.dev/en/stable/userguide/extending.html#blueprints>`_
     documentation for details about blueprints and bootstep mechanisms.
 
+    A sluggish event loop still touches the liveness file, but delays the timers of
+    ETA/countdown tasks. The probe therefore also schedules a timer every
+    ``MKN_HEALTH_CHECKS_WORKER_EVENT_LOOP_LAG_INTERVAL_SECONDS`` and measures how late
+    it fires. The lag of the last liveness interval is written to the liveness file and
+    recorded in the ``celery.worker.event_loop.lag`` metric, see
+    :mod:`maykin_common.health_checks.celery.lag`.
+
+    When ``MKN_HEALTH_CHECKS_WORKER_STATUS_SOCKET`` is set, the probe also serves the
+    health status of the worker on that Unix socket, see
+    :mod:`maykin_common.health_checks.celery.status`.
+
     Usage::
 
         >>> app = Celery("my-project")
@@ -71,7 +89,14 @@ class EventLoopProbe(bootsteps.StartStopStep):
     # figure out the step dependency graph.
     requires = {"celery.worker.components:Timer"}
     tref: TimerEntry | None = None
+    lag_tref: TimerEntry | None = None
     liveness_file: Path
+    last_tick: float = 0
+    lag: LagHistogram
+    lag_interval: float
+    # the monotonic time the next lag sample is due
+    next_sample: float = 0
+    status_server: StatusServer | None = None
 
     def start(self, parent: Worker):
         self.liveness_file = liveness_file = get_setting(
@@ -81,24 +106,70 @@ class EventLoopProbe(bootsteps.StartStopStep):
         if not (parent_dir := liveness_file.parent).exists():
             parent_dir.mkdir(parents=True, exist_ok=True)
 
-        liveness_file.touch()
         frequency: int = get_setting(
             "MKN_HEALTH_CHECKS_WORKER_EVENT_LOOP_PROBE_FREQUENCY_SECONDS"
         )
-        self.tref = parent.timer.call_repeatedly(
-            frequency, liveness_file.touch, priority=10
+        self.lag_interval = lag_interval = get_setting(
+            "MKN_HEALTH_CHECKS_WORKER_EVENT_LOOP_LAG_INTERVAL_SECONDS"
+        )
+        # keep the samples since the previous update of the liveness file
+        self.lag = LagHistogram(size=max(math.ceil(frequency / lag_interval), 1))
+
+        self.tick()
+        self.tref = parent.timer.call_repeatedly(frequency, self.tick, priority=10)
+        self.next_sample = time.monotonic() + lag_interval
+        self.lag_tref = parent.timer.call_repeatedly(
+            lag_interval, self.measure_lag, priority=10
         )
 
+        status_socket: Path | None = get_setting(
+            "MKN_HEALTH_CHECKS_WORKER_STATUS_SOCKET"
+        )
+        if status_socket is not None:
+            self.status_server = StatusServer(
+                Path(status_socket),
+                lambda: get_worker_status(
+                    parent,
+                    ready=_WORKER_READY,
+                    last_tick=self.last_tick,
+                    lag=self.lag.summary(),
+                ),
+            )
+            self.status_server.start()
+            logger.info("worker_status_server_started", extra={"path": status_socket})
+
+    def tick(self):
+        self.last_tick = time.time()
+        # writing updates the last modified timestamp too
+        self.liveness_file.write_text(json.dumps({"lag": self.lag.summary()}))
+
+    def measure_lag(self):
+        now = time.monotonic()
+        lag = max(now - self.next_sample, 0.0)
+        self.next_sample = now + self.lag_interval
+        self.lag.add(lag)
+        record_event_loop_lag(lag)
+
     def stop(self, parent: Worker):
         assert self.tref is not None
         self.tref.cancel()
+        if self.lag_tref is not None:
+            self.lag_tref.cancel()
         self.liveness_file.unlink(missing_ok=True)
+        if self.status_server is not None:
+            self.status_server.stop()
+            self.status_server = None
+
+
+_WORKER_READY = False
 
 
 def on_worker_ready(*, sender: Consumer, **kwargs):
     """
     Create/touch the readiness file when the worker is ready to accept work.
     """
+    global _WORKER_READY
+    _WORKER_READY = True
     readiness_file: Path = get_setting("MKN_HEALTH_CHECKS_WORKER_READINESS_FILE")
     # create intermediate directories if they don't yet exist
     if not (parent_dir := readiness_file.parent).exists():
@@ -111,6 +182,8 @@ def on_worker_shutdown(*, sender: Worker, **kwargs):
     """
     Delete the readiness file when a worker shuts down.
     """
+    global _WORKER_READY
+    _WORKER_READY = False
     logger.info("worker_shutdown")
     readiness_file: Path = get_setting("MKN_HEALTH_CHECKS_WORKER_READINESS_FILE")
     readiness_file.unlink(missing_ok=True)
@@ -0,0 +1,166 @@
+"""
+Serve the health status of a Celery worker from memory, on a Unix socket.
+
+The :class:`~maykin_common.health_checks.celery.probes.EventLoopProbe` starts a
+:class:`StatusServer` in the worker main process when
+``MKN_HEALTH_CHECKS_WORKER_STATUS_SOCKET`` is set. ``maykin-common worker-health-check
+--status-socket`` then checks the worker with a single request on the socket, rather
+than starting a Celery app and pinging the worker through the broker.
+
+The status is a JSON document:
+
+.. code-block:: json
+
+    {
+        "ready": true,
+        "event_loop": {
+            "last_tick": 1767225600.0,
+            "age": 12.5,
+            "lag": {"p50": 0.002, "p99": 0.015, "max": 0.015, "samples": 60}
+        },
+        "consumer": {"state": "running", "connected": true},
+        "pool": {"concurrency": 4, "active": 1, "reserved": 0, "utilization": 0.25}
+    }
+"""
+
+import json
+import socketserver
+import threading
+import time
+from collections.abc import Callable
+from http.server import BaseHTTPRequestHandler
+from pathlib import Path
+from typing import TYPE_CHECKING, TypedDict
+
+from celery import bootsteps
+from celery.worker import state as worker_state
+
+from .lag import LagSummary
+
+if TYPE_CHECKING:
+    from .probes import Worker
+
+
+class EventLoopStatus(TypedDict):
+    last_tick: float
+    age: float
+    lag: LagSummary | None
+
+
+class ConsumerStatus(TypedDict):
+    state: str
+    connected: bool
+
+
+class PoolStatus(TypedDict):
+    concurrency: int
+    active: int
+    reserved: int
+    utilization: float | None
+
+
+class WorkerStatus(TypedDict):
+    ready: bool
+    event_loop: EventLoopStatus
+    consumer: ConsumerStatus
+    pool: PoolStatus
+
+
+_CONSUMER_STATES = {
+    None: "starting",
+    bootsteps.RUN: "running",
+    bootsteps.CLOSE: "closed",
+    bootsteps.TERMINATE: "terminated",
+}
+
+
+def get_worker_status(
+    worker: "Worker",
+    *,
+    ready: bool,
+    last_tick: float,
+    lag: LagSummary | None = None,
+) -> WorkerStatus:
+    """
+    Collect the health status of ``worker``.
+
+    :param ready: Whether the worker is ready to process tasks.
+    :param last_tick: The timestamp of the last tick of the event loop.
+    :param lag: The recent lag of the event loop, if measured.
+    """
+    consumer = getattr(worker, "consumer", None)
+    blueprint = getattr(consumer, "blueprint", None)
+    connection = getattr(consumer, "connection", None)
+
+    concurrency: int = getattr(worker, "concurrency", 0) or 0
+    active = len(worker_state.active_requests)
+    return {
+        "ready": ready,
+        "event_loop": {
+            "last_tick": last_tick,
+            "age": round(time.time() - last_tick, 3),
+            "lag": lag,
+        },
+        "consumer": {
+            "state": _CONSUMER_STATES.get(getattr(blueprint, "state", None), "unknown"),
+            "connected": bool(connection is not None and connection.connected),
+        },
+        "pool": {
+            "concurrency": concurrency,
+            "active": active,
+            "reserved": len(worker_state.reserved_requests),
+            "utilization": round(active / concurrency, 3) if concurrency else None,
+        },
+    }
+
+
+class _StatusRequestHandler(BaseHTTPRequestHandler):
+    server: "StatusServer"
+
+    def do_GET(self):
+        body = json.dumps(self.server.get_status()).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def address_string(self) -> str:
+        # Unix sockets have no client address
+        return "local"
+
+    def log_message(self, format, *args):
+        pass
+
+
+class StatusServer(socketserver.ThreadingUnixStreamServer):
+    """
+    HTTP server on the Unix socket ``path``, answering every ``GET`` request with the
+    JSON of ``get_status()``.
+
+    The server runs in a daemon thread, so it keeps answering when the event loop of
+    the worker is blocked - which the reported age of the last tick reveals.
+    """
+
+    daemon_threads = True
+
+    def __init__(self, path: Path, get_status: Callable[[], WorkerStatus]):
+        self.path = path
+        self.get_status = get_status
+        # create intermediate directories if they don't yet exist, and clean up the
+        # socket of a previous worker
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.unlink(missing_ok=True)
+        super().__init__(str(path), _StatusRequestHandler)
+        self._thread = threading.Thread(
+            target=self.serve_forever, name="worker-status-server", daemon=True
+        )
+
+    def start(self) -> None:
+        self._thread.start()
+
+    def stop(self) -> None:
+        self.shutdown()
+        self.server_close()
+        self._thread.join()
+        self.path.unlink(missing_ok=True)
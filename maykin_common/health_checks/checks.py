@@ -0,0 +1,128 @@
+"""
+Health checks that complement the checks of `django-health-check`_.
+
+.. _django-health-check: https://pypi.org/project/django-health-check/
+"""
+
+import collections
+import dataclasses
+import datetime
+import threading
+import time
+from typing import TypeGuard
+
+from django.core.signals import setting_changed
+from django.db import DatabaseError, connections
+from django.db.migrations.executor import MigrationExecutor
+from django.db.migrations.recorder import MigrationRecorder
+from django.dispatch import receiver
+from django.utils.connection import ConnectionDoesNotExist
+
+from health_check.base import HealthCheck
+from health_check.exceptions import ServiceUnavailable
+
+__all__ = ["Migrations"]
+
+
+@dataclasses.dataclass
+class _MigrationState:
+    has_table: bool
+    # the number of applied migrations the plan was computed for
+    applied: int
+    pending: int
+    checked_at: float
+
+
+# guards _states and _plan_locks, never held across database queries
+_lock = threading.Lock()
+# migration state per database alias, computed once per process
+_states: dict[str, _MigrationState] = {}
+# serializes computing the migration plan of a database alias
+_plan_locks: dict[str, threading.Lock] = collections.defaultdict(threading.Lock)
+
+
+@receiver(setting_changed, dispatch_uid="maykin_common.health_checks.checks._reset")
+def _reset(sender, setting: str, **kwargs):
+    # mostly for tests, settings *should* not change in production code
+    match setting:
+        case "DATABASES" | "INSTALLED_APPS" | "MIGRATION_MODULES":
+            with _lock:
+                _states.clear()
+        case _:  # pragma: no cover
+            pass
+
+
+@dataclasses.dataclass
+class Migrations(HealthCheck):
+    """
+    Check that there are no pending database migrations.
+
+    Computing the migration plan imports every migration module and builds the
+    migration graph, which is slow on projects with many migrations. The plan only
+    changes when migrations are (un)applied or when the code is deployed - in a new
+    process. The plan is therefore computed once per process, and on every probe only
+    the applied migrations are counted. The plan is computed again when the count
+    changed, or when it is older than ``interval``.
+
+    :param alias: The alias of the database connection to check.
+    :param interval: The maximum age of the computed plan.
+    """
+
+    alias: str = "default"
+    interval: datetime.timedelta = dataclasses.field(
+        default=datetime.timedelta(minutes=10), repr=False
+    )
+
+    def run(self):
+        try:
+            connection = connections[self.alias]
+        except ConnectionDoesNotExist as exc:
+            raise ServiceUnavailable("Database alias does not exist") from exc
+
+        try:
+            with connection.temporary_connection():
+                state = self.get_state(MigrationRecorder(connection))
+        except DatabaseError as exc:
+            raise ServiceUnavailable(str(exc).rsplit(":")[0]) from exc
+
+        if state.pending:
+            raise ServiceUnavailable(f"There are {state.pending} migrations to apply")
+
+    def get_state(self, recorder: MigrationRecorder) -> _MigrationState:
+        with _lock:
+            state = _states.get(self.alias)
+        # the table is not dropped once it exists, skip the introspection query
+        has_table = (state is not None and state.has_table) or recorder.has_table()
+        applied = recorder.migration_qs.count() if has_table else 0
+        if self._is_current(state, applied):
+            return state
+
+        with _lock:
+            plan_lock = _plan_locks[self.alias]
+        with plan_lock:
+            # another probe may have computed the plan in the meantime
+            with _lock:
+                state = _states.get(self.alias)
+            if self._is_current(state, applied):
+                return state
+
+            executor = MigrationExecutor(recorder.connection)
+            plan = executor.migration_plan(executor.loader.graph.leaf_nodes())
+            state = _MigrationState(
+                has_table=has_table,
+                applied=applied,
+                pending=len(plan),
+                checked_at=time.monotonic(),
+            )
+            with _lock:
+                _states[self.alias] = state
+        return state
+
+    def _is_current(
+        self, state: _MigrationState | None, applied: int
+    ) -> TypeGuard[_MigrationState]:
+        return (
+            state is not None
+            and state.applied == applied
+            and time.monotonic() - state.checked_at < self.interval.total_seconds()
+        )
@@ -0,0 +1,125 @@
+"""
+Answer liveness probes before Django handles the request.
+
+The liveness endpoint performs no checks at all, but a request to
+``/_healthz/livez/`` still passes through the complete middleware stack - sessions,
+authentication, CSRF, locale, instrumentation... On a busy node, that is exactly the
+work that makes the probe time out and the container restart. Wrap the WSGI or ASGI
+application to answer the liveness path directly:
+
+.. code-block:: python
+
+    # wsgi.py
+    from django.core.wsgi import get_wsgi_application
+
+    from maykin_common.health_checks.liveness import LivenessWSGIMiddleware
+
+    application = LivenessWSGIMiddleware(get_wsgi_application())
+
+.. code-block:: python
+
+    # asgi.py
+    from django.core.asgi import get_asgi_application
+
+    from maykin_common.health_checks.liveness import LivenessASGIMiddleware
+
+    application = LivenessASGIMiddleware(get_asgi_application())
+
+``GET`` and ``HEAD`` requests for ``MKN_HEALTH_CHECKS_LIVENESS_PATH`` get an empty
+``200`` response, all other requests are passed to the wrapped application. The
+response does not depend on the database, the cache or any other service - if the
+process can answer it, it is alive.
+"""
+
+from collections.abc import Iterable
+from wsgiref.types import StartResponse, WSGIApplication, WSGIEnvironment
+
+from asgiref.typing import (
+    ASGI3Application,
+    ASGIReceiveCallable,
+    ASGISendCallable,
+    Scope,
+)
+
+from maykin_common.settings import get_setting
+
+__all__ = ["LivenessASGIMiddleware", "LivenessWSGIMiddleware"]
+
+_METHODS = frozenset({"GET", "HEAD"})
+_STATUS = "200 OK"
+_HEADERS = [
+    ("Content-Type", "text/plain; charset=utf-8"),
+    ("Content-Length", "0"),
+    ("Cache-Control", "no-store"),
+]
+
+
+def _get_path(path: str | None) -> str:
+    return get_setting("MKN_HEALTH_CHECKS_LIVENESS_PATH") if path is None else path
+
+
+class LivenessWSGIMiddleware:
+    """
+    WSGI application that answers liveness probes and passes other requests on.
+
+    :param application: The application to wrap, e.g. the result of
+      :func:`django.core.wsgi.get_wsgi_application`.
+    :param path: The path to answer, defaults to ``MKN_HEALTH_CHECKS_LIVENESS_PATH``.
+    """
+
+    def __init__(self, application: WSGIApplication, path: str | None = None):
+        self.application = application
+        self.path = _get_path(path)
+
+    def __call__(
+        self, environ: WSGIEnvironment, start_response: StartResponse
+    ) -> Iterable[bytes]:
+        # PATH_INFO is relative to SCRIPT_NAME, like the paths Django resolves
+        if (
+            environ.get("PATH_INFO") == self.path
+            and environ.get("REQUEST_METHOD") in _METHODS
+        ):
+            start_response(_STATUS, _HEADERS)
+            return []
+        return self.application(environ, start_response)
+
+
+class LivenessASGIMiddleware:
+    """
+    ASGI application that answers liveness probes and passes other requests on.
+
+    :param application: The application to wrap, e.g. the result of
+      :func:`django.core.asgi.get_asgi_application`.
+    :param path: The path to answer, defaults to ``MKN_HEALTH_CHECKS_LIVENESS_PATH``.
+    """
+
+    def __init__(self, application: ASGI3Application, path: str | None = None):
+        self.application = application
+        self.path = _get_path(path)
+        self.headers = [
+            (name.lower().encode("latin-1"), value.encode("latin-1"))
+            for name, value in _HEADERS
+        ]
+
+    async def __call__(
+        self, scope: Scope, receive: ASGIReceiveCallable, send: ASGISendCallable
+    ) -> None:
+        if scope["type"] == "http" and scope["method"] in _METHODS:
+            # like Django, resolve the path relative to the mount point
+            path, root_path = scope["path"], scope.get("root_path", "")
+            if root_path and path.startswith(root_path):
+                path = path[len(root_path) :]
+            if path == self.path:
+                await send(
+                    {
+                        "type": "http.response.start",
+                        "status": 200,
+                        "headers": self.headers,
+                        "trailers": False,
+                    }
+                )
+                await send(
+                    {"type": "http.response.body", "body": b"", "more_body": False}
+                )
+                return
+        await self.application(scope, receive, send)
@@ -0,0 +1,63 @@
+"""
+Open Telemetry instruments for the health checks.
+
+The instruments are defined with the ``opentelemetry-api`` package and are no-ops
+until :func:`maykin_common.otel.setup_otel` configured the providers.
+
+``health_check.duration``
+    Seconds a health check took, by check (class name) and outcome (``ok``, ``error``
+    or ``timeout``). Only evaluations are recorded, not responses with cached results.
+
+``celery.worker.event_loop.lag``
+    Seconds the timers of the Celery worker event loop fire late, measured by the
+    :class:`~maykin_common.health_checks.celery.probes.EventLoopProbe`.
+"""
+
+from opentelemetry import metrics
+
+__all__ = ["record_check", "record_event_loop_lag"]
+
+meter = metrics.get_meter("maykin_common.health_checks")
+
+_BUCKETS = [
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1,
+    2.5,
+    5,
+    10,
+]
+
+check_duration = meter.create_histogram(
+    "health_check.duration",
+    unit="s",
+    description="The time a health check took, by check and outcome.",
+    explicit_bucket_boundaries_advisory=_BUCKETS,
+)
+
+event_loop_lag = meter.create_histogram(
+    "celery.worker.event_loop.lag",
+    unit="s",
+    description="The time the timers of the worker event loop fire late.",
+    # delayed ETA tasks are the concern, up to minutes
+    explicit_bucket_boundaries_advisory=[*_BUCKETS, 30, 60, 300],
+)
+
+
+def record_check(check: str, outcome: str, duration: float) -> None:
+    """
+    Record the duration of an evaluated health check.
+    """
+    check_duration.record(duration, {"check": check, "outcome": outcome})
+
+
+def record_event_loop_lag(lag: float) -> None:
+    """
+    Record the lag of a timer of the Celery worker event loop.
+    """
+    event_loop_lag.record(lag)
@@ -2,18 +2,32 @@ from django.urls import path
 
 from health_check.views import HealthCheckView
 
+from .views import CachedHealthCheckView
+
 # Default/convention for URL patterns. With all the defaults, this makes the following
 # URLs available:
 #
-# * ``/_healthz/`` -> reports on all health checks configured
+# * ``/_healthz/`` -> reports on all health checks configured and pending migrations
 # * ``/_healthz/livez/`` -> no plugins at all, simple check if the app is alive
 # * ``/_healthz/readyz/`` -> essential plugins, check if the app can do useful work
+#
+# The results of the checks are reused for ``MKN_HEALTH_CHECKS_CACHE_TIMEOUT`` seconds.
+# Wrap the WSGI/ASGI application with :mod:`maykin_common.health_checks.liveness` to
+# answer ``/_healthz/livez/`` without going through the middleware.
 urlpatterns = [
-    path("_healthz/", HealthCheckView.as_view()),  # all checks
+    path(
+        "_healthz/",
+        CachedHealthCheckView.as_view(
+            checks=[
+                *HealthCheckView.checks,
+                "maykin_common.health_checks.checks.Migrations",
+            ]
+        ),
+    ),
     path("_healthz/livez/", HealthCheckView.as_view(checks=[])),  # no checks
     path(
         "_healthz/readyz/",
-        HealthCheckView.as_view(
+        CachedHealthCheckView.as_view(
             checks=[
                 ("health_check.Cache", {"alias": "default"}),
                 ("health_check.Database", {"alias": "default"}),
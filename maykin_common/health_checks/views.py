@@ -0,0 +1,344 @@
+"""
+Health check views that bound the time and the work of probes.
+
+:class:`ConcurrentHealthCheckView` runs the configured checks concurrently, with sync
+checks in a bounded thread pool (``MKN_HEALTH_CHECKS_MAX_WORKERS``). Every check gets a
+deadline (``MKN_HEALTH_CHECKS_CHECK_TIMEOUT``), capped by an overall one
+(``MKN_HEALTH_CHECKS_TIMEOUT``), so one slow dependency cannot push the response past
+the probe timeout. A check that misses its deadline fails with a "Timed out" error. The
+durations of the checks are reported in the ``Server-Timing`` response header and the
+``health_check.duration`` metric (see :mod:`maykin_common.health_checks.metrics`).
+
+Every probe of every kubelet, load balancer and monitor runs the health checks again.
+:class:`CachedHealthCheckView` keeps the results for ``MKN_HEALTH_CHECKS_CACHE_TIMEOUT``
+seconds, and concurrent requests wait for the evaluation that is already in progress
+rather than starting their own (single-flight). A probe storm then costs one evaluation
+per interval.
+
+By default the results are kept in the memory of the process. With
+``MKN_HEALTH_CHECKS_CACHE_ALIAS``, they are shared between processes through a Django
+cache. Single-flight applies within a process.
+
+Relevant settings:
+
+* :attr:`maykin_common.settings.MKN_HEALTH_CHECKS_MAX_WORKERS`
+* :attr:`maykin_common.settings.MKN_HEALTH_CHECKS_CHECK_TIMEOUT`
+* :attr:`maykin_common.settings.MKN_HEALTH_CHECKS_TIMEOUT`
+* :attr:`maykin_common.settings.MKN_HEALTH_CHECKS_CACHE_TIMEOUT`
+* :attr:`maykin_common.settings.MKN_HEALTH_CHECKS_CACHE_ALIAS`
+"""
+
+import asyncio
+import concurrent.futures
+import contextlib
+import dataclasses
+import functools
+import hashlib
+import logging
+import re
+import threading
+import time
+import timeit
+from collections.abc import Generator
+from concurrent.futures import Executor, ThreadPoolExecutor
+
+from django.core.cache import caches
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+
+from health_check.base import HealthCheck, HealthCheckResult
+from health_check.exceptions import ServiceUnavailable
+from health_check.views import HealthCheckView
+
+from maykin_common.settings import get_setting
+
+from .metrics import record_check
+
+__all__ = ["CachedHealthCheckView", "ConcurrentHealthCheckView"]
+
+logger = logging.getLogger(__name__)
+
+type Results = list[HealthCheckResult]
+
+_lock = threading.Lock()
+# results per cache key, with the monotonic time they expire at
+_results: dict[str, tuple[float, Results]] = {}
+# evaluations in progress per cache key - concurrent futures, because requests may run
+# in different threads and event loops
+_in_flight: dict[str, concurrent.futures.Future[Results]] = {}
+# the tasks running the evaluations, the event loop only keeps weak references
+_tasks: set[asyncio.Task[Results]] = set()
+
+
+# characters that are not allowed in a Server-Timing metric name
+_NON_TOKEN_CHARACTERS = re.compile(r"[^!#$%&'*+\-.^_`|~0-9A-Za-z]")
+
+
+@functools.cache
+def _get_executor() -> ThreadPoolExecutor:
+    """
+    Return the thread pool for the sync checks, shared by all requests of the process.
+    """
+    # a pool per request would wait for stuck checks on shutdown, past the deadline
+    return ThreadPoolExecutor(
+        max_workers=get_setting("MKN_HEALTH_CHECKS_MAX_WORKERS"),
+        thread_name_prefix="health-check",
+    )
+
+
+@receiver(setting_changed, dispatch_uid="maykin_common.health_checks.views._reset")
+def _reset(sender, setting: str, **kwargs):
+    # mostly for tests, settings *should* not change in production code
+    match setting:
+        case "MKN_HEALTH_CHECKS_CACHE_TIMEOUT" | "MKN_HEALTH_CHECKS_CACHE_ALIAS":
+            with _lock:
+                _results.clear()
+        case "MKN_HEALTH_CHECKS_MAX_WORKERS":
+            _get_executor.cache_clear()
+        case _:  # pragma: no cover
+            pass
+
+
+@dataclasses.dataclass
+class _Replay(HealthCheck):
+    """
+    Stand-in check that returns the result of an earlier evaluation.
+    """
+
+    result: HealthCheckResult
+
+    async def run(self) -> None:  # pragma: no cover
+        pass
+
+    async def get_result(self, executor: Executor | None = None) -> HealthCheckResult:
+        return self.result
+
+
+class ConcurrentHealthCheckView(HealthCheckView):
+    """
+    :class:`~health_check.views.HealthCheckView` that runs the checks concurrently,
+    within deadlines, and reports their durations.
+
+    The attributes default to the settings, and can be overridden with :meth:`as_view`:
+
+    .. code-block:: python
+
+        ConcurrentHealthCheckView.as_view(
+            checks=[("health_check.Database", {"alias": "default"})],
+            check_timeout=1,
+        )
+    """
+
+    check_timeout: float | None = None
+    """
+    Seconds every check may take, defaults to ``MKN_HEALTH_CHECKS_CHECK_TIMEOUT``.
+    """
+    timeout: float | None = None
+    """
+    Seconds all checks together may take, defaults to ``MKN_HEALTH_CHECKS_TIMEOUT``.
+    """
+
+    results: Results
+
+    async def get(self, request, *args, **kwargs):
+        self.results = await self.get_results()
+        response = await super().get(request, *args, **kwargs)
+        if self.results:
+            response.headers["Server-Timing"] = self.get_server_timing()
+        return response
+
+    def get_checks(self) -> Generator[HealthCheck]:
+        # the checks are evaluated by :meth:`get_results`, render their results
+        for result in self.results:
+            yield _Replay(result)
+
+    def get_executor(self) -> contextlib.AbstractContextManager[Executor | None]:
+        return contextlib.nullcontext(_get_executor())
+
+    def get_deadline(self) -> float | None:
+        """
+        Return the seconds every check may take.
+        """
+        check_timeout = (
+            get_setting("MKN_HEALTH_CHECKS_CHECK_TIMEOUT")
+            if self.check_timeout is None
+            else self.check_timeout
+        )
+        timeout = (
+            get_setting("MKN_HEALTH_CHECKS_TIMEOUT")
+            if self.timeout is None
+            else self.timeout
+        )
+        deadlines = [value for value in (check_timeout, timeout) if value is not None]
+        # all checks start together, so the overall deadline caps every check
+        return min(deadlines, default=None)
+
+    async def get_results(self) -> Results:
+        """
+        Return the results of the checks.
+        """
+        return await self.evaluate()
+
+    async def evaluate(self) -> Results:
+        """
+        Run the configured checks concurrently.
+        """
+        deadline = self.get_deadline()
+        with self.get_executor() as executor:
+            return await asyncio.gather(
+                *(
+                    _run_check(check, executor, deadline)
+                    for check in HealthCheckView.get_checks(self)
+                )
+            )
+
+    def get_server_timing(self) -> str:
+        """
+        Format the durations of the checks as ``Server-Timing`` header value.
+        """
+        metrics = []
+        for result in self.results:
+            name = _NON_TOKEN_CHARACTERS.sub("", result.check.__class__.__name__)
+            description = repr(result.check).replace("\\", "\\\\").replace('"', '\\"')
+            duration = result.time_taken * 1000
+            metrics.append(f'{name.lower()};dur={duration:.1f};desc="{description}"')
+        return ", ".join(metrics)
+
+
+class CachedHealthCheckView(ConcurrentHealthCheckView):
+    """
+    :class:`ConcurrentHealthCheckView` that reuses recent results.
+
+    :attr:`cache_timeout` and :attr:`cache_alias` default to the
+    ``MKN_HEALTH_CHECKS_CACHE_TIMEOUT`` and ``MKN_HEALTH_CHECKS_CACHE_ALIAS`` settings,
+    and can be overridden with :meth:`as_view`:
+
+    .. code-block:: python
+
+        CachedHealthCheckView.as_view(
+            checks=[("health_check.Database", {"alias": "default"})],
+            cache_timeout=10,
+        )
+
+    The ``Server-Timing`` header reports the durations of the evaluation the results
+    come from.
+    """
+
+    cache_timeout: float | None = None
+    """
+    Seconds to reuse the results for. ``0`` evaluates the checks on every request.
+    """
+    cache_alias: str | None = None
+    """
+    The Django cache to share the results in, or ``None`` to keep them in the process.
+    """
+
+    def get_cache_key(self) -> str:
+        """
+        Identify the configured checks, regardless of the URL of the view.
+        """
+        digest = hashlib.sha256(repr(tuple(self.checks)).encode("utf-8")).hexdigest()
+        return f"maykin_common.health_checks:{digest}"
+
+    async def get_results(self) -> Results:
+        """
+        Return the results of the checks, evaluating them when there are no recent
+        results.
+        """
+        timeout = (
+            get_setting("MKN_HEALTH_CHECKS_CACHE_TIMEOUT")
+            if self.cache_timeout is None
+            else self.cache_timeout
+        )
+        if timeout <= 0:
+            return await self.evaluate()
+
+        alias = self.cache_alias or get_setting("MKN_HEALTH_CHECKS_CACHE_ALIAS")
+        key = self.get_cache_key()
+        if alias is not None and (results := await _get_shared(alias, key)):
+            return results
+
+        with _lock:
+            if alias is None and key in _results:
+                expires_at, results = _results[key]
+                if expires_at > time.monotonic():
+                    return results
+            future = _in_flight.get(key)
+            if leader := future is None:
+                future = _in_flight[key] = concurrent.futures.Future()
+
+        if not leader:
+            return await asyncio.shield(asyncio.wrap_future(future))
+
+        # the request is cancelled when the client disconnects, which must not cancel
+        # the evaluation that other requests wait for - run it in a task of its own
+        task = asyncio.ensure_future(self._evaluate_and_store(key, alias, timeout))
+        _tasks.add(task)
+        task.add_done_callback(functools.partial(_resolve, key, future))
+        return await asyncio.shield(task)
+
+    async def _evaluate_and_store(
+        self, key: str, alias: str | None, timeout: float
+    ) -> Results:
+        results = await self.evaluate()
+        # store the results before the evaluation is done, so no new evaluation starts
+        # in between
+        if alias is None:
+            with _lock:
+                _results[key] = (time.monotonic() + timeout, results)
+        else:
+            await _set_shared(alias, key, results, timeout)
+        return results
+
+
+def _resolve(
+    key: str, future: concurrent.futures.Future[Results], task: asyncio.Task[Results]
+) -> None:
+    """
+    Pass the outcome of the evaluation ``task`` on to the requests waiting for it.
+    """
+    _tasks.discard(task)
+    with _lock:
+        del _in_flight[key]
+    if task.cancelled():
+        future.cancel()
+    elif (exc := task.exception()) is not None:
+        future.set_exception(exc)
+    else:
+        future.set_result(task.result())
+
+
+async def _get_shared(alias: str, key: str) -> Results | None:
+    try:
+        return await caches[alias].aget(key)
+    except Exception:
+        # the cache may be one of the things that is down
+        logger.warning("health_check_cache_unavailable", exc_info=True)
+        return None
+
+
+async def _set_shared(alias: str, key: str, results: Results, timeout: float) -> None:
+    try:
+        await caches[alias].aset(key, results, timeout=timeout)
+    except Exception:
+        logger.warning("health_check_cache_unavailable", exc_info=True)
+
+
+async def _run_check(
+    check: HealthCheck, executor: Executor | None, deadline: float | None
+) -> HealthCheckResult:
+    start = timeit.default_timer()
+    try:
+        result = await asyncio.wait_for(check.get_result(executor), deadline)
+    except TimeoutError:
+        logger.warning("health_check_timed_out", extra={"check": repr(check)})
+        result = HealthCheckResult(
+            check=check,
+            error=ServiceUnavailable(f"Timed out after {deadline:g} seconds"),
+            time_taken=timeit.default_timer() - start,
+        )
+        outcome = "timeout"
+    else:
+        outcome = "ok" if result.error is None else "error"
+    record_check(check.__class__.__name__, outcome, result.time_taken)
+    return result
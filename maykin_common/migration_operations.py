@@ -1,4 +1,7 @@
 from django.db import migrations, router
+from django.db.migrations.operations.base import Operation
+
+from .partitioning import partition_table_by_month
 
 RESET_SQL = """
     SELECT 'SELECT SETVAL(' ||
@@ -59,3 +62,67 @@ class ResetSequences(migrations.RunSQL):
 
     def database_backwards(self, *args, **kwargs) -> None:
         pass
+
+
+class PartitionByMonth(Operation):
+    """
+    Range-partition the table of a model by month, on PostgreSQL.
+
+    The table is replaced by a partitioned table with the same columns and the rows
+    are copied into monthly partitions, see :mod:`maykin_common.partitioning` for the
+    details and limitations. Old rows can then be removed by dropping partitions. The
+    foreign keys of other tables to this table are dropped, so the database no longer
+    guards their integrity. The operation is skipped on other databases and for tables
+    that are partitioned already, and can't be reversed.
+
+    Usage:
+
+        >>> from maykin_common.migration_operations import PartitionByMonth
+        >>> class Migration(migrations.Migration):
+        ...     dependencies = [("django_yubin", "0012_...")]
+        ...     operations = [
+        ...         PartitionByMonth("django_yubin.Message", "date_created"),
+        ...         PartitionByMonth("django_yubin.Log", "date"),
+        ...     ]
+    """
+
+    reversible = False
+    reduces_to_sql = False
+
+    def __init__(self, model: str, field: str, months_ahead: int = 3, hints=None):
+        self.model = model
+        self.field = field
+        self.months_ahead = months_ahead
+        self.hints = hints or {}
+
+    def deconstruct(self):
+        kwargs = {"model": self.model, "field": self.field}
+        if self.months_ahead != 3:
+            kwargs["months_ahead"] = self.months_ahead
+        if self.hints:
+            kwargs["hints"] = self.hints
+        return (self.__class__.__qualname__, [], kwargs)
+
+    def state_forwards(self, app_label, state) -> None:
+        pass
+
+    def database_forwards(self, app_label, schema_editor, from_state, to_state) -> None:
+        connection = schema_editor.connection
+        if connection.vendor != "postgresql":
+            return
+        model = to_state.apps.get_model(self.model)
+        if not router.allow_migrate_model(connection.alias, model):
+            return
+        partition_table_by_month(
+            connection,
+            model._meta.db_table,
+            model._meta.get_field(self.field).column,
+            months_ahead=self.months_ahead,
+        )
+
+    def describe(self) -> str:
+        return f"Partition {self.model} by month on {self.field}"
+
+    @property
+    def migration_name_fragment(self) -> str:
+        return f"partition_{self.model.rpartition('.')[2].lower()}_by_month"
@@ -0,0 +1,347 @@
+"""
+Monthly range partitioning of PostgreSQL tables.
+
+Partitioning a table by month on a timestamp column turns retention into dropping whole
+partitions, which takes constant time and leaves no dead tuples behind, unlike deleting
+the rows.
+
+The partitions are regular tables named ``<table>_pYYYYMM``, holding the rows of one
+month (in UTC). A ``<table>_default`` partition catches the rows that fall outside the
+monthly partitions, so that inserts never fail. Create the partitions ahead of time
+with :func:`ensure_monthly_partitions`, from a periodic task for example. Rows that
+ended up in the default partition are moved when the partition for their month is
+created.
+
+Convert an existing table with the
+:class:`maykin_common.migration_operations.PartitionByMonth` migration operation.
+
+.. note:: PostgreSQL requires the partition key to be part of the primary key and of
+   any unique constraint, so foreign keys to a partitioned table have to include the
+   partition key too. The primary key is extended with the partition key column and the
+   foreign keys to the table are dropped. Deletes still cascade through the Django ORM,
+   but the database no longer enforces the integrity of the referencing rows.
+"""
+
+import datetime
+from collections.abc import Sequence
+from dataclasses import dataclass
+
+from django.db.backends.base.base import BaseDatabaseWrapper
+
+__all__ = [
+    "MonthlyPartition",
+    "drop_monthly_partitions",
+    "ensure_monthly_partitions",
+    "get_monthly_partitions",
+    "get_partition_key",
+    "partition_table_by_month",
+]
+
+
+@dataclass(frozen=True, slots=True)
+class MonthlyPartition:
+    name: str
+    start: datetime.datetime
+    end: datetime.datetime
+
+
+def _month_start(value: datetime.date | datetime.datetime) -> datetime.datetime:
+    if isinstance(value, datetime.datetime):
+        value = value.astimezone(datetime.UTC)
+    return datetime.datetime(value.year, value.month, 1, tzinfo=datetime.UTC)
+
+
+def _next_month(value: datetime.datetime) -> datetime.datetime:
+    if value.month == 12:
+        return value.replace(year=value.year + 1, month=1)
+    return value.replace(month=value.month + 1)
+
+
+def _partition_name(table: str, month: datetime.datetime) -> str:
+    return f"{table}_p{month:%Y%m}"
+
+
+def _literal(value: datetime.datetime) -> str:
+    # DDL doesn't take parameters, the bounds are generated by us so this is safe
+    return f"'{value.isoformat()}'"
+
+
+def get_partition_key(connection: BaseDatabaseWrapper, table: str) -> str | None:
+    """
+    Get the column ``table`` is partitioned on, or ``None`` if it isn't partitioned.
+    """
+    if connection.vendor != "postgresql":
+        return None
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT attribute.attname FROM pg_partitioned_table "
+            "JOIN pg_attribute attribute "
+            "ON attribute.attrelid = pg_partitioned_table.partrelid "
+            "AND attribute.attnum = pg_partitioned_table.partattrs[0] "
+            "WHERE pg_partitioned_table.partrelid = to_regclass(%s)",
+            [connection.ops.quote_name(table)],
+        )
+        row = cursor.fetchone()
+    return row[0] if row else None
+
+
+def get_monthly_partitions(
+    connection: BaseDatabaseWrapper, table: str
+) -> list[MonthlyPartition]:
+    """
+    List the monthly partitions of ``table``, oldest first.
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT child.relname FROM pg_inherits "
+            "JOIN pg_class child ON child.oid = pg_inherits.inhrelid "
+            "WHERE pg_inherits.inhparent = to_regclass(%s)",
+            [connection.ops.quote_name(table)],
+        )
+        names = [name for (name,) in cursor.fetchall()]
+
+    partitions = []
+    prefix = f"{table}_p"
+    for name in names:
+        if not name.startswith(prefix):
+            continue
+        try:
+            start = datetime.datetime.strptime(name.removeprefix(prefix), "%Y%m")
+        except ValueError:
+            continue
+        start = start.replace(tzinfo=datetime.UTC)
+        partitions.append(MonthlyPartition(name, start, _next_month(start)))
+    return sorted(partitions, key=lambda partition: partition.start)
+
+
+def _create_monthly_partition(
+    connection: BaseDatabaseWrapper, table: str, column: str, month: datetime.datetime
+) -> str:
+    qn = connection.ops.quote_name
+    name = _partition_name(table, month)
+    start, end = _literal(month), _literal(_next_month(month))
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"CREATE TABLE {qn(name)} "
+            f"(LIKE {qn(table)} INCLUDING DEFAULTS INCLUDING CONSTRAINTS)"
+        )
+        # attaching fails if the default partition holds rows of this month
+        cursor.execute(
+            f"WITH moved AS (DELETE FROM {qn(f'{table}_default')} "
+            f"WHERE {qn(column)} >= {start} AND {qn(column)} < {end} RETURNING *) "
+            f"INSERT INTO {qn(name)} SELECT * FROM moved"
+        )
+        cursor.execute(
+            f"ALTER TABLE {qn(table)} ATTACH PARTITION {qn(name)} "
+            f"FOR VALUES FROM ({start}) TO ({end})"
+        )
+    return name
+
+
+def ensure_monthly_partitions(
+    connection: BaseDatabaseWrapper,
+    table: str,
+    *,
+    months_ahead: int = 3,
+    now: datetime.datetime | None = None,
+) -> list[str]:
+    """
+    Create the partitions from the current month up to ``months_ahead`` months ahead.
+
+    :returns: The names of the created partitions.
+    """
+    column = get_partition_key(connection, table)
+    assert column is not None, f"{table} is not partitioned"
+    existing = {
+        partition.start for partition in get_monthly_partitions(connection, table)
+    }
+    month = _month_start(now or datetime.datetime.now(datetime.UTC))
+    created = []
+    for _ in range(months_ahead + 1):
+        if month not in existing:
+            created.append(_create_monthly_partition(connection, table, column, month))
+        month = _next_month(month)
+    return created
+
+
+def drop_monthly_partitions(
+    connection: BaseDatabaseWrapper, table: str, before: datetime.datetime
+) -> list[MonthlyPartition]:
+    """
+    Drop the monthly partitions that only hold rows from before ``before``.
+
+    :returns: The dropped partitions.
+    """
+    qn = connection.ops.quote_name
+    dropped = [
+        partition
+        for partition in get_monthly_partitions(connection, table)
+        if partition.end <= before
+    ]
+    with connection.cursor() as cursor:
+        for partition in dropped:
+            cursor.execute(f"DROP TABLE {qn(partition.name)}")
+    return dropped
+
+
+def _get_primary_key_columns(
+    connection: BaseDatabaseWrapper, table: str
+) -> Sequence[str]:
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT attribute.attname FROM pg_index "
+            "JOIN pg_attribute attribute ON attribute.attrelid = pg_index.indrelid "
+            "AND attribute.attnum = ANY(pg_index.indkey) "
+            "WHERE pg_index.indrelid = to_regclass(%s) AND pg_index.indisprimary "
+            "ORDER BY array_position(pg_index.indkey, attribute.attnum)",
+            [connection.ops.quote_name(table)],
+        )
+        return [column for (column,) in cursor.fetchall()]
+
+
+def _get_secondary_indexes(
+    connection: BaseDatabaseWrapper, table: str
+) -> list[tuple[str, bool, list[str], str]]:
+    """
+    Get the name, uniqueness, columns and definition of the indexes other than the
+    primary key.
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT index_class.relname, pg_index.indisunique, "
+            "array_agg(attribute.attname "
+            "ORDER BY array_position(pg_index.indkey, attribute.attnum)), "
+            "pg_get_indexdef(pg_index.indexrelid) "
+            "FROM pg_index "
+            "JOIN pg_class index_class ON index_class.oid = pg_index.indexrelid "
+            # expression indexes have no attributes
+            "LEFT JOIN pg_attribute attribute "
+            "ON attribute.attrelid = pg_index.indrelid "
+            "AND attribute.attnum = ANY(pg_index.indkey) "
+            "WHERE pg_index.indrelid = to_regclass(%s) AND NOT pg_index.indisprimary "
+            "GROUP BY index_class.relname, pg_index.indisunique, pg_index.indexrelid",
+            [connection.ops.quote_name(table)],
+        )
+        return [
+            (name, unique, list(columns), definition)
+            for name, unique, columns, definition in cursor.fetchall()
+        ]
+
+
+def _get_foreign_keys(
+    connection: BaseDatabaseWrapper, table: str
+) -> list[tuple[str, str]]:
+    """
+    Get the name and definition of the foreign keys that can be recreated.
+
+    Foreign keys to partitioned tables can't be, the referenced columns lack a unique
+    constraint without the partition key.
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT conname, pg_get_constraintdef(oid) FROM pg_constraint "
+            "WHERE conrelid = to_regclass(%s) AND contype = 'f' "
+            "AND confrelid NOT IN (SELECT partrelid FROM pg_partitioned_table)",
+            [connection.ops.quote_name(table)],
+        )
+        return cursor.fetchall()
+
+
+def partition_table_by_month(
+    connection: BaseDatabaseWrapper,
+    table: str,
+    column: str,
+    *,
+    months_ahead: int = 3,
+) -> None:
+    """
+    Convert ``table`` into a table partitioned by month on ``column``.
+
+    The existing rows are copied into monthly partitions. This rewrites the whole
+    table, run it in a maintenance window for big tables. The indexes and the foreign
+    keys to regular tables are recreated on the partitioned table. Unique indexes are
+    extended with the partition key, like the primary key, and only keep their
+    columns. Nothing happens if the table is partitioned already.
+    """
+    qn = connection.ops.quote_name
+    if get_partition_key(connection, table) is not None:
+        return
+
+    unpartitioned = f"{table}_unpartitioned"
+    primary_key = _get_primary_key_columns(connection, table)
+    indexes = _get_secondary_indexes(connection, table)
+    foreign_keys = _get_foreign_keys(connection, table)
+
+    with connection.cursor() as cursor:
+        cursor.execute(f"ALTER TABLE {qn(table)} RENAME TO {qn(unpartitioned)}")
+        cursor.execute(
+            f"CREATE TABLE {qn(table)} (LIKE {qn(unpartitioned)} "
+            "INCLUDING DEFAULTS INCLUDING IDENTITY INCLUDING CONSTRAINTS "
+            "INCLUDING STORAGE INCLUDING COMMENTS) "
+            f"PARTITION BY RANGE ({qn(column)})"
+        )
+        cursor.execute(
+            f"CREATE TABLE {qn(f'{table}_default')} PARTITION OF {qn(table)} DEFAULT"
+        )
+
+        cursor.execute(
+            f"SELECT MIN({qn(column)}), MAX({qn(column)}) FROM {qn(unpartitioned)}"
+        )
+        oldest, newest = cursor.fetchone()
+        now = datetime.datetime.now(datetime.UTC)
+        month = _month_start(oldest or now)
+        until = max(_month_start(newest or now), _month_start(now))
+        while month <= until:
+            _create_monthly_partition(connection, table, column, month)
+            month = _next_month(month)
+        ensure_monthly_partitions(connection, table, months_ahead=months_ahead)
+
+        cursor.execute(
+            f"INSERT INTO {qn(table)} OVERRIDING SYSTEM VALUE "
+            f"SELECT * FROM {qn(unpartitioned)}"
+        )
+
+        # keep the sequences going
+        for pk_column in primary_key:
+            cursor.execute(
+                "SELECT pg_get_serial_sequence(%s, %s), pg_get_serial_sequence(%s, %s)",
+                [qn(table), pk_column, qn(unpartitioned), pk_column],
+            )
+            identity_sequence, serial_sequence = cursor.fetchone()
+            if identity_sequence and identity_sequence != serial_sequence:
+                cursor.execute(
+                    f"SELECT setval(%s, COALESCE(MAX({qn(pk_column)}), 0) + 1, false) "
+                    f"FROM {qn(table)}",
+                    [identity_sequence],
+                )
+            elif serial_sequence:
+                # the column default refers to the sequence of the old table
+                cursor.execute(
+                    f"ALTER SEQUENCE {serial_sequence} "
+                    f"OWNED BY {qn(table)}.{qn(pk_column)}"
+                )
+
+        # also drops the foreign keys pointing to the old table
+        cursor.execute(f"DROP TABLE {qn(unpartitioned)} CASCADE")
+
+        if primary_key:
+            key = [*primary_key, *([column] if column not in primary_key else [])]
+            cursor.execute(
+                f"ALTER TABLE {qn(table)} ADD CONSTRAINT {qn(f'{table}_pkey')} "
+                f"PRIMARY KEY ({', '.join(map(qn, key))})"
+            )
+        for name, unique, columns, definition in indexes:
+            if not unique:
+                # read before the rename, so it refers to the partitioned table
+                cursor.execute(definition)
+                continue
+            if column not in columns:
+                columns = [*columns, column]
+            cursor.execute(
+                f"CREATE UNIQUE INDEX {qn(name)} "
+                f"ON {qn(table)} ({', '.join(map(qn, columns))})"
+            )
+        for name, definition in foreign_keys:
+            cursor.execute(
+                f"ALTER TABLE {qn(table)} ADD CONSTRAINT {qn(name)} {definition}"
+            )
@@ -1,3 +1,4 @@
+from collections.abc import Mapping, Sequence
 from pathlib import Path
 from typing import Literal
 
@@ -82,10 +83,10 @@ MKN_HEALTH_CHECKS_WORKER_EVENT_LOOP_LIVENESS_FILE: Path = (
 Path to the file that acts as a liveness marker of the Celery Worker event loop.
 
 Used when the :class:`maykin_common.health_checks.celery.probes.EventLoopProbe` is added
-as a Celery Worker bootstep, which periodically updates the liveness file with the last
-timer tick. The intermediate directories will be created if absent. The file itself will
-be created when the worker main process starts, and will be unlinked again when the
-worker exits.
+as a Celery Worker bootstep, which periodically updates the liveness file with the
+recent event loop lag. The intermediate directories will be created if absent. The file
+itself will be created when the worker main process starts, and will be unlinked again
+when the worker exits.
 """
 
 MKN_HEALTH_CHECKS_WORKER_EVENT_LOOP_PROBE_FREQUENCY_SECONDS: int = 60
@@ -93,6 +94,16 @@ MKN_HEALTH_CHECKS_WORKER_EVENT_LOOP_PROBE_FREQUENCY_SECONDS: int = 60
 Frequency in seconds on how often the event loop should update the liveness file.
 """
 
+MKN_HEALTH_CHECKS_WORKER_EVENT_LOOP_LAG_INTERVAL_SECONDS: float = 1
+"""
+Interval in seconds of the timer that measures the lag of the event loop.
+
+The :class:`maykin_common.health_checks.celery.probes.EventLoopProbe` records how late
+this timer fires. The samples of the last
+``MKN_HEALTH_CHECKS_WORKER_EVENT_LOOP_PROBE_FREQUENCY_SECONDS`` are summarized in the
+liveness file, for ``maykin-common worker-health-check --max-lag``.
+"""
+
 MKN_HEALTH_CHECKS_WORKER_READINESS_FILE: Path = Path("/tmp") / "celery_worker_ready"
 """
 Path to the file that acts as a readiness marker of Celery Worker.
@@ -106,11 +117,231 @@ that a connection with the broker is established and tasks can be processed.
 When the worker shuts down, the file is unlinked.
 """
 
+MKN_HEALTH_CHECKS_CACHE_TIMEOUT: float = 5
+"""
+Seconds to reuse the results of the health checks for.
+
+Used by :class:`maykin_common.health_checks.views.CachedHealthCheckView`, and so by the
+``/_healthz/`` and ``/_healthz/readyz/`` endpoints of
+:mod:`maykin_common.health_checks.urls`. Concurrent requests wait for the evaluation in
+progress. Set to ``0`` to run the checks on every request.
+"""
+
+MKN_HEALTH_CHECKS_CACHE_ALIAS: str | None = None
+"""
+Alias of the Django cache to share the health check results between processes in.
+
+By default, every process keeps its own results in memory.
+"""
+
+MKN_HEALTH_CHECKS_LIVENESS_PATH: str = "/_healthz/livez/"
+"""
+Path that :mod:`maykin_common.health_checks.liveness` answers before Django handles the
+request.
+
+Relative to the mount point of the application, like the paths in the URL conf.
+"""
+
+MKN_HEALTH_CHECKS_MAX_WORKERS: int = 4
+"""
+Number of threads to run the synchronous health checks in.
+
+Used by :class:`maykin_common.health_checks.views.ConcurrentHealthCheckView`. The pool
+is shared by all requests of a process, so probes cannot pile up threads on a slow
+dependency.
+"""
+
+MKN_HEALTH_CHECKS_CHECK_TIMEOUT: float | None = None
+"""
+Seconds a single health check may take before it is reported as timed out.
+
+``None`` leaves it to the timeout of the check itself. A check that times out fails
+with a "Timed out after ... seconds" error, the other checks are still reported.
+"""
+
+MKN_HEALTH_CHECKS_TIMEOUT: float | None = 10
+"""
+Seconds all health checks together may take.
+
+The checks run concurrently, so this caps the deadline of every check. Keep it below the
+timeout of the probe, so the probe gets an answer that says which check is slow.
+"""
+
+MKN_HEALTH_CHECKS_WORKER_STATUS_SOCKET: Path | None = None
+"""
+Path to the Unix socket on which the Celery Worker serves its health status.
+
+Used when the :class:`maykin_common.health_checks.celery.probes.EventLoopProbe` is added
+as a Celery Worker bootstep. The worker main process then reports the last event loop
+tick, the broker connection of the consumer, the pool utilization and the readiness on
+this socket, for ``maykin-common worker-health-check --status-socket``. See
+:mod:`maykin_common.health_checks.celery.status`. Disabled by default.
+"""
+
+MKN_CLIENT_IP_TRUSTED_PROXIES: Sequence[str] = ()
+"""
+IP addresses or networks (CIDR notation) of the reverse proxies in front of the
+application.
+
+Only requests coming from these addresses are allowed to specify the client address
+through the headers in :attr:`MKN_CLIENT_IP_HEADERS`. When empty, the django-axes
+configuration determines the client address if django-axes is installed, and
+``REMOTE_ADDR`` is used as is otherwise. See :mod:`maykin_common.client_ip`.
+"""
+
+MKN_CLIENT_IP_HEADERS: Sequence[str] = ("HTTP_X_FORWARDED_FOR",)
+"""
+The ``request.META`` keys holding the forwarded client address, in order of preference.
+
+Only consulted for requests coming from one of the
+:attr:`MKN_CLIENT_IP_TRUSTED_PROXIES`.
+"""
+
+MKN_CLIENT_IP_FUNCTION: str | None = None
+"""
+Dotted path to a function that takes the request and returns the client IP address.
+
+Replaces the built-in resolver of :mod:`maykin_common.client_ip`, e.g. set it to
+``"axes.helpers.get_client_ip_address"`` to keep using the django-axes configuration
+after configuring :attr:`MKN_CLIENT_IP_TRUSTED_PROXIES`.
+"""
+
+MKN_THROTTLE_POLICIES: Mapping[str, Sequence[Mapping[str, object]]] = {}
+"""
+Throttle rules per URL name, URL route or glob pattern.
+
+Applied by :class:`maykin_common.throttling.ThrottleMiddleware` and
+:class:`maykin_common.throttling.PolicyRateThrottle`. Each rule is a mapping of the
+:class:`maykin_common.throttling.ThrottleRule` attributes (or an instance of it).
+"""
+
 MKN_YUBIN_LOCK_PATH: Path = Path("/tmp") / "send_mail"
 """
 Path to the lockfile used to prevent race conditions when sending queued messages.
 """
 
+MKN_YUBIN_CLAIM_MODE: Literal["filelock", "database"] = "filelock"
+"""
+How :func:`maykin_common.yubin.engine.send_all` prevents queued messages from being
+sent more than once.
+
+``"filelock"``
+    Only one sender runs at a time, guarded by the lock file at
+    :attr:`MKN_YUBIN_LOCK_PATH`. This only excludes senders on the same host.
+
+``"database"``
+    Senders claim batches of queued messages with ``SELECT ... FOR UPDATE SKIP LOCKED``,
+    so any number of senders on any number of hosts can drain the queue in parallel.
+    Requires a database that supports ``SKIP LOCKED``, like PostgreSQL.
+"""
+
+MKN_YUBIN_CLAIM_LEASE_SECONDS: int = 300
+"""
+How long a claimed batch of messages is reserved for the sender that claimed it. If the
+sender did not finish the batch by then (because it crashed, for example), the remaining
+messages are picked up by other senders. Make sure a batch can be sent well within this
+time.
+"""
+
+MKN_YUBIN_BATCH_SIZE: int = 100
+"""
+Number of messages that :func:`maykin_common.yubin.engine.send_all` fetches (or claims,
+see :attr:`MKN_YUBIN_CLAIM_MODE`) and sends at once. The status updates and logs of a
+batch are written together after the batch is sent.
+"""
+
+MKN_YUBIN_DELIVERY_THREADS: int = 1
+"""
+Number of threads used by :func:`maykin_common.yubin.engine.send_all` to deliver the
+queued messages. Every thread keeps its own connection to the mail server open.
+"""
+
+MKN_YUBIN_ENGINE: Literal["threads", "asyncio"] = "threads"
+"""
+How :func:`maykin_common.yubin.engine.send_all` delivers the messages.
+
+``"threads"``
+    Every delivery thread (see :attr:`MKN_YUBIN_DELIVERY_THREADS`) sends the messages
+    one by one through the email backend ``MAILER_USE_BACKEND``.
+
+``"asyncio"``
+    An event loop sends the messages over up to :attr:`MKN_YUBIN_ASYNC_CONCURRENCY`
+    concurrent SMTP connections, see :mod:`maykin_common.yubin.async_engine`. The
+    messages are delivered to the mail server of Django's ``EMAIL_*`` settings,
+    ``MAILER_USE_BACKEND`` is not used. Requires ``aiosmtplib``.
+"""
+
+MKN_YUBIN_ASYNC_CONCURRENCY: int = 50
+"""
+Maximum number of messages sent at the same time, and thus of open connections to the
+mail server, by the ``"asyncio"`` :attr:`MKN_YUBIN_ENGINE`.
+"""
+
+MKN_YUBIN_MESSAGES_PER_CONNECTION: int = 100
+"""
+Maximum number of messages sent over a single mail server connection before it is
+closed and a new connection is opened.
+"""
+
+MKN_YUBIN_RATE_LIMITS: Mapping[str, float] = {}
+"""
+Maximum number of messages per second that :func:`maykin_common.yubin.engine.send_all`
+sends, by the domain of the from address. The ``"*"`` key limits all messages sent
+through the email backend. For example:
+
+.. code-block:: python
+
+    MKN_YUBIN_RATE_LIMITS = {
+        "*": 20,
+        "newsletter.example.com": 5,
+    }
+
+The limits apply per process. When running multiple senders, divide the limit of the
+mail server by the number of senders.
+"""
+
+MKN_YUBIN_RETRY_BACKOFF: float = 60
+"""
+Number of seconds to wait before a message is sent again, after the mail server
+temporarily rejected it or when it's retried by
+:func:`maykin_common.yubin.utils.retry_messages`. The delay doubles with every attempt,
+up to :attr:`MKN_YUBIN_RETRY_BACKOFF_MAX`, and is randomized so that messages that
+failed together are not retried all at once. Set to ``0`` to retry right away.
+"""
+
+MKN_YUBIN_RETRY_BACKOFF_MAX: float = 60 * 60
+"""
+Upper bound of the delay, in seconds, between two attempts to send a message.
+"""
+
+MKN_YUBIN_MAX_DEFERRALS: int | None = 10
+"""
+Number of times a message may be deferred after the mail server rejected it
+temporarily. Checked against the number of times the message was queued
+(``enqueued_count``). Once exceeded, the next temporary rejection marks the message as
+failed with the error of the mail server, so a recipient that keeps rejecting doesn't
+keep it in the queue forever. ``None`` defers without limit.
+"""
+
+MKN_YUBIN_PAYLOAD_COMPRESSION: Literal["zlib"] = "zlib"
+"""
+Compression algorithm of
+:class:`maykin_common.yubin.storage_backends.CompressedDatabaseStorageBackend`.
+"""
+
+MKN_YUBIN_PAYLOAD_OFFLOAD_THRESHOLD: int = 64 * 1024
+"""
+Size in bytes above which
+:class:`maykin_common.yubin.storage_backends.OffloadingStorageBackend` moves a MIME part
+of a message (typically an attachment) to file storage.
+"""
+
+MKN_YUBIN_PAYLOAD_STORAGE: str = "default"
+"""
+Alias in the ``STORAGES`` setting of the file storage that holds the MIME parts moved
+by :class:`maykin_common.yubin.storage_backends.OffloadingStorageBackend`.
+"""
+
 MKN_BRANDING_PRODUCT_DEFINITION: ProductDefinition | None = None
 """
 Metadata of the white label product as developed by Maykin.
@@ -139,10 +370,36 @@ type SettingName = Literal[
     "PDF_BASE_URL_FUNCTION",
     "LOGIN_URLS",
     "MKN_HEALTH_CHECKS_BEAT_LIVENESS_FILE",
+    "MKN_HEALTH_CHECKS_CACHE_TIMEOUT",
+    "MKN_HEALTH_CHECKS_CACHE_ALIAS",
+    "MKN_HEALTH_CHECKS_LIVENESS_PATH",
+    "MKN_HEALTH_CHECKS_MAX_WORKERS",
+    "MKN_HEALTH_CHECKS_CHECK_TIMEOUT",
+    "MKN_HEALTH_CHECKS_TIMEOUT",
     "MKN_HEALTH_CHECKS_WORKER_EVENT_LOOP_LIVENESS_FILE",
     "MKN_HEALTH_CHECKS_WORKER_EVENT_LOOP_PROBE_FREQUENCY_SECONDS",
+    "MKN_HEALTH_CHECKS_WORKER_EVENT_LOOP_LAG_INTERVAL_SECONDS",
     "MKN_HEALTH_CHECKS_WORKER_READINESS_FILE",
+    "MKN_HEALTH_CHECKS_WORKER_STATUS_SOCKET",
+    "MKN_CLIENT_IP_TRUSTED_PROXIES",
+    "MKN_CLIENT_IP_HEADERS",
+    "MKN_CLIENT_IP_FUNCTION",
+    "MKN_THROTTLE_POLICIES",
     "MKN_YUBIN_LOCK_PATH",
+    "MKN_YUBIN_CLAIM_MODE",
+    "MKN_YUBIN_CLAIM_LEASE_SECONDS",
+    "MKN_YUBIN_BATCH_SIZE",
+    "MKN_YUBIN_DELIVERY_THREADS",
+    "MKN_YUBIN_ENGINE",
+    "MKN_YUBIN_ASYNC_CONCURRENCY",
+    "MKN_YUBIN_MESSAGES_PER_CONNECTION",
+    "MKN_YUBIN_RATE_LIMITS",
+    "MKN_YUBIN_RETRY_BACKOFF",
+    "MKN_YUBIN_RETRY_BACKOFF_MAX",
+    "MKN_YUBIN_MAX_DEFERRALS",
+    "MKN_YUBIN_PAYLOAD_COMPRESSION",
+    "MKN_YUBIN_PAYLOAD_OFFLOAD_THRESHOLD",
+    "MKN_YUBIN_PAYLOAD_STORAGE",
     "MKN_BRANDING_PRODUCT_DEFINITION",
     "MKN_BRANDING_DERIVED_PRODUCT_DEFINITION",
 ]
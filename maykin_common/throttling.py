@@ -1,26 +1,128 @@
 """
 Provide mixins for throttling/rate limiting in views.
 
-Depends on ``django-axes``.
-
-.. todo:: Decouple from django-axes - make IP address getter function configurable.
+The client IP address used by :class:`IPThrottleMixin` is determined by
+:func:`maykin_common.client_ip.get_client_ip_address`. Until
+:attr:`maykin_common.settings.MKN_CLIENT_IP_TRUSTED_PROXIES` is configured, that is the
+django-axes configuration when django-axes is installed.
+
+Views that can't use the mixins (function views, third-party views, Django REST
+framework endpoints...) can be throttled through :class:`ThrottleMiddleware` and
+:class:`PolicyRateThrottle`, driven by the
+:attr:`maykin_common.settings.MKN_THROTTLE_POLICIES` setting:
+
+.. code-block:: python
+
+    MIDDLEWARE = [
+        ...,
+        "maykin_common.throttling.ThrottleMiddleware",
+    ]
+
+    MKN_THROTTLE_POLICIES = {
+        # URL name, including the namespace
+        "admin:login": [{"visits": 10, "period": 60, "scope": "ip"}],
+        # URL route, as defined in the URL patterns
+        "api/v1/search": [{"visits": 100, "period": 60, "scope": "user"}],
+        # glob pattern, matched against the URL name and route
+        "api:*": [{"visits": 1000, "period": 3600, "methods": "all"}],
+    }
+
+All of these share the same counters and algorithm - a rule with the same ``name`` as
+a view's ``throttle_name`` counts towards the same quota.
+
+.. versionchanged:: 0.21.0
+
+    ``django-axes`` is no longer required.
 """
 
+import fnmatch
+import functools
+import re
 import warnings
-from collections.abc import Container
+from collections.abc import Callable, Container, Mapping, Sequence
+from dataclasses import dataclass
 from time import time
 from typing import Literal
 
 from django.core.cache import caches
 from django.core.cache.backends.base import BaseCache
 from django.core.exceptions import ImproperlyConfigured, PermissionDenied
+from django.core.signals import setting_changed
+from django.dispatch import receiver
 from django.http import HttpRequest, HttpResponse, HttpResponseBase
+from django.urls import ResolverMatch
 
-from axes.helpers import get_client_ip_address
+from .client_ip import get_client_ip_address
+from .settings import get_setting
 
 ONE_MINUTE = 60
 ONE_HOUR = ONE_MINUTE * 60
 
+type ThrottleMethods = Container[str] | Literal["all"]
+
+# get and options should always be fast. By default do not throttle them.
+DEFAULT_THROTTLE_METHODS: ThrottleMethods = (
+    "post",
+    "put",
+    "patch",
+    "delete",
+    "head",
+    "trace",
+)
+
+
+def get_throttle_window(period: int) -> int:
+    """
+    Calculate the start of the window based on the current time.
+
+    This uses the current time (unix timestamp) as input and looks up the most recent
+    moment when a non-completed block of ``period`` started. It is used as input in the
+    cache key, meaning that once ``period`` has elapsed, the throttle quota is fully
+    reinstated.
+
+    Effectively, throttle intervals are fixed and not a sliding window.
+    """
+    current_time = int(time())
+    return current_time - (current_time % period)
+
+
+def register_visit(cache: BaseCache, *, identifier: str, name: str, period: int) -> int:
+    """
+    Count a visit and return the number of visits in the current window.
+
+    This is the throttling algorithm shared by the view mixins, the middleware and the
+    Django REST framework throttle class.
+    """
+    cache_key = f"throttling_{identifier}_{name}_{get_throttle_window(period)}"
+
+    added = cache.add(cache_key, value=1, timeout=period)
+    if added:  # key added, we had no counter before -> one visit returned and stored
+        return 1
+
+    try:
+        return cache.incr(cache_key)
+    except ValueError:  # XXX: when does this happen?
+        return 1
+
+
+def get_user_identifier(request: HttpRequest) -> str:
+    return str(request.user.pk)
+
+
+def get_ip_identifier(request: HttpRequest) -> str:
+    ip_address = get_client_ip_address(request)
+    if not ip_address:
+        raise ImproperlyConfigured(
+            "Could not determine IP address. Check your reverse proxy configuration."
+        )
+    return ip_address
+
+
+IDENTIFIER_GETTERS: Mapping[str, Callable[[HttpRequest], str]] = {
+    "user": get_user_identifier,
+    "ip": get_ip_identifier,
+}
+
 
 class ThrottleMixin:
     """
@@ -70,14 +172,7 @@ class ThrottleMixin:
 
     # get and options should always be fast. By default
     # do not throttle them.
-    throttle_methods: Container[str] | Literal["all"] = (
-        "post",
-        "put",
-        "patch",
-        "delete",
-        "head",
-        "trace",
-    )
+    throttle_methods: ThrottleMethods = DEFAULT_THROTTLE_METHODS
 
     request: HttpRequest
 
@@ -96,41 +191,24 @@ class ThrottleMixin:
         return caches[self.throttle_cache]
 
     def get_throttle_identifier(self) -> str:
-        user = self.request.user
-        return str(user.pk)
+        return get_user_identifier(self.request)
 
     def _get_throttle_window(self):
         """
         Calculate the start of the window based on the current time.
 
-        This uses the current time (unix timestamp) as input and looks up the most
-        recent moment when a non-completed block of ``trottle_period`` started. It is
-        used as input in the cache key, meaning that once ``throttle_period`` has
-        elapsed, the throttle quota is fully reinstated.
-
-        Effectively, throttle intervals are fixed and not a sliding window.
+        See :func:`get_throttle_window`.
         """
-        current_time = int(time())
-        return current_time - (current_time % self.throttle_period)
+        return get_throttle_window(self.throttle_period)
 
     def _get_num_visits_in_window(self) -> int:
-        cache = self.get_throttle_cache()
-        cache_key = (
-            f"throttling_{self.get_throttle_identifier()}_"
-            f"{self.throttle_name}_{self._get_throttle_window()}"
+        return register_visit(
+            self.get_throttle_cache(),
+            identifier=self.get_throttle_identifier(),
+            name=self.throttle_name,
+            period=self.throttle_period,
         )
 
-        added = cache.add(cache_key, value=1, timeout=self.throttle_period)
-        if (
-            added
-        ):  # key added, we had no counter before -> one visit returned and stored
-            return 1
-
-        try:
-            return cache.incr(cache_key)
-        except ValueError:  # XXX: when does this happen?
-            return 1
-
     def should_be_throttled(self) -> bool:
         """
         Determine if throttling is enabled for the request.
@@ -178,10 +256,212 @@ class IPThrottleMixin(ThrottleMixin):
     """
 
     def get_throttle_identifier(self):
-        ip_address = get_client_ip_address(self.request)
-        if not ip_address:
-            raise ImproperlyConfigured(
-                "Could not determine IP address. "
-                "Check your reverse proxy configuration."
+        return get_ip_identifier(self.request)
+
+
+@dataclass(frozen=True, slots=True)
+class ThrottleRule:
+    """
+    A throttle rule, as configured in the throttle policies.
+
+    The attributes mirror those of :class:`ThrottleMixin`. See
+    :attr:`maykin_common.settings.MKN_THROTTLE_POLICIES`.
+    """
+
+    visits: int
+    """
+    Number of allowed visits in the specified period.
+    """
+
+    period: int
+    """
+    Period/time window (in seconds) in which the visits are counted.
+    """
+
+    name: str = "default"
+    """
+    Identifier for the throttle, used in the cache key. Defaults to the policy key.
+    """
+
+    scope: Literal["user", "ip"] = "ip"
+    """
+    Count the visits per user or per client IP address.
+    """
+
+    methods: ThrottleMethods = DEFAULT_THROTTLE_METHODS
+    """
+    The (lowercase) HTTP methods to throttle, or ``"all"``.
+    """
+
+    cache: str = "default"
+    """
+    Name of the cache (in ``settings.CACHES``) to use to track visits.
+    """
+
+    def __post_init__(self):
+        if self.scope not in IDENTIFIER_GETTERS:
+            raise ImproperlyConfigured(f"Unknown throttle rule scope '{self.scope}'.")
+
+    def applies_to(self, request: HttpRequest) -> bool:
+        if self.methods == "all":
+            return True
+        assert isinstance(request.method, str)
+        return request.method.lower() in self.methods
+
+    def is_exceeded(self, request: HttpRequest) -> bool:
+        """
+        Count the visit if the rule applies and check if the quota is exceeded.
+        """
+        if not self.applies_to(request):
+            return False
+        num_visits = register_visit(
+            caches[self.cache],
+            identifier=IDENTIFIER_GETTERS[self.scope](request),
+            name=self.name,
+            period=self.period,
+        )
+        return num_visits > self.visits
+
+    def seconds_until_reset(self) -> int:
+        return get_throttle_window(self.period) + self.period - int(time())
+
+
+type ThrottlePolicies = Mapping[str, Sequence[ThrottleRule | Mapping[str, object]]]
+
+
+class ThrottlePolicyTable:
+    """
+    Look up the throttle rules for a resolved URL.
+
+    The policies are compiled once - the keys are either exact URL names/routes, or
+    glob patterns (containing ``*``, ``?`` or ``[``) that are matched against both the
+    URL name and route. Exact keys take precedence over patterns, and the outcome of
+    the lookup is remembered per URL pattern so the patterns are only evaluated once.
+    """
+
+    def __init__(self, policies: ThrottlePolicies):
+        self._exact: dict[str, tuple[ThrottleRule, ...]] = {}
+        self._patterns: list[tuple[re.Pattern[str], tuple[ThrottleRule, ...]]] = []
+        self._lookups: dict[tuple[str, str], tuple[ThrottleRule, ...]] = {}
+
+        for key, rules in policies.items():
+            compiled_rules = tuple(
+                rule
+                if isinstance(rule, ThrottleRule)
+                else ThrottleRule(**{"name": key, **rule})  # pyright: ignore[reportArgumentType]
+                for rule in rules
             )
-        return ip_address
+            if any(char in key for char in "*?["):
+                self._patterns.append(
+                    (re.compile(fnmatch.translate(key)), compiled_rules)
+                )
+            else:
+                self._exact[key] = compiled_rules
+
+    def __bool__(self) -> bool:
+        return bool(self._exact or self._patterns)
+
+    def _find_rules(self, view_name: str, route: str) -> tuple[ThrottleRule, ...]:
+        for candidate in (view_name, route):
+            if candidate in self._exact:
+                return self._exact[candidate]
+        for pattern, rules in self._patterns:
+            if pattern.match(view_name) or pattern.match(route):
+                return rules
+        return ()
+
+    def lookup(self, resolver_match: ResolverMatch | None) -> tuple[ThrottleRule, ...]:
+        if resolver_match is None:
+            return ()
+        key = (resolver_match.view_name, resolver_match.route)
+        try:
+            return self._lookups[key]
+        except KeyError:
+            rules = self._lookups[key] = self._find_rules(*key)
+            return rules
+
+
+@functools.cache
+def get_policy_table() -> ThrottlePolicyTable:
+    """
+    Compile the throttle policies from the settings, once per process.
+    """
+    return ThrottlePolicyTable(get_setting("MKN_THROTTLE_POLICIES"))
+
+
+@receiver(setting_changed, dispatch_uid="maykin_common.throttling._reset_policy_table")
+def _reset_policy_table(sender, setting: str, **kwargs):
+    # mostly for tests, settings *should* not change in production code
+    match setting:
+        case "MKN_THROTTLE_POLICIES":
+            get_policy_table.cache_clear()
+        case _:  # pragma: no cover
+            pass
+
+
+class ThrottleMiddleware:
+    """
+    Apply the throttle policies to every view, based on the resolved URL.
+
+    The policies are compiled when the middleware is loaded. Requests for URLs without
+    policy are passed through without touching the cache.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.policy_table = get_policy_table()
+
+    def __call__(self, request: HttpRequest) -> HttpResponseBase:
+        return self.get_response(request)
+
+    def process_view(
+        self, request: HttpRequest, view_func, view_args, view_kwargs
+    ) -> HttpResponseBase | None:
+        for rule in self.policy_table.lookup(request.resolver_match):
+            if rule.is_exceeded(request):
+                return self.handle_rate_limit_exceeded(request, rule)
+        return None
+
+    def handle_rate_limit_exceeded(
+        self, request: HttpRequest, rule: ThrottleRule
+    ) -> HttpResponseBase:
+        """
+        Return the appropriate response for throttled requests.
+
+        Override this to customize behaviour. By default, an HTTP 429 response is
+        returned.
+        """
+        return HttpResponse("rate limit exceeded", status=429)
+
+
+class PolicyRateThrottle:
+    """
+    Django REST framework throttle class applying the throttle policies.
+
+    Add it to the ``DEFAULT_THROTTLE_CLASSES`` or a view's ``throttle_classes``.
+    The rules are looked up in the same policy table as :class:`ThrottleMiddleware`
+    uses, unless ``rules`` is specified on a subclass. Don't combine it with the
+    middleware for the same URLs, or visits are counted twice.
+    """
+
+    rules: Sequence[ThrottleRule] | None = None
+
+    _wait: int | None = None
+
+    def get_rules(self, request, view) -> Sequence[ThrottleRule]:
+        if self.rules is not None:
+            return self.rules
+        return get_policy_table().lookup(request.resolver_match)
+
+    def allow_request(self, request, view) -> bool:
+        # work with the Django request rather than the DRF wrapper - DRF sets the
+        # authenticated user on it too
+        django_request = getattr(request, "_request", request)
+        for rule in self.get_rules(request, view):
+            if rule.is_exceeded(django_request):
+                self._wait = rule.seconds_until_reset()
+                return False
+        return True
+
+    def wait(self) -> int | None:
+        return self._wait
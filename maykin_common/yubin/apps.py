@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class YubinConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "maykin_common.yubin"
+
+    def ready(self):
+        from . import checks  # noqa
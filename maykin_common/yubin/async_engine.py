@@ -0,0 +1,351 @@
+"""
+Deliver the queued messages with asyncio.
+
+Select this engine with :attr:`maykin_common.settings.MKN_YUBIN_ENGINE`. Rather than a
+thread per connection, a single event loop keeps up to
+:attr:`maykin_common.settings.MKN_YUBIN_ASYNC_CONCURRENCY` SMTP sessions busy, which
+suits mail servers that take their time to accept a message. Requires ``aiosmtplib``,
+included in the ``yubin`` extra.
+
+The messages are fetched and recorded in batches, like
+:func:`maykin_common.yubin.engine.send_all` does, from the thread that runs
+``send_all`` (through :func:`asgiref.sync.sync_to_async`). While the messages of a batch
+are being sent, the next batch is fetched already. The statuses, logs, locking and
+claims are the same as for the threaded engine.
+
+The stored messages are sent as is to the mail server of Django's ``EMAIL_HOST``,
+``EMAIL_PORT``, ``EMAIL_HOST_USER``, ``EMAIL_HOST_PASSWORD``, ``EMAIL_USE_TLS``,
+``EMAIL_USE_SSL``, ``EMAIL_SSL_CERTFILE``, ``EMAIL_SSL_KEYFILE`` and ``EMAIL_TIMEOUT``
+settings - the email backend of ``MAILER_USE_BACKEND`` is not used.
+"""
+
+import asyncio
+import contextlib
+import functools
+import logging
+from collections import defaultdict
+from collections.abc import AsyncIterator, Awaitable, Callable, Sequence
+from dataclasses import dataclass
+
+from django.conf import settings
+from django.core.mail.message import sanitize_address
+from django.core.mail.utils import DNS_NAME
+
+import aiosmtplib
+from asgiref.sync import async_to_sync, sync_to_async
+from django_yubin.models import Message
+
+from ..settings import get_setting
+from .engine import (
+    CONNECTION_ERRORS,
+    DeliveryBudget,
+    Outcomes,
+    RateLimiter,
+    add_failure,
+    claim_messages,
+    fetch_claimed_messages,
+    fetch_queued_messages,
+    get_rate_limiter,
+    is_temporary_failure as is_temporary_smtplib_failure,
+    record_claimed_outcomes,
+    record_queued_outcomes,
+    screen_messages,
+)
+
+logger = logging.getLogger(__name__)
+
+__all__ = ["deliver_claimed", "deliver_queued"]
+
+
+@dataclass
+class Envelope:
+    message: Message
+    sender: str
+    recipients: list[str]
+    data: bytes
+
+    @classmethod
+    def from_message(cls, message: Message) -> "Envelope":
+        # like django.core.mail.backends.smtp.EmailBackend._send
+        encoding = settings.DEFAULT_CHARSET
+        return cls(
+            message=message,
+            sender=sanitize_address(message.from_address, encoding),
+            recipients=[
+                sanitize_address(address, encoding) for address in message.recipients()
+            ],
+            data=message.message_data.encode(encoding),
+        )
+
+
+def is_temporary_failure(exc: Exception) -> bool:
+    """
+    Check whether the mail server rejected the message for now, with a 4xx reply.
+    """
+    match exc:
+        case aiosmtplib.SMTPResponseException(code=code):
+            return 400 <= code < 500
+        case aiosmtplib.SMTPRecipientsRefused(recipients=recipients) if recipients:
+            return all(400 <= recipient.code < 500 for recipient in recipients)
+        case _:
+            return is_temporary_smtplib_failure(exc)
+
+
+class AsyncConnection:
+    """
+    SMTP session that stays open to send many messages.
+
+    The asyncio counterpart of :class:`maykin_common.yubin.engine.PersistentConnection`.
+    """
+
+    def __init__(self, max_messages: int, local_hostname: str):
+        self.max_messages = max_messages
+        self.local_hostname = local_hostname
+        self._client: aiosmtplib.SMTP | None = None
+        self._num_sent = 0
+
+    async def _get_client(self) -> aiosmtplib.SMTP:
+        if self._client is not None and self._num_sent >= self.max_messages:
+            await self.close()
+        if self._client is None:
+            client = aiosmtplib.SMTP(
+                hostname=settings.EMAIL_HOST,
+                port=settings.EMAIL_PORT,
+                username=settings.EMAIL_HOST_USER or None,
+                password=settings.EMAIL_HOST_PASSWORD or None,
+                use_tls=settings.EMAIL_USE_SSL,
+                start_tls=settings.EMAIL_USE_TLS,
+                client_cert=settings.EMAIL_SSL_CERTFILE,
+                client_key=settings.EMAIL_SSL_KEYFILE,
+                timeout=settings.EMAIL_TIMEOUT,
+                local_hostname=self.local_hostname,
+            )
+            await client.connect()
+            self._client = client
+        return self._client
+
+    async def close(self) -> None:
+        if self._client is None:
+            return
+        try:
+            await self._client.quit()
+        except Exception:
+            logger.warning("email_connection_close_failed", exc_info=True)
+            self._client.close()
+        self._client = None
+        self._num_sent = 0
+
+    async def _send(self, envelope: Envelope) -> None:
+        client = await self._get_client()
+        await client.sendmail(envelope.sender, envelope.recipients, envelope.data)
+
+    async def send(self, envelope: Envelope) -> None:
+        try:
+            await self._send(envelope)
+        except CONNECTION_ERRORS:
+            logger.info("email_connection_lost", exc_info=True)
+            await self.close()
+            await self._send(envelope)
+        self._num_sent += 1
+
+
+class ConnectionPool:
+    """
+    Hand out up to ``size`` connections, each to a single sender at a time.
+
+    Senders wait for a connection when all of them are in use. The most recently used
+    connection is handed out first, so that idle connections are recycled by the mail
+    server rather than kept open.
+    """
+
+    def __init__(self, size: int, max_messages: int, local_hostname: str):
+        self._semaphore = asyncio.Semaphore(size)
+        self._max_messages = max_messages
+        self._local_hostname = local_hostname
+        self._connections: list[AsyncConnection] = []
+        self._idle: list[AsyncConnection] = []
+
+    @contextlib.asynccontextmanager
+    async def acquire(self) -> AsyncIterator[AsyncConnection]:
+        async with self._semaphore:
+            if self._idle:
+                connection = self._idle.pop()
+            else:
+                connection = AsyncConnection(self._max_messages, self._local_hostname)
+                self._connections.append(connection)
+            try:
+                yield connection
+            finally:
+                self._idle.append(connection)
+
+    async def close(self) -> None:
+        await asyncio.gather(*(connection.close() for connection in self._connections))
+
+
+async def send_envelopes(
+    envelopes: Sequence[Envelope],
+    pool: ConnectionPool,
+    budget: DeliveryBudget,
+    rate_limiter: RateLimiter,
+) -> tuple[Outcomes, list[Message]]:
+    """
+    Send a batch of messages concurrently, without touching the database.
+
+    The asyncio counterpart of :func:`maykin_common.yubin.engine.send_messages`.
+    """
+    outcomes: Outcomes = defaultdict(list)
+    unsent: list[Message] = []
+
+    async def _send(envelope: Envelope) -> None:
+        message = envelope.message
+        if (delay := rate_limiter.reserve(message.from_address)) > 0:
+            await asyncio.sleep(delay)
+        async with pool.acquire() as connection:
+            if budget.expired:
+                unsent.append(message)
+                return
+            try:
+                await connection.send(envelope)
+            except Exception as exc:
+                add_failure(outcomes, message, exc, temporary=is_temporary_failure(exc))
+                return
+        logger.info("message_sent", extra={"message_pk": message.pk})
+        outcomes[Message.STATUS_SENT].append((message, f"Message sent {message}"))
+
+    async with asyncio.TaskGroup() as task_group:
+        for envelope in envelopes:
+            task_group.create_task(_send(envelope))
+    return outcomes, unsent
+
+
+def _prepare(messages: Sequence[Message]) -> tuple[Outcomes, list[Envelope]]:
+    outcomes, sendable = screen_messages(messages)
+    return outcomes, [Envelope.from_message(message) for message in sendable]
+
+
+def _merge(outcomes: Outcomes, other: Outcomes) -> Outcomes:
+    for status, entries in other.items():
+        outcomes[status] += entries
+    return outcomes
+
+
+class _Deliveries:
+    """
+    Send the batches of a run, a few at a time.
+    """
+
+    def __init__(self, pool: ConnectionPool, budget: DeliveryBudget, concurrency: int):
+        self.pool = pool
+        self.budget = budget
+        self.rate_limiter = get_rate_limiter()
+        self.batch_size: int = get_setting("MKN_YUBIN_BATCH_SIZE")
+        # enough batches to keep all connections busy, and the next one ready
+        self._slots = asyncio.Semaphore(max(2, -(-concurrency // self.batch_size)))
+        self._tasks: list[asyncio.Task[int]] = []
+
+    async def send(self, messages: Sequence[Message]) -> tuple[Outcomes, list[Message]]:
+        outcomes, envelopes = await sync_to_async(_prepare)(messages)
+        sent, unsent = await send_envelopes(
+            envelopes, self.pool, self.budget, self.rate_limiter
+        )
+        return _merge(outcomes, sent), unsent
+
+    async def acquire_slot(self) -> None:
+        await self._slots.acquire()
+
+    def start(self, batch: Awaitable[int], task_group: asyncio.TaskGroup) -> None:
+        task = task_group.create_task(batch)
+        task.add_done_callback(lambda _: self._slots.release())
+        self._tasks.append(task)
+
+    @property
+    def processed(self) -> int:
+        return sum(task.result() for task in self._tasks)
+
+
+async def _deliver_queued(message_pks: Sequence[int], deliveries: _Deliveries) -> None:
+    async def _deliver_batch(batch: Sequence[int]) -> int:
+        messages = await sync_to_async(fetch_queued_messages)(batch)
+        outcomes, unsent = await deliveries.send(messages)
+        await sync_to_async(record_queued_outcomes)(outcomes, unsent)
+        return len(messages) - len(unsent)
+
+    async with asyncio.TaskGroup() as task_group:
+        for start in range(0, len(message_pks), deliveries.batch_size):
+            await deliveries.acquire_slot()
+            if deliveries.budget.expired:
+                break
+            batch = message_pks[start : start + deliveries.batch_size]
+            deliveries.start(_deliver_batch(batch), task_group)
+
+
+async def _deliver_claimed(owner: str, deliveries: _Deliveries) -> None:
+    lease_seconds: int = get_setting("MKN_YUBIN_CLAIM_LEASE_SECONDS")
+
+    async def _deliver_batch(message_pks: Sequence[int]) -> int:
+        messages = await sync_to_async(fetch_claimed_messages)(message_pks, owner)
+        outcomes, unsent = await deliveries.send(messages)
+        await sync_to_async(record_claimed_outcomes)(
+            message_pks, owner, outcomes, unsent
+        )
+        return len(messages) - len(unsent)
+
+    async with asyncio.TaskGroup() as task_group:
+        while True:
+            await deliveries.acquire_slot()
+            if not (size := deliveries.budget.take(deliveries.batch_size)):
+                break
+            message_pks = await sync_to_async(claim_messages)(
+                owner, batch_size=size, lease_seconds=lease_seconds
+            )
+            if not message_pks:
+                break
+            deliveries.start(_deliver_batch(message_pks), task_group)
+
+
+def _run(
+    deliver: Callable[[_Deliveries], Awaitable[None]], budget: DeliveryBudget
+) -> int:
+    concurrency: int = get_setting("MKN_YUBIN_ASYNC_CONCURRENCY")
+    # resolving the host name blocks, do it before the event loop runs
+    local_hostname = DNS_NAME.get_fqdn()
+
+    async def _main() -> int:
+        pool = ConnectionPool(
+            size=concurrency,
+            max_messages=get_setting("MKN_YUBIN_MESSAGES_PER_CONNECTION"),
+            local_hostname=local_hostname,
+        )
+        deliveries = _Deliveries(pool, budget, concurrency)
+        try:
+            await deliver(deliveries)
+        finally:
+            await pool.close()
+        return deliveries.processed
+
+    # the database is accessed from the calling thread, in its transaction
+    return async_to_sync(_main)()
+
+
+def deliver_queued(message_pks: Sequence[int], budget: DeliveryBudget) -> int:
+    """
+    Send the queued messages ``message_pks``, in batches.
+
+    Used by :func:`maykin_common.yubin.engine.send_all` while it holds the lock file.
+
+    :returns: The number of processed messages.
+    """
+    return _run(functools.partial(_deliver_queued, message_pks), budget)
+
+
+def deliver_claimed(owner: str, budget: DeliveryBudget) -> int:
+    """
+    Claim and send batches of messages until the queue is drained or the budget is
+    spent.
+
+    Used by :func:`maykin_common.yubin.engine.send_all` in the ``"database"`` claim
+    mode.
+
+    :returns: The number of processed messages.
+    """
+    return _run(functools.partial(_deliver_claimed, owner), budget)
@@ -3,7 +3,7 @@ from collections.abc import Iterable
 from django.core.mail import EmailMessage
 from django.core.mail.backends.base import BaseEmailBackend
 
-from .utils import queue_email_message
+from .utils import queue_email_messages
 
 
 class QueuedEmailBackend(BaseEmailBackend):
@@ -11,7 +11,8 @@ class QueuedEmailBackend(BaseEmailBackend):
     Queue emails without dispatching a celery task.
 
     Copied from :class:`django_yubin.backends.QueuedEmailBackend`. It replaces the
-    ``queue_email_message`` usage with our own variant.
+    ``queue_email_message`` usage with our own bulk variant,
+    :func:`maykin_common.yubin.utils.queue_email_messages`.
     """
 
     def send_messages(self, email_messages: Iterable[EmailMessage]) -> int:
@@ -22,4 +23,4 @@ class QueuedEmailBackend(BaseEmailBackend):
         of Django's core mail ``EmailMessage`` class.
         """
 
-        return sum(map(queue_email_message, email_messages))
+        return queue_email_messages(email_messages)
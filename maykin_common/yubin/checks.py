@@ -0,0 +1,30 @@
+"""
+System checks of the django-yubin settings.
+"""
+
+from collections.abc import Sequence
+
+from django.apps import AppConfig
+from django.core.checks import Error, register
+
+from ..settings import get_setting
+from .storage_backends import CODECS
+
+
+@register
+def check_payload_compression(app_configs: Sequence[AppConfig] | None, **kwargs):
+    """
+    Check that the payload compression algorithm is supported.
+
+    Otherwise, the first message that is queued fails to be stored.
+    """
+    name = get_setting("MKN_YUBIN_PAYLOAD_COMPRESSION")
+    if name in CODECS:
+        return []
+    return [
+        Error(
+            f"Unknown compression algorithm {name!r} in MKN_YUBIN_PAYLOAD_COMPRESSION.",
+            hint=f"Use one of: {', '.join(CODECS)}.",
+            id="maykin.E001",
+        )
+    ]
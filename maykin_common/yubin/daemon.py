@@ -0,0 +1,176 @@
+"""
+Resident email sender, woken up as soon as messages are queued.
+
+On PostgreSQL, queueing a message emits a ``NOTIFY`` on :data:`NOTIFY_CHANNEL`, which
+the database only delivers when the transaction commits. The daemon ``LISTEN`` s on
+that channel and sends the queued messages right away. On other databases, and with
+psycopg versions before 3.2 (or psycopg2), the daemon falls back to polling the queue.
+"""
+
+import functools
+import logging
+import threading
+import time
+
+from django.db import connections, router
+from django.db.backends.base.base import BaseDatabaseWrapper
+
+from django_yubin.models import Message
+
+from .engine import send_all
+
+logger = logging.getLogger(__name__)
+
+NOTIFY_CHANNEL = "maykin_common_yubin_queued"
+
+
+def notify_queued(using: str | None = None) -> None:
+    """
+    Wake up the sender daemons listening for queued messages.
+
+    The notification is delivered when the current transaction is committed, and
+    discarded if it's rolled back. Multiple notifications in the same transaction are
+    folded into one by the database. This is a no-op on databases other than
+    PostgreSQL.
+    """
+    connection = connections[using or router.db_for_write(Message)]
+    if connection.vendor != "postgresql":
+        return
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT pg_notify(%s, '')", [NOTIFY_CHANNEL])
+
+
+def can_listen(connection: BaseDatabaseWrapper) -> bool:
+    """
+    Check whether the daemon can wait for notifications on ``connection``.
+
+    Waiting for a notification with a timeout requires psycopg 3.2 or newer.
+    """
+    if connection.vendor != "postgresql":
+        return False
+    from django.db.backends.postgresql.psycopg_any import is_psycopg3
+
+    if not is_psycopg3:
+        return False
+    import psycopg
+
+    major, minor, *_ = psycopg.__version__.split(".")
+    return (int(major), int(minor)) >= (3, 2)
+
+
+class SenderDaemon:
+    """
+    Keep sending queued messages until :meth:`stop` is called.
+
+    :param poll_interval: Maximum number of seconds between two runs of
+      :func:`maykin_common.yubin.engine.send_all`. Without ``LISTEN``/``NOTIFY``
+      support, this is the delivery latency.
+    :param threads: Passed to :func:`maykin_common.yubin.engine.send_all`.
+    :param max_messages: Passed to :func:`maykin_common.yubin.engine.send_all`, limits
+      a single run.
+    :param time_budget: Passed to :func:`maykin_common.yubin.engine.send_all`, limits a
+      single run.
+    """
+
+    # upper bound on how long a stop request may go unnoticed
+    wait_slice = 1.0
+
+    def __init__(
+        self,
+        poll_interval: float = 5.0,
+        threads: int | None = None,
+        max_messages: int | None = None,
+        time_budget: float | None = None,
+    ):
+        self.poll_interval = poll_interval
+        self.threads = threads
+        self.max_messages = max_messages
+        self.time_budget = time_budget
+        self._stop = threading.Event()
+        self._listening_on = None
+
+    @property
+    def connection(self):
+        return connections[router.db_for_write(Message)]
+
+    @functools.cached_property
+    def listens(self) -> bool:
+        return can_listen(self.connection)
+
+    def stop(self, *args) -> None:
+        """
+        Request the daemon to stop after the current run. Usable as signal handler.
+        """
+        logger.info("sender_daemon_stopping")
+        self._stop.set()
+
+    @property
+    def stopped(self) -> bool:
+        return self._stop.is_set()
+
+    def run(self) -> None:
+        logger.info(
+            "sender_daemon_started",
+            extra={"poll_interval": self.poll_interval, "listen": self.listens},
+        )
+        if self.connection.vendor == "postgresql" and not self.listens:
+            logger.warning(
+                "sender_daemon_polling",
+                extra={"reason": "LISTEN/NOTIFY requires psycopg 3.2 or newer"},
+            )
+        try:
+            while not self.stopped:
+                try:
+                    self.connection.close_if_unusable_or_obsolete()
+                    # subscribe before looking at the queue, so that nothing queued
+                    # in the meantime goes unnoticed
+                    self._listen()
+                    send_all(
+                        threads=self.threads,
+                        max_messages=self.max_messages,
+                        time_budget=self.time_budget,
+                    )
+                    self.wait()
+                except Exception:
+                    logger.exception("sender_daemon_iteration_failed")
+                    # a broken connection must not keep the daemon busy looping
+                    self.connection.close()
+                    self._listening_on = None
+                    self._stop.wait(self.poll_interval)
+        finally:
+            self.connection.close()
+            logger.info("sender_daemon_stopped")
+
+    def wait(self) -> None:
+        """
+        Block until messages were queued, the poll interval passed or a stop request.
+        """
+        deadline = time.monotonic() + self.poll_interval
+        while not self.stopped:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return
+            timeout = min(remaining, self.wait_slice)
+            if not self.listens:
+                self._stop.wait(timeout)
+            elif self._wait_for_notification(timeout):
+                logger.debug("sender_daemon_notified")
+                return
+
+    def _listen(self) -> None:
+        if not self.listens:
+            return
+        connection = self.connection
+        connection.ensure_connection()
+        # (re-)subscribe on every new database connection
+        if self._listening_on is not connection.connection:
+            with connection.cursor() as cursor:
+                cursor.execute(f"LISTEN {NOTIFY_CHANNEL}")
+            self._listening_on = connection.connection
+
+    def _wait_for_notification(self, timeout: float) -> bool:
+        self._listen()
+        notified = False
+        for _ in self.connection.connection.notifies(timeout=timeout, stop_after=1):
+            notified = True
+        return notified
@@ -1,22 +1,796 @@
+import contextvars
+import functools
+import itertools
 import logging
+import os
+import queue
+import random
+import smtplib
+import socket
+import threading
 import time
+import uuid
+from collections import defaultdict
+from collections.abc import Callable, Mapping, Sequence
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from email.utils import parseaddr
 
-from django_yubin.engine import send_db_message
-from django_yubin.models import Message
+from django.core.mail import EmailMessage, get_connection
+from django.core.mail.backends.base import BaseEmailBackend
+from django.core.signals import setting_changed
+from django.db import connection as db_connection, transaction
+from django.db.models import F, Q
+from django.dispatch import receiver
+from django.utils import timezone
+
+from django_yubin import settings as yubin_settings
+from django_yubin.models import Blacklist, Log, Message
 from filelock import FileLock, Timeout
 
 from ..settings import get_setting
+from .logs import LogBuffer
+from .metrics import record_deliveries, tracer
+from .models import MessageDelivery
 
 logger = logging.getLogger(__name__)
 
+# Errors after which the connection can't be used anymore, but a new connection may
+# very well succeed.
+CONNECTION_ERRORS = (smtplib.SMTPServerDisconnected, ConnectionError, TimeoutError)
+
+# The fields needed to send a message and describe it in the log
+SEND_FIELDS = (
+    "to_address",
+    "cc_address",
+    "bcc_address",
+    "from_address",
+    "subject",
+    "_message_data",
+    "storage",
+    "status",
+    "enqueued_count",
+    "date_enqueued",
+)
+
+type Outcomes = dict[int, list[tuple[Message, str]]]
+
+
+class PersistentConnection:
+    """
+    Email backend connection that stays open to send many messages per session.
+
+    The connection is opened on first use and recycled after ``max_messages`` messages,
+    since mail servers tend to limit the amount of messages per session. When the
+    connection turns out to be broken, it is re-established and the message is sent
+    once more.
+    """
+
+    def __init__(self, max_messages: int):
+        self.max_messages = max_messages
+        self._connection: BaseEmailBackend | None = None
+        self._num_sent = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def _get_connection(self) -> BaseEmailBackend:
+        if self._connection is not None and self._num_sent >= self.max_messages:
+            self.close()
+        if self._connection is None:
+            self._connection = get_connection(backend=yubin_settings.USE_BACKEND)
+            self._connection.open()
+        return self._connection
+
+    def close(self) -> None:
+        if self._connection is None:
+            return
+        try:
+            self._connection.close()
+        except Exception:
+            logger.warning("email_connection_close_failed", exc_info=True)
+        self._connection = None
+        self._num_sent = 0
+
+    def send(self, email_message: EmailMessage) -> int:
+        try:
+            num_sent = self._get_connection().send_messages([email_message])
+        except CONNECTION_ERRORS:
+            logger.info("email_connection_lost", exc_info=True)
+            self.close()
+            num_sent = self._get_connection().send_messages([email_message])
+        self._num_sent += 1
+        return num_sent
+
+
+class DeliveryBudget:
+    """
+    Limit the number of messages and the time spent in a single run.
+
+    The budget is shared by all delivery threads of a run.
+    """
+
+    def __init__(self, max_messages: int | None, time_budget: float | None):
+        self._remaining = max_messages
+        self._deadline = (
+            time.monotonic() + time_budget if time_budget is not None else None
+        )
+        self._lock = threading.Lock()
+
+    @property
+    def expired(self) -> bool:
+        return self._deadline is not None and time.monotonic() >= self._deadline
+
+    def take(self, count: int) -> int:
+        """
+        Reserve up to ``count`` messages, returning how many may be sent.
+        """
+        if self.expired:
+            return 0
+        with self._lock:
+            if self._remaining is None:
+                return count
+            count = min(count, self._remaining)
+            self._remaining -= count
+            return count
 
-def send_all() -> None:
+
+class TokenBucket:
+    """
+    Allow ``rate`` events per second on average, in bursts of up to ``capacity``.
+
+    Thread-safe, the bucket can be shared by all delivery threads.
+    """
+
+    def __init__(self, rate: float, capacity: float | None = None):
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else max(rate, 1)
+        self._tokens = self.capacity
+        self._updated_at = time.monotonic()
+        self._lock = threading.Lock()
+
+    def reserve(self) -> float:
+        """
+        Take a token, returning the number of seconds to wait before using it.
+        """
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(
+                self.capacity, self._tokens + (now - self._updated_at) * self.rate
+            )
+            self._updated_at = now
+            # go into debt rather than retrying, so that waiting threads are served in
+            # order
+            self._tokens -= 1
+            return max(-self._tokens / self.rate, 0)
+
+
+class RateLimiter:
+    """
+    Limit the rate of messages per domain of the from address.
+
+    :param limits: Messages per second by domain, ``"*"`` applies to all messages.
+    """
+
+    def __init__(self, limits: Mapping[str, float]):
+        self._buckets = {
+            domain.lower(): TokenBucket(rate) for domain, rate in limits.items()
+        }
+
+    def reserve(self, from_address: str) -> float:
+        """
+        Reserve the sending of a message from ``from_address``, returning the number of
+        seconds to wait before sending it.
+        """
+        if not self._buckets:
+            return 0
+        domain = parseaddr(from_address)[1].rpartition("@")[2].lower()
+        delay = max(
+            (
+                bucket.reserve()
+                for key in ("*", domain)
+                if (bucket := self._buckets.get(key)) is not None
+            ),
+            default=0,
+        )
+        if delay > 0:
+            logger.debug("message_rate_limited", extra={"delay": delay})
+        return delay
+
+    def wait(self, from_address: str) -> None:
+        """
+        Block until a message from ``from_address`` may be sent.
+
+        Don't wait inside a transaction, any locks it holds would be held while
+        sleeping.
+        """
+        if (delay := self.reserve(from_address)) > 0:
+            time.sleep(delay)
+
+
+@functools.cache
+def get_rate_limiter() -> RateLimiter:
+    """
+    Get the rate limiter shared by all senders of this process.
+    """
+    return RateLimiter(get_setting("MKN_YUBIN_RATE_LIMITS"))
+
+
+@receiver(
+    setting_changed, dispatch_uid="maykin_common.yubin.engine._reset_rate_limiter"
+)
+def _reset_rate_limiter(sender, setting: str, **kwargs):
+    # mostly for tests, settings *should* not change in production code
+    match setting:
+        case "MKN_YUBIN_RATE_LIMITS":
+            get_rate_limiter.cache_clear()
+        case _:  # pragma: no cover
+            pass
+
+
+def is_temporary_failure(exc: Exception) -> bool:
+    """
+    Check whether the mail server rejected the message for now, with a 4xx reply.
+    """
+    match exc:
+        case smtplib.SMTPResponseException(smtp_code=code):
+            return 400 <= code < 500
+        case smtplib.SMTPRecipientsRefused(recipients=recipients) if recipients:
+            return all(400 <= code < 500 for code, _ in recipients.values())
+        case _:
+            return False
+
+
+def backoff_delay(attempt: int) -> timedelta:
+    """
+    Get the delay before the next attempt to send a message that was sent ``attempt``
+    times before.
+
+    The delay grows exponentially, and half of it is random so that the messages that
+    failed together are spread out.
+    """
+    base: float = get_setting("MKN_YUBIN_RETRY_BACKOFF")
+    if not base:
+        return timedelta(0)
+    delay = min(
+        base * 2 ** min(max(attempt - 1, 0), 32),
+        get_setting("MKN_YUBIN_RETRY_BACKOFF_MAX"),
+    )
+    return timedelta(seconds=delay / 2 + random.uniform(0, delay / 2))
+
+
+def schedule_next_attempts(
+    attempts: Mapping[int, int], owner: str | None = None
+) -> dict[int, datetime]:
+    """
+    Postpone the next attempt to send the queued messages, using :func:`backoff_delay`.
+
+    :param attempts: The number of attempts so far by message PK.
+    :param owner: Only schedule the messages that are still claimed by this sender,
+      and release the claims.
+    :returns: The moments of the next attempts by message PK.
+    """
+    if owner is not None:
+        claimed = set(
+            MessageDelivery.objects.filter(
+                message__in=list(attempts), claimed_by=owner
+            ).values_list("message_id", flat=True)
+        )
+        attempts = {pk: count for pk, count in attempts.items() if pk in claimed}
+
+    now = timezone.now()
+    next_attempts = {pk: now + backoff_delay(count) for pk, count in attempts.items()}
+    MessageDelivery.objects.bulk_create(
+        [
+            MessageDelivery(message_id=pk, next_attempt_at=next_attempt_at)
+            for pk, next_attempt_at in next_attempts.items()
+        ],
+        update_conflicts=True,
+        unique_fields=["message"],
+        update_fields=["claimed_by", "lease_expires_at", "next_attempt_at"],
+    )
+    return next_attempts
+
+
+def _is_due(now: datetime) -> Q:
+    return Q(delivery__next_attempt_at__isnull=True) | Q(
+        delivery__next_attempt_at__lte=now
+    )
+
+
+def claim_messages(owner: str, batch_size: int, lease_seconds: int) -> list[int]:
+    """
+    Claim a batch of queued messages for delivery by ``owner``.
+
+    The rows are selected with ``FOR UPDATE SKIP LOCKED``, so concurrent senders never
+    claim the same messages. Claimed messages are marked as in process, with a lease
+    that expires after ``lease_seconds``. Messages of which the lease expired are
+    considered abandoned and are claimed again. Messages that are backing off after a
+    failed attempt are skipped until their next attempt is due.
+
+    :returns: The PKs of the claimed messages, empty if there is nothing left to send.
+    """
+    now = timezone.now()
+    with transaction.atomic():
+        message_pks = list(
+            Message.objects.select_for_update(skip_locked=True, of=("self",))
+            .filter(
+                Q(_is_due(now), status=Message.STATUS_QUEUED)
+                | Q(
+                    status=Message.STATUS_IN_PROCESS,
+                    delivery__lease_expires_at__lt=now,
+                )
+            )
+            .order_by("pk")
+            .values_list("pk", flat=True)[:batch_size]
+        )
+        if not message_pks:
+            return []
+
+        Message.objects.filter(pk__in=message_pks).update(
+            status=Message.STATUS_IN_PROCESS
+        )
+        lease_expires_at = now + timedelta(seconds=lease_seconds)
+        MessageDelivery.objects.bulk_create(
+            [
+                MessageDelivery(
+                    message_id=message_pk,
+                    claimed_by=owner,
+                    lease_expires_at=lease_expires_at,
+                )
+                for message_pk in message_pks
+            ],
+            update_conflicts=True,
+            unique_fields=["message"],
+            update_fields=["claimed_by", "lease_expires_at"],
+        )
+        logs = LogBuffer()
+        for message_pk in message_pks:
+            logs.add(
+                Log(
+                    message_id=message_pk,
+                    action=Message.STATUS_IN_PROCESS,
+                    log_message=f"Claimed for delivery by {owner}.",
+                )
+            )
+        logs.flush()
+
+    logger.debug("messages_claimed", extra={"owner": owner, "count": len(message_pks)})
+    return message_pks
+
+
+def screen_messages(messages: Sequence[Message]) -> tuple[Outcomes, list[Message]]:
+    """
+    Set aside the messages that must not be sent, without touching the mail server.
+
+    The blacklist is checked with a single query for the whole batch. Messages to
+    blacklisted recipients are blacklisted, and all messages are discarded while
+    sending is paused.
+
+    :returns: The outcomes of the messages that were set aside, and the messages to
+      send.
+    """
+    outcomes: Outcomes = defaultdict(list)
+    recipients = {message.pk: message.recipients() for message in messages}
+    blacklist = set(
+        Blacklist.objects.filter(
+            email__in=set(itertools.chain.from_iterable(recipients.values()))
+        ).values_list("email", flat=True)
+    )
+    # read once per batch, the setting may be changed at runtime
+    pause_send = yubin_settings.PAUSE_SEND
+
+    sendable: list[Message] = []
+    for message in messages:
+        message_recipients = recipients[message.pk]
+        if blacklist.intersection(message_recipients):
+            logger.info("message_blacklisted", extra={"message_pk": message.pk})
+            outcomes[Message.STATUS_BLACKLISTED].append(
+                (message, f"Not sending due blacklisted email in: {message_recipients}")
+            )
+        elif pause_send:
+            logger.info("message_discarded", extra={"message_pk": message.pk})
+            outcomes[Message.STATUS_DISCARDED].append(
+                (message, "Sending is paused, discarding the email.")
+            )
+        else:
+            sendable.append(message)
+    return outcomes, sendable
+
+
+def add_failure(
+    outcomes: Outcomes, message: Message, exc: Exception, temporary: bool
+) -> None:
+    """
+    Add the outcome of a message that could not be sent because of ``exc``.
+
+    Messages that the mail server rejected temporarily are deferred, unless they were
+    queued more than :attr:`maykin_common.settings.MKN_YUBIN_MAX_DEFERRALS` times
+    already. The others failed.
+    """
+    max_deferrals: int | None = get_setting("MKN_YUBIN_MAX_DEFERRALS")
+    if temporary and (max_deferrals is None or message.enqueued_count <= max_deferrals):
+        logger.warning(
+            "message_deferred", extra={"message_pk": message.pk, "error": str(exc)}
+        )
+        outcomes[Message.STATUS_QUEUED].append(
+            (message, f"Deferred by the mail server: {exc}")
+        )
+    else:
+        logger.error(
+            "message_sending_failed",
+            extra={"email_message": message},
+            exc_info=exc,
+        )
+        outcomes[Message.STATUS_FAILED].append((message, str(exc)))
+
+
+def send_messages(
+    messages: Sequence[Message],
+    connection: PersistentConnection,
+    budget: DeliveryBudget | None = None,
+    rate_limiter: RateLimiter | None = None,
+) -> tuple[Outcomes, list[Message]]:
+    """
+    Send a batch of messages over ``connection``, without touching the database.
+
+    The messages are screened first, see :func:`screen_messages`. When the ``budget``
+    runs out of time, the remaining messages are not sent. Messages that the mail
+    server rejects temporarily are deferred: they go back to the queue
+    (:attr:`Message.STATUS_QUEUED`) rather than failing.
+
+    :param rate_limiter: Wait for the rate limiter before sending every message.
+    :returns: The sent (or otherwise processed) messages with the log message,
+      grouped by their new status, and the messages that were not processed.
+    """
+    outcomes, sendable = screen_messages(messages)
+
+    for index, message in enumerate(sendable):
+        if budget is not None and budget.expired:
+            return outcomes, sendable[index:]
+
+        if rate_limiter is not None:
+            rate_limiter.wait(message.from_address)
+            if budget is not None and budget.expired:
+                return outcomes, sendable[index:]
+
+        try:
+            connection.send(message.get_email_message())
+        except Exception as exc:
+            add_failure(outcomes, message, exc, temporary=is_temporary_failure(exc))
+            continue
+
+        logger.info("message_sent", extra={"message_pk": message.pk})
+        outcomes[Message.STATUS_SENT].append((message, f"Message sent {message}"))
+
+    return outcomes, []
+
+
+def record_outcomes(outcomes: Outcomes, owner: str | None = None) -> None:
+    """
+    Write the statuses and logs of a sent batch with a query per status.
+
+    Deferred messages are queued again, with their next attempt postponed by
+    :func:`schedule_next_attempts`.
+
+    :param owner: Only update the messages that are still claimed by this sender.
+    """
+    now = timezone.now()
+    # the callers record the outcomes in a transaction, create the logs in it rather
+    # than when an enclosing buffered_logs() block exits
+    logs = LogBuffer()
+    for status, entries in outcomes.items():
+        queryset = Message.objects.filter(pk__in=[message.pk for message, _ in entries])
+        if owner is not None:
+            queryset = queryset.filter(delivery__claimed_by=owner)
+
+        if status == Message.STATUS_SENT:
+            queryset.update(
+                status=status, date_sent=now, sent_count=F("sent_count") + 1
+            )
+        elif status == Message.STATUS_QUEUED:
+            queryset.update(
+                status=status,
+                date_enqueued=now,
+                enqueued_count=F("enqueued_count") + 1,
+            )
+            schedule_next_attempts(
+                {message.pk: message.enqueued_count for message, _ in entries},
+                owner=owner,
+            )
+        else:
+            queryset.update(status=status)
+
+        for message, log_message in entries:
+            logs.add(
+                Log(
+                    message=message,
+                    action=Message.STATUS_IN_PROCESS,
+                    log_message="Trying to send the message.",
+                )
+            )
+            logs.add(Log(message=message, action=status, log_message=log_message))
+    logs.flush()
+    record_deliveries(outcomes, now)
+
+
+def fetch_queued_messages(message_pks: Sequence[int]) -> list[Message]:
+    """
+    Fetch the messages of a batch that are still queued, and mark them as in process.
+
+    The rows are only locked while they're being marked, so no transaction is held
+    open while the messages are sent. A sender that crashes halfway through a batch
+    leaves its messages in process, rather than having the next run send them again.
+    """
+    with transaction.atomic():
+        messages = list(
+            Message.objects.select_for_update(skip_locked=True)
+            .filter(pk__in=message_pks, status=Message.STATUS_QUEUED)
+            .only(*SEND_FIELDS)
+            .order_by("pk")
+        )
+        if messages:
+            Message.objects.filter(pk__in=[message.pk for message in messages]).update(
+                status=Message.STATUS_IN_PROCESS
+            )
+    return messages
+
+
+def record_queued_outcomes(outcomes: Outcomes, unsent: Sequence[Message]) -> None:
+    """
+    Record the outcomes of a batch fetched with :func:`fetch_queued_messages`, and
+    queue the unsent messages again.
+    """
+    with transaction.atomic():
+        record_outcomes(outcomes)
+        if unsent:
+            Message.objects.filter(
+                pk__in=[message.pk for message in unsent],
+                status=Message.STATUS_IN_PROCESS,
+            ).update(status=Message.STATUS_QUEUED)
+
+
+def _deliver_batch(
+    message_pks: Sequence[int],
+    connection: PersistentConnection,
+    budget: DeliveryBudget,
+) -> int:
+    """
+    Fetch, send and record a batch of queued messages.
+
+    The messages are marked as in process before they're sent, and the outcomes are
+    recorded afterwards in a transaction of their own. Messages that were not sent are
+    queued again.
+    """
+    messages = fetch_queued_messages(message_pks)
+    outcomes, unsent = send_messages(messages, connection, budget, get_rate_limiter())
+    record_queued_outcomes(outcomes, unsent)
+    return len(messages) - len(unsent)
+
+
+def fetch_claimed_messages(message_pks: Sequence[int], owner: str) -> list[Message]:
+    """
+    Fetch the messages of a batch that are still claimed by ``owner``.
+    """
+    return list(
+        Message.objects.filter(
+            pk__in=message_pks,
+            status=Message.STATUS_IN_PROCESS,
+            delivery__claimed_by=owner,
+        )
+        .only(*SEND_FIELDS)
+        .order_by("pk")
+    )
+
+
+def record_claimed_outcomes(
+    message_pks: Sequence[int],
+    owner: str,
+    outcomes: Outcomes,
+    unsent: Sequence[Message],
+) -> None:
+    """
+    Record the outcomes of a claimed batch, queue the unsent messages again and
+    release the claims.
+    """
+    with transaction.atomic():
+        record_outcomes(outcomes, owner=owner)
+        if unsent:
+            Message.objects.filter(
+                pk__in=[message.pk for message in unsent],
+                delivery__claimed_by=owner,
+            ).update(status=Message.STATUS_QUEUED)
+        MessageDelivery.objects.filter(
+            message__in=message_pks, claimed_by=owner
+        ).delete()
+
+
+def _deliver_claimed_batch(
+    message_pks: Sequence[int],
+    owner: str,
+    connection: PersistentConnection,
+    budget: DeliveryBudget,
+) -> int:
+    """
+    Fetch, send and record a batch of messages claimed by ``owner``.
+
+    The claim protects the messages while they're being sent, so no transaction is
+    held open in the meantime. Messages that were not sent are queued again.
+    """
+    messages = fetch_claimed_messages(message_pks, owner)
+    outcomes, unsent = send_messages(messages, connection, budget, get_rate_limiter())
+    record_claimed_outcomes(message_pks, owner, outcomes, unsent)
+    return len(messages) - len(unsent)
+
+
+def _get_persistent_connection() -> PersistentConnection:
+    return PersistentConnection(
+        max_messages=get_setting("MKN_YUBIN_MESSAGES_PER_CONNECTION")
+    )
+
+
+def _deliver_from_queue(
+    batches: "queue.SimpleQueue[Sequence[int] | None]", budget: DeliveryBudget
+) -> int:
+    """
+    Send batches of messages from the queue until the ``None`` sentinel is received.
+    """
+    processed = 0
+    with _get_persistent_connection() as connection:
+        while (message_pks := batches.get()) is not None:
+            if not budget.expired:
+                processed += _deliver_batch(message_pks, connection, budget)
+    return processed
+
+
+def _deliver_claimed(owner: str, budget: DeliveryBudget) -> int:
+    """
+    Claim and send batches of messages until the queue is drained or the budget is
+    spent.
+    """
+    batch_size: int = get_setting("MKN_YUBIN_BATCH_SIZE")
+    lease_seconds: int = get_setting("MKN_YUBIN_CLAIM_LEASE_SECONDS")
+    processed = 0
+    with _get_persistent_connection() as connection:
+        while (size := budget.take(batch_size)) and (
+            message_pks := claim_messages(
+                owner, batch_size=size, lease_seconds=lease_seconds
+            )
+        ):
+            processed += _deliver_claimed_batch(message_pks, owner, connection, budget)
+    return processed
+
+
+def _run_in_threads(target: Callable[[], int], threads: int) -> int:
+    """
+    Run ``target`` in ``threads`` threads and wait for all of them to finish.
+
+    Each delivery thread keeps its own email connection open, which makes up the
+    connection pool. Errors in the threads are re-raised.
+
+    :returns: The sum of the results.
+    """
+
+    def _worker() -> int:
+        try:
+            return target()
+        finally:
+            # every thread has its own database connection
+            db_connection.close()
+
+    with ThreadPoolExecutor(
+        max_workers=threads, thread_name_prefix="yubin-delivery"
+    ) as executor:
+        # run in a copy of the current context, so the spans end up in the same trace
+        futures = [
+            executor.submit(contextvars.copy_context().run, _worker)
+            for _ in range(threads)
+        ]
+        return sum(future.result() for future in futures)
+
+
+def _deliver_all(
+    message_pks: Sequence[int], threads: int, budget: DeliveryBudget
+) -> int:
+    batch_size: int = get_setting("MKN_YUBIN_BATCH_SIZE")
+    batches: queue.SimpleQueue[Sequence[int] | None] = queue.SimpleQueue()
+    for batch in itertools.batched(message_pks, batch_size):
+        batches.put(batch)
+    for _ in range(threads):
+        batches.put(None)
+
+    if threads == 1:
+        return _deliver_from_queue(batches, budget)
+    return _run_in_threads(
+        functools.partial(_deliver_from_queue, batches, budget), threads=threads
+    )
+
+
+def _send_all_claimed(threads: int, budget: DeliveryBudget, engine: str) -> int:
+    # unique per run, so that a restarted sender doesn't pick up the claims of its
+    # previous incarnation before their lease expired
+    owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+    start_time = time.time()
+    if engine == "asyncio":
+        from .async_engine import deliver_claimed
+
+        processed = deliver_claimed(owner, budget)
+    elif threads == 1:
+        processed = _deliver_claimed(owner, budget)
+    else:
+        processed = _run_in_threads(
+            functools.partial(_deliver_claimed, owner, budget), threads=threads
+        )
+    logger.debug(
+        "email_sending_completed",
+        extra={
+            "duration": time.time() - start_time,
+            "threads": threads,
+            "processed": processed,
+        },
+    )
+    return processed
+
+
+def send_all(
+    threads: int | None = None,
+    max_messages: int | None = None,
+    time_budget: float | None = None,
+) -> None:
     """
     Query all the queued messages and attempt to deliver them.
 
     This is the equivalent of the original :func:`django_yubin.tasks.send_email`.
+
+    The messages are fetched, sent and recorded in batches of
+    :attr:`maykin_common.settings.MKN_YUBIN_BATCH_SIZE` messages, using a fixed number
+    of queries per batch.
+
+    Depending on :attr:`maykin_common.settings.MKN_YUBIN_CLAIM_MODE`, concurrent runs
+    are either prevented with a lock file, or share the work by claiming batches of
+    messages in the database.
+
+    Every run is traced with a ``yubin.send_all`` span, and the outcomes are counted by
+    the instruments in :mod:`maykin_common.yubin.metrics`.
+
+    The messages are delivered by threads, or by an event loop, depending on
+    :attr:`maykin_common.settings.MKN_YUBIN_ENGINE`.
+
+    :param threads: Number of delivery threads, each with their own persistent email
+      connection. Defaults to :attr:`maykin_common.settings.MKN_YUBIN_DELIVERY_THREADS`.
+      Not used by the ``"asyncio"`` engine.
+    :param max_messages: Stop after processing this many messages.
+    :param time_budget: Stop sending after this many seconds. The messages that were
+      not sent in time are left in the queue for the next run.
     """
+    if threads is None:
+        threads = get_setting("MKN_YUBIN_DELIVERY_THREADS")
+    assert threads is not None and threads >= 1
+    budget = DeliveryBudget(max_messages=max_messages, time_budget=time_budget)
+    claim_mode = get_setting("MKN_YUBIN_CLAIM_MODE")
+    engine = get_setting("MKN_YUBIN_ENGINE")
+
+    with tracer.start_as_current_span(
+        "yubin.send_all",
+        attributes={
+            "yubin.claim_mode": claim_mode,
+            "yubin.engine": engine,
+            "yubin.threads": threads,
+        },
+    ) as span:
+        if claim_mode == "database":
+            processed = _send_all_claimed(threads, budget, engine)
+        else:
+            processed = _send_all_locked(threads, budget, max_messages, engine)
+        span.set_attribute("yubin.processed", processed)
 
+
+def _send_all_locked(
+    threads: int, budget: DeliveryBudget, max_messages: int | None, engine: str
+) -> int:
     lock = FileLock(get_setting("MKN_YUBIN_LOCK_PATH"))
 
     logger.debug(
@@ -28,18 +802,32 @@ def send_all() -> None:
             logger.debug("lock_acquired")
             start_time = time.time()
 
-            for message in (
-                Message.objects.filter(status=Message.STATUS_QUEUED)
-                .only("pk")
-                .iterator()
-            ):
-                send_db_message(message.pk, "Sending email")
+            message_pks = Message.objects.filter(
+                _is_due(timezone.now()), status=Message.STATUS_QUEUED
+            ).values_list("pk", flat=True)
+            if max_messages is not None:
+                message_pks = message_pks[:max_messages]
+            if engine == "asyncio":
+                from .async_engine import deliver_queued
+
+                processed = deliver_queued(list(message_pks), budget)
+            else:
+                processed = _deliver_all(
+                    list(message_pks), threads=threads, budget=budget
+                )
             logger.debug("releasing_lock")
 
         logger.debug("lock_released")
         logger.debug(
-            "email_sending_completed", extra={"duration": time.time() - start_time}
+            "email_sending_completed",
+            extra={
+                "duration": time.time() - start_time,
+                "threads": threads,
+                "processed": processed,
+            },
         )
+        return processed
 
     except Timeout:
         logger.debug("lock_acquiry_failed")
+        return 0
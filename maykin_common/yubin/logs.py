@@ -0,0 +1,103 @@
+"""
+Write the logs of django-yubin messages in bulk.
+
+``Message.add_log`` inserts every log entry separately. Within :func:`buffered_logs`,
+:func:`add_log` collects the entries instead, and they are created with a single bulk
+insert. Both are available from :mod:`maykin_common.yubin.utils` as well.
+
+Code that writes logs in a transaction of its own uses a local :class:`LogBuffer`,
+flushed before the transaction ends, so that an enclosing :func:`buffered_logs` block
+doesn't postpone the logs until after the commit.
+"""
+
+import contextlib
+from collections.abc import Iterator
+from contextvars import ContextVar
+
+from django_yubin.models import Log, Message
+
+__all__ = ["LogBuffer", "add_log", "buffered_logs"]
+
+
+class LogBuffer:
+    """
+    Log entries waiting to be created.
+
+    :param max_size: Create the pending entries once there are this many.
+    """
+
+    def __init__(self, max_size: int = 1000):
+        self.max_size = max_size
+        self._logs: list[Log] = []
+
+    def __len__(self) -> int:
+        return len(self._logs)
+
+    def add(self, log: Log) -> None:
+        self._logs.append(log)
+        if len(self._logs) >= self.max_size:
+            self.flush()
+
+    def flush(self) -> None:
+        """
+        Create the pending log entries.
+        """
+        logs, self._logs = self._logs, []
+        if logs:
+            Log.objects.bulk_create(logs)
+
+
+_buffer: ContextVar[LogBuffer | None] = ContextVar("yubin_log_buffer", default=None)
+
+
+@contextlib.contextmanager
+def buffered_logs(max_size: int = 1000) -> Iterator[LogBuffer]:
+    """
+    Collect the log entries added with :func:`add_log`, and create them on exit.
+
+    Nested blocks share the buffer of the outermost block, so the entries are created
+    when the outermost block exits - possibly after the transaction of a nested block
+    committed. When the block raises, the pending entries are discarded - they usually
+    belong to messages that are rolled back with the transaction.
+
+    .. code-block:: python
+
+        with buffered_logs():
+            for message in messages:
+                enqueue(message)
+
+    :param max_size: Flush the buffer whenever it holds this many entries, to bound the
+      memory usage of long blocks.
+    """
+    if (buffer := _buffer.get()) is not None:
+        yield buffer
+        return
+
+    buffer = LogBuffer(max_size=max_size)
+    token = _buffer.set(buffer)
+    try:
+        yield buffer
+    finally:
+        _buffer.reset(token)
+    buffer.flush()
+
+
+def add_log(message: Message, log_message: str, action: int | None = None) -> None:
+    """
+    Add a log entry for ``message``, like ``Message.add_log``.
+
+    The entry is buffered within :func:`buffered_logs`, and created right away
+    otherwise.
+
+    :param action: The status the entry is about, the current status of the message by
+      default.
+    """
+    log = Log(
+        message=message,
+        action=message.status if action is None else action,
+        log_message=log_message,
+    )
+    if (buffer := _buffer.get()) is not None:
+        buffer.add(log)
+    else:
+        log.save()
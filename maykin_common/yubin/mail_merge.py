@@ -0,0 +1,159 @@
+"""
+Queue personalized emails to many recipients.
+
+Rendering a template and building an email per recipient by hand repeats a lot of work:
+the templates are parsed and the attachments are encoded for every message.
+:class:`MailMerge` does that once, and renders the messages lazily while they are
+queued in bulk with :func:`maykin_common.yubin.utils.queue_email_messages`:
+
+.. code-block:: python
+
+    from maykin_common.yubin.mail_merge import MailMerge, Recipient
+
+    mail_merge = MailMerge(
+        subject="Your invoice {{ invoice.number }}",
+        body="Dear {{ name }},\\n\\nPlease find your invoice attached.",
+        attachments=[("terms.pdf", terms, "application/pdf")],
+    )
+    mail_merge.queue(
+        Recipient(customer.email, {"name": customer.name, "invoice": invoice})
+        for customer, invoice in ...
+    )
+"""
+
+import mimetypes
+from collections.abc import Iterable, Iterator, Mapping, Sequence
+from dataclasses import dataclass, field
+from email import encoders
+from email.mime.base import MIMEBase
+
+from django.core.mail import EmailMessage, EmailMultiAlternatives
+from django.core.mail.message import DEFAULT_ATTACHMENT_MIME_TYPE
+from django.template import Context, Template
+
+from .utils import BULK_BATCH_SIZE, queue_email_messages
+
+__all__ = ["MailMerge", "Recipient"]
+
+type Attachment = MIMEBase | tuple[str, bytes | str, str | None]
+
+
+@dataclass
+class Recipient:
+    to: str | Sequence[str]
+    """
+    The address(es) to send the message to.
+    """
+    context: Mapping[str, object] = field(default_factory=dict)
+    """
+    The template context for this recipient.
+    """
+    cc: Sequence[str] = ()
+    bcc: Sequence[str] = ()
+
+
+def _compile(template: str | Template) -> Template:
+    return template if isinstance(template, Template) else Template(template)
+
+
+def _create_attachment(
+    filename: str, content: bytes | str, mimetype: str | None
+) -> MIMEBase:
+    if mimetype is None:
+        mimetype = mimetypes.guess_type(filename)[0] or DEFAULT_ATTACHMENT_MIME_TYPE
+    if isinstance(content, str):
+        content = content.encode()
+    maintype, subtype = mimetype.split("/", 1)
+    attachment = MIMEBase(maintype, subtype)
+    attachment.set_payload(content)
+    encoders.encode_base64(attachment)
+    # like EmailMessage._create_attachment
+    try:
+        filename.encode("ascii")
+    except UnicodeEncodeError:
+        attachment.add_header(
+            "Content-Disposition", "attachment", filename=("utf-8", "", filename)
+        )
+    else:
+        attachment.add_header("Content-Disposition", "attachment", filename=filename)
+    return attachment
+
+
+class MailMerge:
+    """
+    Render an email per recipient from the same templates.
+
+    The templates are compiled once, with the default Django template engine. The
+    subject and the (plain text) body are rendered without autoescaping, the HTML body
+    with. Newlines in the rendered subject are removed, they are not allowed in
+    headers.
+
+    Attachments are ``(filename, content, mimetype)`` tuples, like
+    :meth:`EmailMessage.attach <django.core.mail.EmailMessage.attach>`, or MIME parts.
+    They are encoded once and the same MIME part is included in every message.
+    """
+
+    def __init__(
+        self,
+        subject: str | Template,
+        body: str | Template,
+        *,
+        html_body: str | Template | None = None,
+        from_email: str | None = None,
+        attachments: Iterable[Attachment] = (),
+        headers: Mapping[str, str] | None = None,
+    ):
+        self.subject = _compile(subject)
+        self.body = _compile(body)
+        self.html_body = _compile(html_body) if html_body is not None else None
+        self.from_email = from_email
+        self.attachments = [
+            attachment
+            if isinstance(attachment, MIMEBase)
+            else _create_attachment(*attachment)
+            for attachment in attachments
+        ]
+        self.headers = dict(headers or {})
+
+    def render(self, recipient: Recipient) -> EmailMessage:
+        """
+        Render the email for a single recipient.
+        """
+        context = Context(recipient.context, autoescape=False)
+        subject = "".join(self.subject.render(context).splitlines())
+        email_message = EmailMultiAlternatives(
+            subject=subject,
+            body=self.body.render(context),
+            from_email=self.from_email,
+            to=[recipient.to] if isinstance(recipient.to, str) else recipient.to,
+            cc=recipient.cc,
+            bcc=recipient.bcc,
+            headers=self.headers,
+        )
+        if self.html_body is not None:
+            html_context = Context(recipient.context, autoescape=True)
+            email_message.attach_alternative(
+                self.html_body.render(html_context), "text/html"
+            )
+        for attachment in self.attachments:
+            email_message.attach(attachment)
+        return email_message
+
+    def messages(self, recipients: Iterable[Recipient]) -> Iterator[EmailMessage]:
+        """
+        Render the emails for ``recipients`` lazily.
+        """
+        for recipient in recipients:
+            yield self.render(recipient)
+
+    def queue(
+        self, recipients: Iterable[Recipient], batch_size: int = BULK_BATCH_SIZE
+    ) -> int:
+        """
+        Render and queue the emails for ``recipients``, return the number queued.
+
+        ``recipients`` is consumed lazily, a batch of ``batch_size`` messages at a
+        time, so pass a generator (or a queryset ``iterator()``) to keep memory usage
+        flat for large mailings.
+        """
+        return queue_email_messages(self.messages(recipients), batch_size=batch_size)
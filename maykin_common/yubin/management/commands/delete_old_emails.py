@@ -1,6 +1,16 @@
-from django.core.management.base import BaseCommand
+from django.core.management.base import BaseCommand, CommandError
 
-from django_yubin.models import Message
+from django_yubin import settings as yubin_settings
+
+from maykin_common.yubin.storage_backends import (
+    OFFLOADING_STORAGE_BACKEND,
+    prune_offloaded_payloads,
+)
+from maykin_common.yubin.utils import (
+    BULK_BATCH_SIZE,
+    count_old_messages,
+    delete_old_messages,
+)
 
 
 class Command(BaseCommand):
@@ -13,10 +23,55 @@ class Command(BaseCommand):
             default=90,
             help="Delete emails older than specified days (default: 90)",
         )
+        parser.add_argument(
+            "--batch-size",
+            dest="batch_size",
+            type=int,
+            default=BULK_BATCH_SIZE,
+            help=(
+                f"Number of emails deleted per transaction (default: {BULK_BATCH_SIZE})"
+            ),
+        )
+        parser.add_argument(
+            "--sleep",
+            type=float,
+            default=0,
+            help="Seconds to wait between batches (default: 0)",
+        )
+        parser.add_argument(
+            "--dry-run",
+            dest="dry_run",
+            action="store_true",
+            help="Only count the emails that would be deleted",
+        )
 
     def handle(self, *args, **options):
         days = options["days"]
-        (deleted, _), cutoff_date = Message.delete_old(days)
+        if options["batch_size"] < 1:
+            raise CommandError("The batch size must be at least 1.")
+
+        if options["dry_run"]:
+            count, cutoff_date = count_old_messages(days)
+            self.stdout.write(
+                f"Would delete old emails: {count=}, cutoff_date={cutoff_date.date()}"
+            )
+            return
+
+        def report_progress(deleted: int) -> None:
+            if options["verbosity"] >= 1:
+                self.stdout.write(f"Deleted {deleted} emails so far...")
+
+        deleted, cutoff_date = delete_old_messages(
+            days,
+            batch_size=options["batch_size"],
+            sleep=options["sleep"],
+            progress=report_progress,
+        )
+
+        # attachments shared by the deleted messages
+        if yubin_settings.MAILER_STORAGE_BACKEND == OFFLOADING_STORAGE_BACKEND:
+            pruned = prune_offloaded_payloads()
+            self.stdout.write(f"Pruned offloaded payloads: {pruned=}")
 
         self.stdout.write(
             self.style.SUCCESS(
@@ -1,8 +1,11 @@
 import logging
+import signal
 
-from django.core.management.base import BaseCommand
+from django.core.management.base import BaseCommand, CommandError
 
+from maykin_common.yubin.daemon import SenderDaemon
 from maykin_common.yubin.engine import send_all
+from maykin_common.yubin.metrics import register_queue_depth
 
 logger = logging.getLogger(__name__)
 
@@ -10,6 +13,82 @@ logger = logging.getLogger(__name__)
 class Command(BaseCommand):
     help: str = "Sends queued messages with given priority"
 
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "-t",
+            "--threads",
+            dest="threads",
+            type=int,
+            default=None,
+            help=(
+                "Number of delivery threads. Defaults to the "
+                "MKN_YUBIN_DELIVERY_THREADS setting."
+            ),
+        )
+        parser.add_argument(
+            "--max-messages",
+            dest="max_messages",
+            type=int,
+            default=None,
+            help="Stop after processing this many messages.",
+        )
+        parser.add_argument(
+            "--time-budget",
+            dest="time_budget",
+            type=float,
+            default=None,
+            help=(
+                "Stop sending after this many seconds. Messages that were not sent "
+                "in time are left in the queue."
+            ),
+        )
+        parser.add_argument(
+            "--daemon",
+            action="store_true",
+            help=(
+                "Keep running and send messages as soon as they are queued, until "
+                "SIGTERM or SIGINT is received."
+            ),
+        )
+        parser.add_argument(
+            "--poll-interval",
+            dest="poll_interval",
+            type=float,
+            default=5.0,
+            help=(
+                "In daemon mode, the maximum number of seconds between checks of "
+                "the queue. Defaults to 5 seconds."
+            ),
+        )
+
     def handle(self, *args, **options):
+        threads = options["threads"]
+        if threads is not None and threads < 1:
+            raise CommandError("The number of threads must be at least 1.")
+        limits = {
+            "max_messages": options["max_messages"],
+            "time_budget": options["time_budget"],
+        }
+        if any(limit is not None and limit <= 0 for limit in limits.values()):
+            raise CommandError("The message and time limits must be positive.")
+
+        register_queue_depth()
+        if not options["daemon"]:
+            send_all(threads=threads, **limits)
+            return
+
+        if options["poll_interval"] <= 0:
+            raise CommandError("The poll interval must be positive.")
 
-        send_all()
+        daemon = SenderDaemon(
+            poll_interval=options["poll_interval"], threads=threads, **limits
+        )
+        previous_handlers = {
+            signum: signal.signal(signum, daemon.stop)
+            for signum in (signal.SIGTERM, signal.SIGINT)
+        }
+        try:
+            daemon.run()
+        finally:
+            for signum, handler in previous_handlers.items():
+                signal.signal(signum, handler)
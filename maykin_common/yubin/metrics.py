@@ -0,0 +1,154 @@
+"""
+Open Telemetry instruments for the email queue.
+
+The instruments are defined with the ``opentelemetry-api`` package and are no-ops
+until :func:`maykin_common.otel.setup_otel` configured the providers.
+
+``yubin.queue.depth``
+    Number of messages that still need attention, by status. Collected with a single
+    aggregate query per collection interval, using a partial index on the status. Only
+    reported by the processes that called :func:`register_queue_depth`, which
+    ``send_all_mail`` does. They report the same (global) numbers, so don't sum them
+    over the processes.
+
+``yubin.deliveries``
+    Number of processed messages, by outcome (``sent``, ``deferred``, ``failed``,
+    ``blacklisted`` or ``discarded``).
+
+``yubin.delivery.latency``
+    Seconds between queueing a message and sending it.
+
+Every :func:`maykin_common.yubin.engine.send_all` run gets a ``yubin.send_all`` span.
+"""
+
+import functools
+import logging
+from collections.abc import Iterable, Mapping, Sequence
+from datetime import datetime
+
+from django.db import connections, router
+from django.db.models import Count
+
+from django_yubin.models import Message
+from opentelemetry import metrics, trace
+from opentelemetry.metrics import CallbackOptions, Observation
+
+logger = logging.getLogger(__name__)
+
+__all__ = ["QUEUE_STATUSES", "record_deliveries", "register_queue_depth", "tracer"]
+
+# The statuses of the messages that are not done, the partial index in migration
+# 0003_message_queue_index covers them
+QUEUE_STATUSES = (
+    Message.STATUS_CREATED,
+    Message.STATUS_QUEUED,
+    Message.STATUS_IN_PROCESS,
+    Message.STATUS_FAILED,
+)
+
+OUTCOMES = {
+    Message.STATUS_SENT: "sent",
+    Message.STATUS_QUEUED: "deferred",
+    Message.STATUS_FAILED: "failed",
+    Message.STATUS_BLACKLISTED: "blacklisted",
+    Message.STATUS_DISCARDED: "discarded",
+}
+
+STATUS_NAMES = {
+    Message.STATUS_CREATED: "created",
+    Message.STATUS_QUEUED: "queued",
+    Message.STATUS_IN_PROCESS: "in_process",
+    Message.STATUS_FAILED: "failed",
+}
+
+meter = metrics.get_meter("maykin_common.yubin")
+tracer = trace.get_tracer("maykin_common.yubin")
+
+
+def count_queue_depth(options: CallbackOptions) -> Iterable[Observation]:
+    connection = connections[router.db_for_read(Message)]
+    try:
+        counts = dict(
+            Message.objects.filter(status__in=QUEUE_STATUSES)
+            .values("status")
+            .annotate(count=Count("pk"))
+            .order_by()
+            .values_list("status", "count")
+        )
+    except Exception:
+        logger.warning("queue_depth_collection_failed", exc_info=True)
+        return []
+    finally:
+        # the callback runs in the thread of the metric reader, which shouldn't keep a
+        # connection open between collections
+        if not connection.in_atomic_block:
+            connection.close()
+
+    return [
+        Observation(
+            counts.get(status, 0),
+            {"scope": "global", "status": STATUS_NAMES[status]},
+        )
+        for status in QUEUE_STATUSES
+    ]
+
+
+@functools.cache
+def register_queue_depth() -> None:
+    """
+    Report the ``yubin.queue.depth`` gauge from this process.
+
+    Collecting the gauge queries the database, so it's only registered in the
+    processes sending the email rather than in every process importing this module.
+    Registering it more than once has no effect.
+    """
+    meter.create_observable_gauge(
+        "yubin.queue.depth",
+        callbacks=[count_queue_depth],
+        unit="{message}",
+        description="The number of messages by status that are not done yet.",
+    )
+
+
+deliveries = meter.create_counter(
+    "yubin.deliveries",
+    unit="{message}",
+    description="The number of messages processed by the email queue, by outcome.",
+)
+
+delivery_latency = meter.create_histogram(
+    "yubin.delivery.latency",
+    unit="s",
+    description="The time between queueing and sending a message.",
+    explicit_bucket_boundaries_advisory=[
+        1,
+        5,
+        15,
+        30,
+        60,
+        120,
+        300,
+        600,
+        1800,
+        3600,
+        3 * 3600,
+        12 * 3600,
+    ],
+)
+
+
+def record_deliveries(
+    outcomes: Mapping[int, Sequence[tuple[Message, str]]], now: datetime
+) -> None:
+    """
+    Count the processed messages by outcome and track the latency of the sent ones.
+    """
+    for status, entries in outcomes.items():
+        if not entries:
+            continue
+        deliveries.add(len(entries), {"outcome": OUTCOMES.get(status, str(status))})
+        if status != Message.STATUS_SENT:
+            continue
+        for message, _ in entries:
+            if message.date_enqueued is not None:
+                delivery_latency.record((now - message.date_enqueued).total_seconds())
@@ -0,0 +1,57 @@
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    initial = True
+
+    dependencies = [
+        ("django_yubin", "0012_alter_blacklist_id_alter_log_id_alter_message_id"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="MessageDelivery",
+            fields=[
+                (
+                    "message",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        primary_key=True,
+                        related_name="delivery",
+                        serialize=False,
+                        to="django_yubin.message",
+                        verbose_name="message",
+                    ),
+                ),
+                (
+                    "claimed_by",
+                    models.CharField(
+                        blank=True,
+                        help_text=(
+                            "Identifier of the sender process that claimed the message."
+                        ),
+                        max_length=255,
+                        verbose_name="claimed by",
+                    ),
+                ),
+                (
+                    "lease_expires_at",
+                    models.DateTimeField(
+                        blank=True,
+                        db_index=True,
+                        help_text=(
+                            "Until this moment, no other sender may pick up the "
+                            "message. After it, the claim is considered abandoned."
+                        ),
+                        null=True,
+                        verbose_name="lease expires at",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "message delivery",
+                "verbose_name_plural": "message deliveries",
+            },
+        ),
+    ]
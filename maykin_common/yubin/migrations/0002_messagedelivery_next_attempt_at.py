@@ -0,0 +1,24 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("yubin", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="messagedelivery",
+            name="next_attempt_at",
+            field=models.DateTimeField(
+                blank=True,
+                db_index=True,
+                help_text=(
+                    "The queued message is not sent before this moment, to back off "
+                    "after failed attempts."
+                ),
+                null=True,
+                verbose_name="next attempt at",
+            ),
+        ),
+    ]
@@ -0,0 +1,59 @@
+from django.db import migrations, models
+
+from maykin_common.partitioning import get_partition_key
+
+# Partial index on the statuses of the messages that are not done yet. It stays small
+# while the message table grows, which keeps counting and fetching the queue cheap.
+QUEUE_STATUSES = [0, 1, 2, 4]
+QUEUE_INDEX = models.Index(
+    fields=["status"],
+    name="maykin_yubin_message_queue",
+    condition=models.Q(status__in=QUEUE_STATUSES),
+)
+
+
+def _concurrently(schema_editor, table: str) -> bool:
+    # PostgreSQL can build the index without locking writes to a large message table,
+    # except on a partitioned table, which doesn't support it.
+    connection = schema_editor.connection
+    return (
+        connection.vendor == "postgresql"
+        and get_partition_key(connection, table) is None
+    )
+
+
+def add_queue_index(apps, schema_editor):
+    Message = apps.get_model("django_yubin", "Message")
+    table = Message._meta.db_table
+    if not _concurrently(schema_editor, table):
+        schema_editor.add_index(Message, QUEUE_INDEX)
+        return
+    qn = schema_editor.quote_name
+    status = qn(Message._meta.get_field("status").column)
+    statuses = ", ".join(str(value) for value in QUEUE_STATUSES)
+    schema_editor.execute(
+        f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {qn(QUEUE_INDEX.name)} "
+        f"ON {qn(table)} ({status}) WHERE {status} IN ({statuses})"
+    )
+
+
+def remove_queue_index(apps, schema_editor):
+    Message = apps.get_model("django_yubin", "Message")
+    if not _concurrently(schema_editor, Message._meta.db_table):
+        schema_editor.remove_index(Message, QUEUE_INDEX)
+        return
+    name = schema_editor.quote_name(QUEUE_INDEX.name)
+    schema_editor.execute(f"DROP INDEX CONCURRENTLY IF EXISTS {name}")
+
+
+class Migration(migrations.Migration):
+    # CREATE/DROP INDEX CONCURRENTLY can't run inside a transaction
+    atomic = False
+
+    dependencies = [
+        ("yubin", "0002_messagedelivery_next_attempt_at"),
+    ]
+
+    operations = [
+        migrations.RunPython(add_queue_index, remove_queue_index),
+    ]
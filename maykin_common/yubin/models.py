@@ -0,0 +1,54 @@
+from django.db import models
+from django.utils.translation import gettext_lazy as _
+
+from django_yubin.models import Message
+
+
+class MessageDelivery(models.Model):
+    """
+    Delivery bookkeeping for a queued :class:`django_yubin.models.Message`.
+
+    django-yubin's models are not ours to extend, so the state that is only relevant
+    to the delivery in :mod:`maykin_common.yubin.engine` lives in this companion model.
+    """
+
+    message = models.OneToOneField(
+        Message,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name="delivery",
+        verbose_name=_("message"),
+    )
+    claimed_by = models.CharField(
+        _("claimed by"),
+        max_length=255,
+        blank=True,
+        help_text=_("Identifier of the sender process that claimed the message."),
+    )
+    lease_expires_at = models.DateTimeField(
+        _("lease expires at"),
+        null=True,
+        blank=True,
+        db_index=True,
+        help_text=_(
+            "Until this moment, no other sender may pick up the message. After it, "
+            "the claim is considered abandoned."
+        ),
+    )
+    next_attempt_at = models.DateTimeField(
+        _("next attempt at"),
+        null=True,
+        blank=True,
+        db_index=True,
+        help_text=_(
+            "The queued message is not sent before this moment, to back off after "
+            "failed attempts."
+        ),
+    )
+
+    class Meta:
+        verbose_name = _("message delivery")
+        verbose_name_plural = _("message deliveries")
+
+    def __str__(self):
+        return f"{self.message_id}: {self.claimed_by or '-'}"
@@ -0,0 +1,274 @@
+"""
+django-yubin storage backends that keep the message table small.
+
+Select one with the ``MAILER_STORAGE_BACKEND`` setting of django-yubin. The backend is
+recorded per message, so switching backends only affects new messages. Reading the
+message data is transparent, both for django-yubin (``send_db_message``, the admin) and
+for :func:`maykin_common.yubin.engine.send_all`.
+"""
+
+import base64
+import email
+import hashlib
+import io
+import logging
+import os
+import re
+import time
+import zlib
+from collections.abc import Callable
+from datetime import timedelta
+from email import policy
+from email.generator import Generator
+from email.message import Message as MIMEMessage
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.core.files.base import ContentFile
+from django.core.files.storage import Storage, storages
+from django.utils import timezone
+
+from django_yubin import settings as yubin_settings
+from django_yubin.models import Message
+from django_yubin.storage_backends import BaseStorageBackend
+
+from ..settings import get_setting
+
+logger = logging.getLogger(__name__)
+
+__all__ = [
+    "CompressedDatabaseStorageBackend",
+    "OffloadingStorageBackend",
+    "prune_offloaded_payloads",
+]
+
+type Codec = tuple[Callable[[bytes], bytes], Callable[[bytes], bytes]]
+
+# Stored message data starts with the MIME headers, so this can't be mistaken for
+# uncompressed data
+COMPRESSED_PREFIX = "maykin-common:"
+
+PAYLOAD_HEADER = "X-Maykin-Common-Payload"
+# the storage name is only included when it differs from the path derived from the hash
+PAYLOAD_REFERENCE_RE = re.compile(
+    rf"^{PAYLOAD_HEADER}: sha256:([0-9a-f]{{64}})(?: (\S+))?$", re.M
+)
+
+# a reused payload gets a new modification time when its current one is older than
+# this, see prune_offloaded_payloads
+PAYLOAD_REFRESH_AGE = timedelta(hours=1)
+
+
+CODECS: dict[str, Codec] = {
+    "zlib": (zlib.compress, zlib.decompress),
+}
+
+
+def _get_codec(name: str) -> Codec:
+    try:
+        return CODECS[name]
+    except KeyError:
+        raise ImproperlyConfigured(f"Unknown compression algorithm {name!r}.") from None
+
+
+class CompressedDatabaseStorageBackend(BaseStorageBackend):
+    """
+    Store the message data compressed in the database.
+
+    The compressed data is base64 encoded, since the column holds text. The algorithm
+    is set with :attr:`maykin_common.settings.MKN_YUBIN_PAYLOAD_COMPRESSION` and
+    stored along with the data. Uncompressed data, saved by
+    ``django_yubin.storage_backends.DatabaseStorageBackend``, is read as is.
+
+    Text and HTML bodies compress well. Attachments that are compressed already (PDF,
+    images) barely shrink, see :class:`OffloadingStorageBackend` for those.
+    """
+
+    @classmethod
+    def get_message_data(cls, message):
+        data = message._message_data
+        if not data.startswith(COMPRESSED_PREFIX):
+            return data
+        name, _, encoded = data.removeprefix(COMPRESSED_PREFIX).partition(":")
+        _, decompress = _get_codec(name)
+        return decompress(base64.b64decode(encoded)).decode(settings.DEFAULT_CHARSET)
+
+    @classmethod
+    def set_message_data(cls, message, data):
+        name = get_setting("MKN_YUBIN_PAYLOAD_COMPRESSION")
+        compress, _ = _get_codec(name)
+        compressed = compress(data.encode(settings.DEFAULT_CHARSET))
+        message._message_data = (
+            f"{COMPRESSED_PREFIX}{name}:{base64.b64encode(compressed).decode('ascii')}"
+        )
+
+    @classmethod
+    def delete_message_data(cls, message):
+        pass
+
+
+def get_payload_storage() -> Storage:
+    return storages[get_setting("MKN_YUBIN_PAYLOAD_STORAGE")]
+
+
+def _payload_path(digest: str) -> str:
+    return f"{yubin_settings.MAILER_FILE_STORAGE_DIR}/payloads/{digest[:2]}/{digest}"
+
+
+def _save_payload(storage: Storage, path: str, content: bytes) -> str:
+    """
+    Save the payload at ``path``, or refresh its modification time when it exists.
+
+    :returns: The name of the stored payload.
+    """
+    if storage.exists(path):
+        if storage.get_modified_time(path) > timezone.now() - PAYLOAD_REFRESH_AGE:
+            return path
+        # the payload may be reused by a message that is not committed yet, which
+        # prune_offloaded_payloads can't see - only the modification time protects it
+        try:
+            now = time.time()
+            os.utime(storage.path(path), (now, now))
+            return path
+        except NotImplementedError:
+            # not a local storage, save it again
+            pass
+        except FileNotFoundError:
+            # pruned in the meantime
+            pass
+    # storages that don't overwrite return another name, if the file exists
+    return storage.save(path, ContentFile(content))
+
+
+def _reference_name(digest: str, name: str | None) -> str:
+    return name or _payload_path(digest)
+
+
+def _as_string(mime_message: MIMEMessage) -> str:
+    # like Django's SafeMIMEMessage.as_string
+    fp = io.StringIO()
+    Generator(fp, mangle_from_=False, maxheaderlen=0).flatten(mime_message)
+    return fp.getvalue()
+
+
+def offload_payloads(data: str, threshold: int, storage: Storage) -> str:
+    """
+    Move the MIME parts larger than ``threshold`` bytes to ``storage``.
+
+    The encoded payload of such a part is saved under its SHA-256 hash and replaced by
+    a reference header, so identical attachments are only stored once.
+    """
+    mime_message = email.message_from_string(data, policy=policy.compat32)
+    offloaded = False
+    for part in mime_message.walk():
+        if part.is_multipart():
+            continue
+        payload = part.get_payload()
+        assert isinstance(payload, str)
+        encoded = payload.encode(settings.DEFAULT_CHARSET)
+        if len(encoded) < threshold:
+            continue
+        digest = hashlib.sha256(encoded).hexdigest()
+        path = _payload_path(digest)
+        name = _save_payload(storage, path, encoded)
+        part.set_payload("")
+        part[PAYLOAD_HEADER] = (
+            f"sha256:{digest}" if name == path else f"sha256:{digest} {name}"
+        )
+        offloaded = True
+    return _as_string(mime_message) if offloaded else data
+
+
+def restore_payloads(data: str, storage: Storage) -> str:
+    """
+    Put the payloads moved by :func:`offload_payloads` back in the message.
+    """
+    if PAYLOAD_REFERENCE_RE.search(data) is None:
+        return data
+    mime_message = email.message_from_string(data, policy=policy.compat32)
+    for part in mime_message.walk():
+        if (reference := part[PAYLOAD_HEADER]) is None:
+            continue
+        digest, _, name = reference.removeprefix("sha256:").partition(" ")
+        with storage.open(_reference_name(digest, name), "rb") as payload:
+            part.set_payload(payload.read().decode(settings.DEFAULT_CHARSET))
+        del part[PAYLOAD_HEADER]
+    return _as_string(mime_message)
+
+
+class OffloadingStorageBackend(BaseStorageBackend):
+    """
+    Store large MIME parts in file storage and the rest of the message inline.
+
+    Parts above :attr:`maykin_common.settings.MKN_YUBIN_PAYLOAD_OFFLOAD_THRESHOLD`
+    bytes go to the storage :attr:`maykin_common.settings.MKN_YUBIN_PAYLOAD_STORAGE`,
+    addressed by the hash of their content. An attachment sent to thousands of
+    recipients is stored once.
+
+    Deleting a message leaves its payloads in place, since other messages may share
+    them. :func:`prune_offloaded_payloads` (run by ``delete_old_emails``) removes the
+    payloads that are no longer referenced. Storages that don't overwrite files store a
+    reused payload again under another name when its modification time needs a
+    refresh, see :data:`PAYLOAD_REFRESH_AGE`.
+    """
+
+    @classmethod
+    def get_message_data(cls, message):
+        return restore_payloads(message._message_data, get_payload_storage())
+
+    @classmethod
+    def set_message_data(cls, message, data):
+        message._message_data = offload_payloads(
+            data,
+            threshold=get_setting("MKN_YUBIN_PAYLOAD_OFFLOAD_THRESHOLD"),
+            storage=get_payload_storage(),
+        )
+
+    @classmethod
+    def delete_message_data(cls, message):
+        pass
+
+
+OFFLOADING_STORAGE_BACKEND = (
+    f"{OffloadingStorageBackend.__module__}.{OffloadingStorageBackend.__qualname__}"
+)
+
+
+def prune_offloaded_payloads(grace_period: timedelta = timedelta(days=1)) -> int:
+    """
+    Delete the offloaded payloads that no message refers to anymore.
+
+    Payloads saved or reused less than ``grace_period`` ago are kept, their message may
+    not have been committed yet. Reusing a payload refreshes its modification time at
+    most every :data:`PAYLOAD_REFRESH_AGE`, so ``grace_period`` must be longer.
+
+    :returns: The number of deleted payloads.
+    """
+    referenced: set[str] = set()
+    messages = Message.objects.filter(storage=OFFLOADING_STORAGE_BACKEND).values_list(
+        "_message_data", flat=True
+    )
+    # the large parts are gone, so the remaining message data is small
+    for data in messages.iterator(chunk_size=500):
+        referenced.update(
+            _reference_name(digest, name)
+            for digest, name in PAYLOAD_REFERENCE_RE.findall(data)
+        )
+
+    storage = get_payload_storage()
+    directory = f"{yubin_settings.MAILER_FILE_STORAGE_DIR}/payloads"
+    if not storage.exists(directory):
+        return 0
+    cutoff = timezone.now() - grace_period
+    pruned = 0
+    subdirectories, _ = storage.listdir(directory)
+    for subdirectory in subdirectories:
+        _, filenames = storage.listdir(f"{directory}/{subdirectory}")
+        for filename in filenames:
+            path = f"{directory}/{subdirectory}/{filename}"
+            if path in referenced or storage.get_modified_time(path) > cutoff:
+                continue
+            storage.delete(path)
+            pruned += 1
+    logger.info("offloaded_payloads_pruned", extra={"count": pruned})
+    return pruned
@@ -1,12 +1,39 @@
+import itertools
 import logging
+import time
+from collections.abc import Callable, Iterable, Iterator
+from datetime import datetime, timedelta
 
 from django.core.mail import EmailMessage
+from django.db import connections, models, router, transaction
+from django.db.models import F
+from django.utils import timezone
 
 from django_yubin import _set_message_test_mode, settings
-from django_yubin.models import Message
+from django_yubin.models import Log, Message
+
+from ..partitioning import (
+    drop_monthly_partitions,
+    ensure_monthly_partitions,
+    get_monthly_partitions,
+    get_partition_key,
+)
+from .daemon import notify_queued
+from .engine import schedule_next_attempts
+from .logs import LogBuffer, add_log, buffered_logs
+from .models import MessageDelivery
 
 logger = logging.getLogger(__name__)
 
+ENQUEUE_LOG_MESSAGE = "Enqueued from a Backend or django-yubin itself."
+
+DATABASE_STORAGE_BACKEND = "django_yubin.storage_backends.DatabaseStorageBackend"
+
+BULK_BATCH_SIZE = 500
+"""
+Default number of messages written to the database per batch in the bulk operations.
+"""
+
 
 def enqueue(message: Message, log_message: str | None = None) -> bool:
     """
@@ -15,7 +42,7 @@ def enqueue(message: Message, log_message: str | None = None) -> bool:
     Removes celery from the original :func:`Message.enqueue`
     """
     if not message.can_be_enqueued():
-        message.add_log("Message can not be enqueued in its current status")
+        add_log(message, "Message can not be enqueued in its current status")
         logger.warning(
             "message_queueing_failed",
             extra={"email_message": message, "current_status": message.status},
@@ -24,27 +51,209 @@ def enqueue(message: Message, log_message: str | None = None) -> bool:
         return False
 
     # mark as queued instead of creating a new task
-    message.mark_as(Message.STATUS_QUEUED, log_message)
+    message.mark_as(Message.STATUS_QUEUED)
+    if log_message is not None:
+        add_log(message, log_message)
+    notify_queued()
 
     return True
 
 
-def retry_messages(max_retries: int = 3) -> tuple[int, int]:
+def retry_messages(
+    max_retries: int = 3, batch_size: int = BULK_BATCH_SIZE
+) -> tuple[int, int]:
     """
     Retries messages that have failed to send and
     returns a tuple of total tries and failed tries
 
-    Removes celery from the original :func:`Message.retry_messages`
+    Removes celery from the original :func:`Message.retry_messages`. Rather than
+    enqueueing the messages one by one, every batch of ``batch_size`` messages is
+    queued again with a single ``UPDATE`` and the logs are created in bulk, each batch
+    in its own transaction. The next attempts are spread out with an exponential
+    backoff (see :attr:`maykin_common.settings.MKN_YUBIN_RETRY_BACKOFF`), so that a
+    large amount of failed messages doesn't hit the mail server all at once.
     """
+    enqueued = failed = 0
+    retryable = Message.objects.retryable(max_retries)  # type: ignore
+    last_pk = 0
+    while True:
+        with transaction.atomic():
+            attempts = dict(
+                retryable.select_for_update()
+                .filter(pk__gt=last_pk)
+                .order_by("pk")
+                .values_list("pk", "enqueued_count")[:batch_size]
+            )
+            if not attempts:
+                break
+            message_pks = list(attempts)
+            last_pk = message_pks[-1]
 
-    enqueued = 0
-    messages = Message.objects.defer("_message_data").retryable(max_retries)  # type: ignore
-    for message in messages:
-        enqueued += enqueue(message, "Retry sending the email.")
-    failed = len(messages) - enqueued
+            updated = retryable.filter(pk__in=message_pks).update(
+                status=Message.STATUS_QUEUED,
+                date_enqueued=timezone.now(),
+                enqueued_count=F("enqueued_count") + 1,
+            )
+            schedule_next_attempts(attempts)
+            logs = LogBuffer()
+            for message_pk in message_pks:
+                logs.add(
+                    Log(
+                        message_id=message_pk,
+                        action=Message.STATUS_QUEUED,
+                        log_message="Retry sending the email.",
+                    )
+                )
+            logs.flush()
+        enqueued += updated
+        failed += len(message_pks) - updated
+
+    if enqueued:
+        notify_queued()
     return enqueued, failed
 
 
+def delete_old_messages(
+    days: int = 90,
+    batch_size: int = BULK_BATCH_SIZE,
+    sleep: float = 0,
+    progress: Callable[[int], object] | None = None,
+) -> tuple[int, datetime]:
+    """
+    Delete the messages created before ``days`` days ago, in batches.
+
+    The batched equivalent of :meth:`Message.delete_old`: every batch of
+    ``batch_size`` messages (and their logs) is deleted in its own transaction, so
+    locks are only held briefly and the cleanup doesn't get in the way of the mail
+    queue. Optionally sleep ``sleep`` seconds between the batches to spread the load.
+
+    When the message table is partitioned by month (see
+    :class:`maykin_common.migration_operations.PartitionByMonth`), the partitions
+    holding old messages only are dropped instead, and the partitions for the coming
+    months are created. Only the remaining old messages are deleted in batches.
+
+    :param progress: Called with the running total of deleted messages after every
+      batch.
+    :returns: The number of deleted messages and the cutoff date.
+    """
+    cutoff_date = timezone.now() - timedelta(days)
+    deleted = _drop_old_partitions(cutoff_date, batch_size, sleep, progress)
+    deleted += _delete_in_batches(
+        Message.objects.filter(date_created__lt=cutoff_date),
+        batch_size,
+        sleep,
+        progress,
+        deleted=deleted,
+    )
+    return deleted, cutoff_date
+
+
+def _drop_old_partitions(
+    cutoff_date: datetime,
+    batch_size: int,
+    sleep: float,
+    progress: Callable[[int], object] | None,
+) -> int:
+    connection = connections[router.db_for_write(Message)]
+    message_table = Message._meta.db_table
+    if get_partition_key(connection, message_table) is None:
+        return 0
+
+    deleted = 0
+    droppable = [
+        partition
+        for partition in get_monthly_partitions(connection, message_table)
+        if partition.end <= cutoff_date
+    ]
+    if droppable:
+        # dropping a partition bypasses the post_delete signal, let the storage
+        # backends keeping the data elsewhere clean up first
+        deleted = _delete_in_batches(
+            Message.objects.filter(date_created__lt=droppable[-1].end).exclude(
+                storage=DATABASE_STORAGE_BACKEND
+            ),
+            batch_size,
+            sleep,
+            progress,
+        )
+
+    qn = connection.ops.quote_name
+    with transaction.atomic(using=connection.alias):
+        with connection.cursor() as cursor:
+            for partition in droppable:
+                cursor.execute(f"SELECT COUNT(*) FROM {qn(partition.name)}")
+                deleted += cursor.fetchone()[0]
+        if get_partition_key(connection, Log._meta.db_table) is not None:
+            drop_monthly_partitions(connection, Log._meta.db_table, cutoff_date)
+            ensure_monthly_partitions(connection, Log._meta.db_table)
+        if droppable:
+            # the foreign keys to the message table are gone, delete the rows of the
+            # dropped messages ourselves. Filtering on the partition key joins the
+            # dropped partitions only, instead of checking every row.
+            dropped = {
+                "message__date_created__gte": droppable[0].start,
+                "message__date_created__lt": droppable[-1].end,
+            }
+            for model in (Log, MessageDelivery):
+                model.objects.filter(**dropped).delete()
+        drop_monthly_partitions(connection, message_table, cutoff_date)
+        ensure_monthly_partitions(connection, message_table)
+
+    if droppable and progress is not None:
+        progress(deleted)
+    return deleted
+
+
+def _delete_in_batches(
+    old_messages: models.QuerySet[Message],
+    batch_size: int,
+    sleep: float,
+    progress: Callable[[int], object] | None,
+    deleted: int = 0,
+) -> int:
+    """
+    Delete ``old_messages`` in batches, returning the number of deleted messages.
+
+    :param deleted: The number of messages deleted before, for the progress report.
+    """
+    initial = deleted
+    last_pk = 0
+    while True:
+        if deleted and sleep:
+            time.sleep(sleep)
+        with transaction.atomic():
+            message_pks = list(
+                old_messages.filter(pk__gt=last_pk)
+                .order_by("pk")
+                .values_list("pk", flat=True)[:batch_size]
+            )
+            if not message_pks:
+                break
+            last_pk = message_pks[-1]
+            # go through the ORM rather than a raw delete, the storage backends clean
+            # up in the post_delete signal
+            _, deleted_per_model = (
+                Message.objects.filter(pk__in=message_pks)
+                .defer("_message_data")
+                .delete()
+            )
+        deleted += deleted_per_model.get(Message._meta.label, 0)
+        if progress is not None:
+            progress(deleted)
+        if len(message_pks) < batch_size:
+            break
+
+    return deleted - initial
+
+
+def count_old_messages(days: int = 90) -> tuple[int, datetime]:
+    """
+    Count the messages that :func:`delete_old_messages` would delete.
+    """
+    cutoff_date = timezone.now() - timedelta(days)
+    return Message.objects.filter(date_created__lt=cutoff_date).count(), cutoff_date
+
+
 def queue_email_message(
     email_message: EmailMessage, fail_silently: bool = False
 ) -> int:
@@ -60,13 +269,7 @@ def queue_email_message(
      Removes celery from the original :func:`django_yubin.queue_email_message`
     """
 
-    if settings.MAILER_TEST_MODE and settings.MAILER_TEST_EMAIL:
-        email_message = _set_message_test_mode(
-            email_message, settings.MAILER_TEST_EMAIL
-        )
-
-    if not email_message.recipients():
-        logger.warning("no_recipients_added", extra={"email_message": email_message})
+    if (email_message := _prepare_email_message(email_message)) is None:
         return 0
 
     message = Message.objects.create(
@@ -78,6 +281,86 @@ def queue_email_message(
         message_data=email_message.message().as_string(),
         storage=settings.MAILER_STORAGE_BACKEND,
     )
-    message.add_log("Message created")
+    with buffered_logs():
+        add_log(message, "Message created")
+        return int(enqueue(message, ENQUEUE_LOG_MESSAGE))
+
+
+def _prepare_email_message(email_message: EmailMessage) -> EmailMessage | None:
+    if settings.MAILER_TEST_MODE and settings.MAILER_TEST_EMAIL:
+        email_message = _set_message_test_mode(
+            email_message, settings.MAILER_TEST_EMAIL
+        )
+
+    if not email_message.recipients():
+        logger.warning("no_recipients_added", extra={"email_message": email_message})
+        return None
+
+    return email_message
+
+
+def _build_queued_messages(
+    email_messages: Iterable[EmailMessage],
+) -> Iterator[Message]:
+    for email_message in email_messages:
+        if (email_message := _prepare_email_message(email_message)) is None:
+            continue
+        yield Message(
+            to_address=",".join(email_message.to),
+            cc_address=",".join(email_message.cc),
+            bcc_address=",".join(email_message.bcc),
+            from_address=email_message.from_email,
+            subject=email_message.subject,
+            message_data=email_message.message().as_string(),
+            storage=settings.MAILER_STORAGE_BACKEND,
+            status=Message.STATUS_QUEUED,
+            date_enqueued=timezone.now(),
+            enqueued_count=1,
+        )
+
+
+def queue_email_messages(
+    email_messages: Iterable[EmailMessage], batch_size: int = BULK_BATCH_SIZE
+) -> int:
+    """
+    Add new messages to the email queue in bulk, return the number of messages queued.
+
+    This is the bulk equivalent of :func:`queue_email_message`. The messages are
+    created directly in the queued status, with the same log entries, using a fixed
+    number of queries per ``batch_size`` messages rather than per message. The
+    ``email_messages`` are consumed lazily, so a generator keeps memory usage flat.
+
+    Falls back to :func:`queue_email_message` on database backends that cannot return
+    the primary keys of bulk inserted rows.
+    """
+    connection = connections[router.db_for_write(Message)]
+    if not connection.features.can_return_rows_from_bulk_insert:  # pragma: no cover
+        with buffered_logs():
+            return sum(map(queue_email_message, email_messages))
+
+    queued = 0
+    for batch in itertools.batched(_build_queued_messages(email_messages), batch_size):
+        with transaction.atomic():
+            messages = Message.objects.bulk_create(batch)
+            logs = LogBuffer()
+            for message in messages:
+                logs.add(
+                    Log(
+                        message=message,
+                        action=Message.STATUS_CREATED,
+                        log_message="Message created",
+                    )
+                )
+                logs.add(
+                    Log(
+                        message=message,
+                        action=Message.STATUS_QUEUED,
+                        log_message=ENQUEUE_LOG_MESSAGE,
+                    )
+                )
+            logs.flush()
+        queued += len(messages)
 
-    return int(enqueue(message, "Enqueued from a Backend or django-yubin itself."))
+    if queued:
+        notify_queued(using=connection.alias)
+    return queued
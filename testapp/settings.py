@@ -139,6 +139,12 @@ MKN_HEALTH_CHECKS_WORKER_READINESS_FILE = config(
     cast=Path,
 )
 
+MKN_HEALTH_CHECKS_WORKER_STATUS_SOCKET = config(
+    "MKN_HEALTH_CHECKS_WORKER_STATUS_SOCKET",
+    default="",
+    cast=lambda value: Path(value) if value else None,
+)
+
 #
 # CUSTOM branding settings
 #
@@ -0,0 +1,201 @@
+"""
+Measure the cost of a throttle check for different cache backends and workloads.
+
+Run with ``pytest -m benchmark -s tests/axes/test_throttling_benchmark.py``. Each test
+reports the checks per second, the p50/p99 latency and the number of cache calls per
+check. The Redis variants require a Redis server on ``localhost:6379`` (like the CI
+service) and are skipped when it's not available.
+"""
+
+from collections.abc import Callable, Iterator
+
+from django.core.cache import caches
+from django.http import HttpRequest, HttpResponse
+from django.test import Client, RequestFactory
+from django.urls import path
+from django.views import View
+
+import pytest
+
+from maykin_common.throttling import IPThrottleMixin, ThrottleMixin
+
+from ..benchmark import CountingCache, run_benchmark
+
+pytestmark = [
+    pytest.mark.benchmark,
+    pytest.mark.urls("tests.axes.test_throttling_benchmark"),
+]
+
+CACHE_BACKENDS = {
+    "locmem": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        "LOCATION": "throttling-benchmark",
+        "OPTIONS": {"MAX_ENTRIES": 1_000_000},
+    },
+    "redis": {
+        "BACKEND": "django.core.cache.backends.redis.RedisCache",
+        "LOCATION": "redis://localhost:6379/15",
+    },
+}
+
+IDENTIFIER_POOLS = {
+    "few": 4,
+    "many": 10_000,
+}
+
+THREADS = [1, 8, 64]
+
+
+class BenchmarkThrottleMixin:
+    # never actually throttle, so that every check does the full amount of work
+    throttle_visits = 10**9
+    throttle_methods = "all"
+    throttle_cache = "throttling-benchmark"
+
+
+class BenchmarkView(View):
+    def post(self, request: HttpRequest, *args, **kwargs):
+        return HttpResponse("ok")
+
+
+class ThrottleView(BenchmarkThrottleMixin, ThrottleMixin, BenchmarkView):
+    identifier: str = ""
+
+    def get_throttle_identifier(self) -> str:
+        return self.identifier
+
+
+class IPThrottleView(BenchmarkThrottleMixin, IPThrottleMixin, BenchmarkView):
+    pass
+
+
+urlpatterns = [
+    path("ip-throttle", IPThrottleView.as_view()),
+]
+
+
+def _ip_address(index: int) -> str:
+    return f"10.{(index >> 16) & 255}.{(index >> 8) & 255}.{index & 255}"
+
+
+@pytest.fixture(params=list(CACHE_BACKENDS))
+def throttle_cache(request, settings, monkeypatch) -> Iterator[CountingCache]:
+    backend = request.param
+    settings.CACHES = {
+        **settings.CACHES,
+        "throttling-benchmark": CACHE_BACKENDS[backend],
+    }
+    cache = caches["throttling-benchmark"]
+    if backend == "redis":
+        try:
+            cache.set("ping", "pong", timeout=1)
+        except Exception:
+            pytest.skip("Redis is not available")
+    cache.clear()
+
+    counting_cache = CountingCache(cache)
+    monkeypatch.setattr(
+        ThrottleMixin, "get_throttle_cache", lambda self: counting_cache
+    )
+    yield counting_cache
+    cache.clear()
+
+
+@pytest.fixture
+def report(capsys) -> Callable[[str], None]:
+    def _report(line: str) -> None:
+        with capsys.disabled():
+            print(f"\n{line}", end="")
+
+    return _report
+
+
+@pytest.mark.parametrize("threads", THREADS)
+@pytest.mark.parametrize("identifiers", IDENTIFIER_POOLS)
+def test_throttle_mixin_direct(
+    throttle_cache: CountingCache,
+    report,
+    threads: int,
+    identifiers: str,
+):
+    pool_size = IDENTIFIER_POOLS[identifiers]
+    request = RequestFactory().post("/")
+
+    def check(thread_index: int, iteration: int) -> None:
+        view = ThrottleView()
+        view.request = request
+        view.identifier = str((thread_index * 7919 + iteration) % pool_size)
+        assert not view.check_rate_limit_exceeded()
+
+    result = run_benchmark(
+        f"ThrottleMixin direct [{identifiers} identifiers]",
+        check,
+        threads=threads,
+        cache=throttle_cache,
+    )
+
+    report(result.format())
+    assert 1 <= result.cache_calls_per_call <= 2
+
+
+@pytest.mark.parametrize("threads", THREADS)
+@pytest.mark.parametrize("identifiers", IDENTIFIER_POOLS)
+def test_ip_throttle_mixin_direct(
+    throttle_cache: CountingCache,
+    report,
+    threads: int,
+    identifiers: str,
+):
+    pool_size = IDENTIFIER_POOLS[identifiers]
+    addresses = [_ip_address(index) for index in range(pool_size)]
+
+    def check(thread_index: int, iteration: int) -> None:
+        # a bare request is cheap to build, so the request factory overhead doesn't
+        # end up in the measurements
+        request = HttpRequest()
+        request.method = "POST"
+        request.META["REMOTE_ADDR"] = addresses[
+            (thread_index * 7919 + iteration) % pool_size
+        ]
+        view = IPThrottleView()
+        view.request = request
+        assert not view.check_rate_limit_exceeded()
+
+    result = run_benchmark(
+        f"IPThrottleMixin direct [{identifiers} identifiers]",
+        check,
+        threads=threads,
+        cache=throttle_cache,
+    )
+
+    report(result.format())
+    assert 1 <= result.cache_calls_per_call <= 2
+
+
+@pytest.mark.parametrize("threads", THREADS)
+@pytest.mark.parametrize("identifiers", IDENTIFIER_POOLS)
+def test_ip_throttle_mixin_test_client(
+    throttle_cache: CountingCache,
+    report,
+    threads: int,
+    identifiers: str,
+):
+    pool_size = IDENTIFIER_POOLS[identifiers]
+    clients = [Client() for _ in range(threads)]
+
+    def check(thread_index: int, iteration: int) -> None:
+        index = (thread_index * 7919 + iteration) % pool_size
+        response = clients[thread_index].post(
+            "/ip-throttle", REMOTE_ADDR=_ip_address(index)
+        )
+        assert response.status_code == 200
+
+    result = run_benchmark(
+        f"IPThrottleMixin test client [{identifiers} identifiers]",
+        check,
+        threads=threads,
+        cache=throttle_cache,
+    )
+
+    report(result.format())
+    assert 1 <= result.cache_calls_per_call <= 2
@@ -0,0 +1,186 @@
+from django.core.exceptions import ImproperlyConfigured
+from django.core.management import call_command
+from django.http import HttpRequest, HttpResponse
+from django.test import Client, RequestFactory
+from django.urls import include, path, resolve
+
+import pytest
+
+from maykin_common.throttling import (
+    PolicyRateThrottle,
+    ThrottlePolicyTable,
+    ThrottleRule,
+)
+
+from .views import IPThrottleView
+
+
+def function_view(request: HttpRequest, **kwargs):
+    return HttpResponse("ok")
+
+
+api_urlpatterns = [
+    path("things", function_view, name="things"),
+    path("things/<int:pk>", function_view, name="thing-detail"),
+]
+
+urlpatterns = [
+    path("login", function_view, name="login"),
+    path("unthrottled", function_view, name="unthrottled"),
+    path("api/", include((api_urlpatterns, "api"))),
+    path(
+        "ip-throttle/1/minute",
+        IPThrottleView.as_view(
+            throttle_name="shared",
+            throttle_visits=1,
+            throttle_period=60,
+            throttle_methods=("post",),
+        ),
+    ),
+]
+
+pytestmark = [pytest.mark.urls("tests.axes.test_throttling_policies")]
+
+
+@pytest.fixture(autouse=True)
+def _clear_cache():
+    call_command("clear_cache", alias="default")
+    yield
+    call_command("clear_cache", alias="default")
+
+
+@pytest.fixture
+def throttle_middleware(settings):
+    settings.MIDDLEWARE = [
+        *settings.MIDDLEWARE,
+        "maykin_common.throttling.ThrottleMiddleware",
+    ]
+
+
+@pytest.mark.usefixtures("throttle_middleware")
+def test_middleware_throttles_function_view_by_url_name(settings, client: Client):
+    settings.MKN_THROTTLE_POLICIES = {
+        "login": [{"visits": 1, "period": 60}],
+    }
+
+    response = client.post("/login")
+    assert response.status_code == 200
+
+    response = client.post("/login")
+    assert response.status_code == 429
+
+    # GET is not throttled by default
+    response = client.get("/login")
+    assert response.status_code == 200
+
+    # other views are not affected
+    response = client.post("/unthrottled")
+    assert response.status_code == 200
+
+
+@pytest.mark.usefixtures("throttle_middleware")
+def test_middleware_throttles_by_route(settings, client: Client):
+    settings.MKN_THROTTLE_POLICIES = {
+        "api/things/<int:pk>": [{"visits": 1, "period": 60, "methods": "all"}],
+    }
+
+    response = client.get("/api/things/1")
+    assert response.status_code == 200
+
+    response = client.get("/api/things/2")
+    assert response.status_code == 429
+
+    response = client.get("/api/things")
+    assert response.status_code == 200
+
+
+@pytest.mark.usefixtures("throttle_middleware")
+def test_middleware_throttles_by_pattern(settings, client: Client):
+    settings.MKN_THROTTLE_POLICIES = {
+        "api:*": [{"visits": 2, "period": 60, "methods": "all"}],
+    }
+
+    assert client.get("/api/things").status_code == 200
+    assert client.get("/api/things/1").status_code == 200
+    assert client.get("/api/things/2").status_code == 429
+    assert client.get("/unthrottled").status_code == 200
+
+
+@pytest.mark.usefixtures("throttle_middleware")
+def test_middleware_throttles_per_ip_address(settings, client: Client):
+    settings.MKN_THROTTLE_POLICIES = {
+        "login": [{"visits": 1, "period": 60}],
+    }
+
+    assert client.post("/login", REMOTE_ADDR="127.0.0.1").status_code == 200
+    assert client.post("/login", REMOTE_ADDR="127.0.0.1").status_code == 429
+    assert client.post("/login", REMOTE_ADDR="127.0.0.2").status_code == 200
+
+
+@pytest.mark.usefixtures("throttle_middleware")
+def test_middleware_shares_counters_with_mixin(settings, client: Client):
+    settings.MKN_THROTTLE_POLICIES = {
+        "login": [{"visits": 1, "period": 60, "name": "shared"}],
+    }
+
+    response = client.post("/ip-throttle/1/minute")
+    assert response.status_code == 200
+
+    response = client.post("/login")
+    assert response.status_code == 429
+
+
+def test_policy_table_exact_match_takes_precedence():
+    exact_rule = ThrottleRule(visits=1, period=1)
+    pattern_rule = ThrottleRule(visits=2, period=1)
+    table = ThrottlePolicyTable(
+        {
+            "api:*": [pattern_rule],
+            "api:things": [exact_rule],
+        }
+    )
+
+    assert table.lookup(resolve("/api/things")) == (exact_rule,)
+    assert table.lookup(resolve("/api/things/1")) == (pattern_rule,)
+    assert table.lookup(resolve("/login")) == ()
+    assert table.lookup(None) == ()
+
+
+def test_policy_table_rule_name_defaults_to_key():
+    table = ThrottlePolicyTable({"login": [{"visits": 1, "period": 1}]})
+
+    (rule,) = table.lookup(resolve("/login"))
+
+    assert rule.name == "login"
+
+
+def test_invalid_rule_scope():
+    with pytest.raises(ImproperlyConfigured):
+        ThrottlePolicyTable({"login": [{"visits": 1, "period": 1, "scope": "bad"}]})
+
+
+def test_drf_throttle_class_applies_policies(settings, rf: RequestFactory):
+    settings.MKN_THROTTLE_POLICIES = {
+        "api:things": [{"visits": 1, "period": 60}],
+    }
+    request = rf.post("/api/things")
+    request.resolver_match = resolve("/api/things")
+
+    throttle = PolicyRateThrottle()
+    assert throttle.allow_request(request, view=None)
+    assert throttle.wait() is None
+
+    throttle = PolicyRateThrottle()
+    assert not throttle.allow_request(request, view=None)
+    wait = throttle.wait()
+    assert wait is not None and 0 < wait <= 60
+
+
+def test_drf_throttle_class_explicit_rules(rf: RequestFactory):
+    class Throttle(PolicyRateThrottle):
+        rules = [ThrottleRule(visits=0, period=60, methods="all")]
+
+    request = rf.get("/unthrottled")
+    request.resolver_match = resolve("/unthrottled")
+
+    assert not Throttle().allow_request(request, view=None)
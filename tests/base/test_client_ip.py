@@ -0,0 +1,120 @@
+from unittest.mock import patch
+
+from django.apps import apps
+from django.test import RequestFactory
+
+import pytest
+
+from maykin_common.client_ip import ClientIPResolver, get_client_ip_address
+
+
+@pytest.fixture
+def resolver() -> ClientIPResolver:
+    return ClientIPResolver(
+        trusted_proxies=["10.0.0.0/8", "2001:db8::/32"],
+        headers=["HTTP_X_REAL_IP", "HTTP_X_FORWARDED_FOR"],
+    )
+
+
+def test_remote_addr_is_used_without_trusted_proxies(rf: RequestFactory):
+    resolver = ClientIPResolver(trusted_proxies=[], headers=["HTTP_X_FORWARDED_FOR"])
+    request = rf.get(
+        "/", REMOTE_ADDR="10.0.0.1", HTTP_X_FORWARDED_FOR="1.2.3.4, 10.0.0.2"
+    )
+
+    assert resolver.resolve(request) == "10.0.0.1"
+
+
+def test_header_is_ignored_for_untrusted_peer(
+    rf: RequestFactory, resolver: ClientIPResolver
+):
+    request = rf.get("/", REMOTE_ADDR="192.0.2.1", HTTP_X_FORWARDED_FOR="1.2.3.4")
+
+    assert resolver.resolve(request) == "192.0.2.1"
+
+
+@pytest.mark.parametrize(
+    "forwarded_for,expected",
+    [
+        ("1.2.3.4", "1.2.3.4"),
+        ("1.2.3.4, 10.0.0.2", "1.2.3.4"),
+        # the client itself can send a spoofed header - only the hops added by trusted
+        # proxies are skipped
+        ("6.6.6.6, 1.2.3.4, 10.0.0.3,10.0.0.2", "1.2.3.4"),
+        # only trusted proxies -> the leftmost one is the closest we can get
+        ("10.0.0.3, 10.0.0.2", "10.0.0.3"),
+        ("garbage, 1.2.3.4", "1.2.3.4"),
+        ("1.2.3.4, garbage, 10.0.0.2", "10.0.0.2"),
+        ("2001:db8::1, 2001:db9::1", "2001:db9::1"),
+    ],
+)
+def test_forwarded_for_is_parsed_right_to_left(
+    rf: RequestFactory, resolver: ClientIPResolver, forwarded_for: str, expected: str
+):
+    request = rf.get("/", REMOTE_ADDR="10.0.0.1", HTTP_X_FORWARDED_FOR=forwarded_for)
+
+    assert resolver.resolve(request) == expected
+
+
+def test_headers_are_checked_in_configured_order(
+    rf: RequestFactory, resolver: ClientIPResolver
+):
+    request = rf.get(
+        "/",
+        REMOTE_ADDR="10.0.0.1",
+        HTTP_X_REAL_IP="5.6.7.8",
+        HTTP_X_FORWARDED_FOR="1.2.3.4",
+    )
+
+    assert resolver.resolve(request) == "5.6.7.8"
+
+
+def test_invalid_remote_addr(rf: RequestFactory, resolver: ClientIPResolver):
+    assert resolver.resolve(rf.get("/", REMOTE_ADDR="")) is None
+    assert resolver.resolve(rf.get("/", REMOTE_ADDR="   ")) is None
+    assert resolver.resolve(rf.get("/", REMOTE_ADDR="not-an-ip")) is None
+
+
+def test_get_client_ip_address_uses_settings(settings, rf: RequestFactory):
+    settings.MKN_CLIENT_IP_TRUSTED_PROXIES = ["127.0.0.1"]
+    request = rf.get("/", REMOTE_ADDR="127.0.0.1", HTTP_X_FORWARDED_FOR="1.2.3.4")
+
+    assert get_client_ip_address(request) == "1.2.3.4"
+
+
+@pytest.mark.skipif(not apps.is_installed("axes"), reason="Requires django-axes")
+def test_get_client_ip_address_defaults_to_axes(rf: RequestFactory):
+    request = rf.get("/", REMOTE_ADDR="10.0.0.1", HTTP_X_FORWARDED_FOR="1.2.3.4")
+
+    # like before the built-in resolver, until the trusted proxies are configured
+    with patch("axes.helpers.get_client_ip_address", return_value="1.2.3.4") as mock:
+        assert get_client_ip_address(request) == "1.2.3.4"
+
+    mock.assert_called_once_with(request)
+
+
+def test_get_client_ip_address_without_axes(settings, rf: RequestFactory):
+    settings.INSTALLED_APPS = [app for app in settings.INSTALLED_APPS if app != "axes"]
+    request = rf.get("/", REMOTE_ADDR="10.0.0.1", HTTP_X_FORWARDED_FOR="1.2.3.4")
+
+    assert get_client_ip_address(request) == "10.0.0.1"
+
+
+def test_get_client_ip_address_caches_on_request(settings, rf: RequestFactory):
+    request = rf.get("/", REMOTE_ADDR="1.2.3.4")
+
+    assert get_client_ip_address(request) == "1.2.3.4"
+
+    request.META["REMOTE_ADDR"] = "5.6.7.8"
+    assert get_client_ip_address(request) == "1.2.3.4"
+
+
+def test_get_client_ip_address_custom_function(settings, rf: RequestFactory):
+    settings.MKN_CLIENT_IP_FUNCTION = "tests.base.test_client_ip._fixed_ip"
+    request = rf.get("/", REMOTE_ADDR="1.2.3.4")
+
+    assert get_client_ip_address(request) == "9.9.9.9"
+
+
+def _fixed_ip(request) -> str:
+    return "9.9.9.9"
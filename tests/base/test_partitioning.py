@@ -0,0 +1,162 @@
+from datetime import UTC, datetime
+
+from django.apps import apps
+from django.db import connection
+from django.db.migrations.state import ProjectState
+
+import pytest
+import time_machine
+
+from maykin_common.migration_operations import PartitionByMonth
+from maykin_common.partitioning import (
+    drop_monthly_partitions,
+    ensure_monthly_partitions,
+    get_monthly_partitions,
+    get_partition_key,
+    partition_table_by_month,
+)
+
+pytestmark = [
+    pytest.mark.django_db,
+    pytest.mark.skipif(
+        connection.vendor != "postgresql", reason="Partitioning requires PostgreSQL"
+    ),
+]
+
+
+@pytest.fixture
+def events_table():
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "CREATE TABLE events ("
+            "id bigint GENERATED BY DEFAULT AS IDENTITY PRIMARY KEY, "
+            "created timestamptz NOT NULL, "
+            "name varchar(50) NOT NULL UNIQUE, "
+            "user_id integer NULL REFERENCES auth_user (id))"
+        )
+        cursor.execute("CREATE INDEX events_user_id ON events (user_id)")
+        cursor.executemany(
+            "INSERT INTO events (created, name) VALUES (%s, %s)",
+            [
+                ("2026-01-15T12:00:00Z", "first"),
+                ("2026-03-31T23:59:59Z", "second"),
+            ],
+        )
+    return "events"
+
+
+def _insert_event(created: str, name: str) -> int:
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "INSERT INTO events (created, name) VALUES (%s, %s) RETURNING id",
+            [created, name],
+        )
+        return cursor.fetchone()[0]
+
+
+def _partition_names(table: str) -> list[str]:
+    return [partition.name for partition in get_monthly_partitions(connection, table)]
+
+
+@time_machine.travel("2026-04-10")
+def test_partition_table_by_month(events_table):
+    partition_table_by_month(connection, events_table, "created", months_ahead=2)
+
+    assert get_partition_key(connection, events_table) == "created"
+    assert _partition_names(events_table) == [
+        "events_p202601",
+        "events_p202602",
+        "events_p202603",
+        "events_p202604",
+        "events_p202605",
+        "events_p202606",
+    ]
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT name FROM events_p202603")
+        assert cursor.fetchall() == [("second",)]
+        cursor.execute(
+            "SELECT conname FROM pg_constraint WHERE conrelid = 'events'::regclass "
+            "ORDER BY conname"
+        )
+        constraints = [name for (name,) in cursor.fetchall()]
+        assert "events_pkey" in constraints
+        assert "events_user_id_fkey" in constraints
+    # the identity sequence continues where the old table left off
+    assert _insert_event("2026-04-10T00:00:00Z", "third") == 3
+
+
+@time_machine.travel("2026-04-10")
+def test_partition_table_by_month_keeps_partial_indexes(events_table):
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "CREATE INDEX events_unassigned ON events (created) WHERE user_id IS NULL"
+        )
+
+    partition_table_by_month(connection, events_table, "created", months_ahead=0)
+
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT indexdef FROM pg_indexes "
+            "WHERE tablename = 'events' AND indexname = 'events_unassigned'"
+        )
+        (definition,) = cursor.fetchone()
+    assert definition.endswith("WHERE (user_id IS NULL)")
+
+
+@time_machine.travel("2026-04-10")
+def test_partition_table_by_month_is_idempotent(events_table):
+    partition_table_by_month(connection, events_table, "created", months_ahead=0)
+    partition_table_by_month(connection, events_table, "created", months_ahead=0)
+
+    assert get_partition_key(connection, events_table) == "created"
+
+
+def test_ensure_monthly_partitions_moves_rows_from_default(events_table):
+    with time_machine.travel("2026-03-10"):
+        partition_table_by_month(connection, events_table, "created", months_ahead=0)
+    _insert_event("2026-05-02T00:00:00Z", "future")
+
+    with time_machine.travel("2026-04-10"):
+        created = ensure_monthly_partitions(connection, events_table, months_ahead=1)
+
+    assert created == ["events_p202604", "events_p202605"]
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT COUNT(*) FROM events_default")
+        assert cursor.fetchone() == (0,)
+        cursor.execute("SELECT name FROM events_p202605")
+        assert cursor.fetchall() == [("future",)]
+
+
+@time_machine.travel("2026-04-10")
+def test_drop_monthly_partitions(events_table):
+    partition_table_by_month(connection, events_table, "created", months_ahead=0)
+
+    dropped = drop_monthly_partitions(
+        connection, events_table, datetime(2026, 3, 15, tzinfo=UTC)
+    )
+
+    assert [partition.name for partition in dropped] == [
+        "events_p202601",
+        "events_p202602",
+    ]
+    assert _partition_names(events_table) == ["events_p202603", "events_p202604"]
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT name FROM events")
+        assert cursor.fetchall() == [("second",)]
+
+
+def test_partition_by_month_operation():
+    operation = PartitionByMonth("django_yubin.Log", "date", months_ahead=1)
+    state = ProjectState.from_apps(apps)
+
+    with connection.schema_editor() as schema_editor:
+        operation.database_forwards("django_yubin", schema_editor, state, state)
+
+    assert get_partition_key(connection, "django_yubin_log") == "date"
+    assert operation.describe() == "Partition django_yubin.Log by month on date"
+    assert operation.migration_name_fragment == "partition_log_by_month"
+    assert operation.deconstruct() == (
+        "PartitionByMonth",
+        [],
+        {"model": "django_yubin.Log", "field": "date", "months_ahead": 1},
+    )
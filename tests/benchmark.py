@@ -0,0 +1,223 @@
+"""
+Small harness to measure the cost of code paths under concurrency.
+
+Benchmarks are regular pytest tests marked with ``benchmark``. They are deselected in
+the default tox environments - run them with ``tox -e benchmark`` or
+``pytest -m benchmark -s``.
+
+The amount of work per benchmark can be tuned with the ``BENCHMARK_ITERATIONS``
+environment variable (number of calls per thread).
+
+Throughput benchmarks of a whole pipeline use :func:`measure_throughput` instead, which
+reports the items per second, the database queries per item and the peak memory.
+"""
+
+import itertools
+import os
+import statistics
+import threading
+import time
+import tracemalloc
+from collections.abc import Callable
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+
+from django.core.cache.backends.base import BaseCache
+from django.db import connections
+from django.db.backends.signals import connection_created
+
+ITERATIONS = int(os.environ.get("BENCHMARK_ITERATIONS", "200"))
+
+
+@dataclass
+class BenchmarkResult:
+    label: str
+    threads: int
+    duration: float
+    latencies: list[float] = field(repr=False)
+    cache_calls: int = 0
+
+    @property
+    def calls(self) -> int:
+        return len(self.latencies)
+
+    @property
+    def calls_per_second(self) -> float:
+        return self.calls / self.duration
+
+    def percentile(self, pct: int) -> float:
+        return statistics.quantiles(self.latencies, n=100, method="inclusive")[pct - 1]
+
+    @property
+    def cache_calls_per_call(self) -> float:
+        return self.cache_calls / self.calls
+
+    def format(self) -> str:
+        return (
+            f"{self.label:<48} threads={self.threads:<3} "
+            f"ops/s={self.calls_per_second:>10.0f} "
+            f"p50={self.percentile(50) * 1e6:>8.1f}us "
+            f"p99={self.percentile(99) * 1e6:>8.1f}us "
+            f"cache/op={self.cache_calls_per_call:.2f}"
+        )
+
+
+class CountingCache:
+    """
+    Wrap a cache backend and count the method calls made on it.
+    """
+
+    def __init__(self, cache: BaseCache):
+        self._cache = cache
+        self._lock = threading.Lock()
+        self._calls = 0
+
+    def __getattr__(self, name: str):
+        attr = getattr(self._cache, name)
+        if not callable(attr):
+            return attr
+
+        def _counted(*args, **kwargs):
+            with self._lock:
+                self._calls += 1
+            return attr(*args, **kwargs)
+
+        return _counted
+
+    @property
+    def calls(self) -> int:
+        return self._calls
+
+
+def run_benchmark(
+    label: str,
+    func: Callable[[int, int], object],
+    *,
+    threads: int,
+    iterations: int = ITERATIONS,
+    cache: CountingCache | None = None,
+) -> BenchmarkResult:
+    """
+    Call ``func(thread_index, iteration)`` ``iterations`` times in each of ``threads``.
+
+    All threads start together and the wall clock time of the whole run is reported,
+    together with the latency of every individual call.
+    """
+    barrier = threading.Barrier(threads + 1)
+    latencies: list[list[float]] = [[] for _ in range(threads)]
+
+    def _worker(thread_index: int) -> None:
+        thread_latencies = latencies[thread_index]
+        barrier.wait()
+        for iteration in range(iterations):
+            start = time.perf_counter()
+            func(thread_index, iteration)
+            thread_latencies.append(time.perf_counter() - start)
+
+    calls_before = cache.calls if cache else 0
+    with ThreadPoolExecutor(max_workers=threads) as executor:
+        futures = [executor.submit(_worker, index) for index in range(threads)]
+        barrier.wait()
+        start = time.perf_counter()
+        for future in futures:
+            future.result()
+        duration = time.perf_counter() - start
+
+    return BenchmarkResult(
+        label=label,
+        threads=threads,
+        duration=duration,
+        latencies=list(itertools.chain.from_iterable(latencies)),
+        cache_calls=(cache.calls - calls_before) if cache else 0,
+    )
+
+
+@dataclass
+class ThroughputResult:
+    label: str
+    items: int
+    duration: float
+    queries: int
+    peak_memory: int
+
+    @property
+    def items_per_second(self) -> float:
+        return self.items / self.duration
+
+    @property
+    def queries_per_item(self) -> float:
+        return self.queries / self.items
+
+    def format(self) -> str:
+        return (
+            f"{self.label:<48} items={self.items:<6} "
+            f"items/s={self.items_per_second:>8.0f} "
+            f"queries/item={self.queries_per_item:>6.2f} "
+            f"peak_memory={self.peak_memory / 2**20:>7.1f}MiB"
+        )
+
+
+class QueryCounter:
+    """
+    Count the database queries made by all threads while active.
+
+    Connections opened by other threads (like the worker threads of a thread pool) are
+    counted from the moment they connect.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._queries = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        with self._lock:
+            self._queries += 1
+        return execute(sql, params, many, context)
+
+    def _install(self, sender, connection, **kwargs) -> None:
+        if self not in connection.execute_wrappers:
+            connection.execute_wrappers.append(self)
+
+    def __enter__(self):
+        for connection in connections.all(initialized_only=True):
+            self._install(sender=None, connection=connection)
+        connection_created.connect(self._install)
+        return self
+
+    def __exit__(self, *exc_info):
+        connection_created.disconnect(self._install)
+        for connection in connections.all(initialized_only=True):
+            if self in connection.execute_wrappers:
+                connection.execute_wrappers.remove(self)
+
+    @property
+    def queries(self) -> int:
+        return self._queries
+
+
+def measure_throughput(
+    label: str, func: Callable[[], object], *, items: int
+) -> ThroughputResult:
+    """
+    Call ``func()`` once, which processes ``items`` items, and measure the cost.
+
+    Memory allocations are traced with :mod:`tracemalloc` during the call, which slows
+    it down. Compare the throughput of runs measured in the same way only.
+    """
+    tracemalloc.start()
+    try:
+        with QueryCounter() as counter:
+            start = time.perf_counter()
+            func()
+            duration = time.perf_counter() - start
+        _, peak_memory = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    return ThroughputResult(
+        label=label,
+        items=items,
+        duration=duration,
+        queries=counter.queries,
+        peak_memory=peak_memory,
+    )
@@ -1,15 +1,23 @@
+import http.client
+import subprocess
+import sys
+import threading
+from http.server import BaseHTTPRequestHandler, HTTPServer
 from unittest.mock import patch
 
-import requests
+import pytest
 from typer.testing import CliRunner
 
-from maykin_common.cli import app
+from maykin_common.cli import app, main
+from maykin_common.cli.health_check import check
 
 runner = CliRunner()
 
 
 def test_health_check_defaults():
-    with patch("maykin_common.cli.requests.get") as mock_get:
+    with patch(
+        "maykin_common.cli.health_check.get_status_code", return_value=200
+    ) as mock_get:
         result = runner.invoke(app, ["health-check"])
 
     assert result.exit_code == 0
@@ -17,7 +25,9 @@ def test_health_check_defaults():
 
 
 def test_health_check_host_without_protocol():
-    with patch("maykin_common.cli.requests.get") as mock_get:
+    with patch(
+        "maykin_common.cli.health_check.get_status_code", return_value=200
+    ) as mock_get:
         result = runner.invoke(app, ["health-check", "--endpoint=localhost:9000/ht/"])
 
     assert result.exit_code == 0
@@ -25,7 +35,9 @@ def test_health_check_host_without_protocol():
 
 
 def test_health_check_with_empty_endpoint():
-    with patch("maykin_common.cli.requests.get") as mock_get:
+    with patch(
+        "maykin_common.cli.health_check.get_status_code", return_value=200
+    ) as mock_get:
         result = runner.invoke(app, ["health-check", "--endpoint="])
 
     assert result.exit_code == 0
@@ -33,7 +45,9 @@ def test_health_check_with_empty_endpoint():
 
 
 def test_health_check_with_fully_qualified_endpoint():
-    with patch("maykin_common.cli.requests.get") as mock_get:
+    with patch(
+        "maykin_common.cli.health_check.get_status_code", return_value=200
+    ) as mock_get:
         result = runner.invoke(app, ["health-check", "--endpoint=https://example.com/"])
 
     assert result.exit_code == 0
@@ -41,7 +55,9 @@ def test_health_check_with_fully_qualified_endpoint():
 
 
 def test_health_check_with_custom_timeout():
-    with patch("maykin_common.cli.requests.get") as mock_get:
+    with patch(
+        "maykin_common.cli.health_check.get_status_code", return_value=200
+    ) as mock_get:
         result = runner.invoke(app, ["health-check", "--timeout=1"])
 
     assert result.exit_code == 0
@@ -50,21 +66,159 @@ def test_health_check_with_custom_timeout():
 
 def test_failing_health_check_exits_with_exit_code_1():
     with patch(
-        "maykin_common.cli.requests.get",
-        side_effect=requests.RequestException,
+        "maykin_common.cli.health_check.get_status_code",
+        side_effect=ConnectionRefusedError,
     ):
         result = runner.invoke(app, ["health-check", "--timeout=1"])
 
     assert result.exit_code == 1
+    assert "DOWN (ConnectionRefusedError)" in result.output
 
 
 def test_failing_health_check_exits_with_exit_code_1_bad_response_status_code():
-    bad_response = requests.Response()
-    bad_response.status_code = 503
     with patch(
-        "maykin_common.cli.requests.get",
-        return_value=bad_response,
+        "maykin_common.cli.health_check.get_status_code",
+        return_value=503,
     ):
         result = runner.invoke(app, ["health-check", "--timeout=1"])
 
     assert result.exit_code == 1
+
+
+def test_failing_health_check_exits_with_exit_code_1_invalid_response():
+    with patch(
+        "maykin_common.cli.health_check.get_status_code",
+        side_effect=http.client.BadStatusLine("garbage"),
+    ):
+        result = runner.invoke(app, ["health-check", "--timeout=1"])
+
+    assert result.exit_code == 1
+
+
+@pytest.mark.parametrize(
+    "args,url,timeout",
+    [
+        ([], "http://localhost:8000/_healthz/livez/", 3),
+        (["--endpoint", "localhost:9000/ht/"], "http://localhost:9000/ht/", 3),
+        (
+            ["--endpoint=https://example.com/", "--timeout", "1"],
+            "https://example.com/",
+            1,
+        ),
+    ],
+)
+def test_main_runs_health_check_without_typer(capsys, args, url, timeout):
+    with (
+        patch(
+            "maykin_common.cli.health_check.get_status_code", return_value=204
+        ) as mock_get,
+        patch("maykin_common.cli.commands.app") as mock_app,
+        pytest.raises(SystemExit) as exit_info,
+    ):
+        main(["health-check", *args])
+
+    assert exit_info.value.code == 0
+    mock_get.assert_called_once_with(url, timeout=timeout)
+    mock_app.assert_not_called()
+    assert capsys.readouterr().out == "UP, response status code: 204\n"
+
+
+@pytest.mark.parametrize(
+    "args",
+    [["--help"], ["--timeout=soon"], ["--endpoint"], ["--unknown"]],
+)
+def test_main_leaves_other_health_check_arguments_to_typer(args):
+    with patch("maykin_common.cli.commands.app") as mock_app:
+        main(["health-check", *args])
+
+    mock_app.assert_called_once_with(args=["health-check", *args])
+
+
+class _HealthyHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        match self.path:
+            case "/_healthz/livez/":
+                self.send_response(200)
+            case "/moved/":
+                self.send_response(301)
+                self.send_header("Location", "/_healthz/livez/")
+            case "/loop/":
+                self.send_response(302)
+                self.send_header("Location", "/loop/")
+            case "/nowhere/":
+                self.send_response(302)
+            case _:
+                self.send_response(404)
+        self.end_headers()
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def http_server():
+    server = HTTPServer(("127.0.0.1", 0), _HealthyHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+    thread.join()
+
+
+@pytest.mark.parametrize(
+    "path,expected",
+    [
+        ("/moved/", (True, "UP, response status code: 200")),
+        ("/loop/", (False, "DOWN, response status code: 302")),
+        ("/nowhere/", (False, "DOWN, response status code: 302")),
+    ],
+)
+def test_health_check_redirects(http_server: HTTPServer, path, expected):
+    host, port = http_server.server_address[:2]
+
+    assert check(f"{host}:{port}{path}", timeout=1) == expected
+
+
+def test_health_check_cold_start(http_server: HTTPServer):
+    """
+    Assert a health check probe only imports what it needs.
+    """
+    host, port = http_server.server_address[:2]
+    result = subprocess.run(
+        [
+            sys.executable,
+            "-X",
+            "importtime",
+            "-m",
+            "maykin_common.cli",
+            "health-check",
+            f"--endpoint={host}:{port}",
+        ],
+        capture_output=True,
+        text=True,
+        timeout=30,
+    )
+
+    assert result.returncode == 0, result.stderr
+    assert result.stdout == "UP, response status code: 200\n"
+
+    # lines look like: "import time:   self [us] | cumulative | imported package"
+    imports = [
+        line.removeprefix("import time:").split("|")
+        for line in result.stderr.splitlines()
+        if line.startswith("import time:") and "self [us]" not in line
+    ]
+    names = [name.strip() for *_, name in imports]
+    # everything imported after the interpreter started up
+    start = names.index("maykin_common")
+    packages = {name.partition(".")[0] for name in names[start:]}
+    assert packages - set(sys.stdlib_module_names) == {"maykin_common"}
+    # maykin_common.cli runs as __main__, so its imports are the top-level ones. The
+    # threshold is generous, to catch heavy imports without flaking on slow runners.
+    cold_start_us = sum(
+        int(cumulative_us)
+        for _, cumulative_us, name in imports[start:]
+        if not name.startswith("  ")
+    )
+    assert cold_start_us < 300_000
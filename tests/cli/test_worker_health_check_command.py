@@ -1,3 +1,4 @@
+import json
 import subprocess
 import time
 from collections.abc import Callable
@@ -7,8 +8,9 @@ import pytest
 from celery import Celery
 from typer.testing import CliRunner
 
-from maykin_common.cli import (
+from maykin_common.cli.commands import (
     _WORKER_EXIT_CODE_EVENT_LOOP_BROKEN,
+    _WORKER_EXIT_CODE_EVENT_LOOP_LAGGING,
     _WORKER_EXIT_CODE_NOT_READY,
     _WORKER_EXIT_CODE_PING_FAILURE,
     app,
@@ -145,6 +147,58 @@ def test_event_loop_liveness_is_a_file_and_young_enough(tmp_path: Path):
     assert result.exit_code == 0
 
 
+def _lag(p50: float, samples: int = 60):
+    return {"p50": p50, "p99": p50, "max": p50, "samples": samples}
+
+
+@pytest.mark.parametrize(
+    "content,exit_code",
+    [
+        (json.dumps({"lag": _lag(0.01)}), 0),
+        (json.dumps({"lag": _lag(2.5)}), _WORKER_EXIT_CODE_EVENT_LOOP_LAGGING),
+        # not measured (yet)
+        (json.dumps({"lag": _lag(0, samples=0)}), 0),
+        ("", 0),
+    ],
+)
+def test_event_loop_lag(tmp_path: Path, content: str, exit_code: int):
+    test_file = tmp_path / "test"
+    test_file.write_text(content)
+
+    result = runner.invoke(
+        app,
+        [
+            "worker-health-check",
+            "--liveness-file",
+            str(test_file),
+            "--max-lag",
+            "1",
+            "--skip-ping",
+            "--skip-readiness",
+        ],
+    )
+
+    assert result.exit_code == exit_code
+
+
+def test_event_loop_lag_not_checked_by_default(tmp_path: Path):
+    test_file = tmp_path / "test"
+    test_file.write_text(json.dumps({"lag": _lag(3600)}))
+
+    result = runner.invoke(
+        app,
+        [
+            "worker-health-check",
+            "--liveness-file",
+            str(test_file),
+            "--skip-ping",
+            "--skip-readiness",
+        ],
+    )
+
+    assert result.exit_code == 0
+
+
 #
 # PING
 #
@@ -273,3 +327,111 @@ def test_readiness_exists(tmp_path: Path):
     )
 
     assert result.exit_code == 0
+
+
+#
+# STATUS SOCKET
+#
+def _status(*, age=5.0, lag=0.01, connected=True, ready=True):
+    return {
+        "ready": ready,
+        "event_loop": {"last_tick": time.time() - age, "age": age, "lag": _lag(lag)},
+        "consumer": {"state": "running", "connected": connected},
+        "pool": {"concurrency": 1, "active": 0, "reserved": 0, "utilization": 0},
+    }
+
+
+@pytest.fixture
+def status_server(tmp_path: Path):
+    from maykin_common.health_checks.celery.status import StatusServer
+
+    status = _status()
+    server = StatusServer(tmp_path / "worker.sock", lambda: status)
+    server.start()
+    try:
+        yield server, status
+    finally:
+        server.stop()
+
+
+def test_status_socket_all_checks_pass(status_server):
+    server, _ = status_server
+
+    result = runner.invoke(
+        app,
+        [
+            "worker-health-check",
+            "--status-socket",
+            str(server.path),
+            "--no-skip-readiness",
+            "--max-lag",
+            "1",
+            # not used with a status socket
+            "--liveness-file",
+            "/does-not-exist",
+            "--broker",
+            "redis://does-not-exist:6379/0",
+        ],
+    )
+
+    assert result.exit_code == 0
+    assert "The event loop appears to be running." in result.output
+    assert "The worker is connected to the broker." in result.output
+    assert "The worker appears ready to process tasks." in result.output
+
+
+@pytest.mark.parametrize(
+    "status,exit_code",
+    [
+        (_status(age=71), _WORKER_EXIT_CODE_EVENT_LOOP_BROKEN),
+        (_status(lag=2.5), _WORKER_EXIT_CODE_EVENT_LOOP_LAGGING),
+        (_status(connected=False), _WORKER_EXIT_CODE_PING_FAILURE),
+        (_status(ready=False), _WORKER_EXIT_CODE_NOT_READY),
+    ],
+)
+def test_status_socket_failing_checks(status_server, status, exit_code):
+    server, current_status = status_server
+    current_status.update(status)
+
+    result = runner.invoke(
+        app,
+        [
+            "worker-health-check",
+            "--status-socket",
+            str(server.path),
+            "--no-skip-readiness",
+            "--max-lag",
+            "1",
+        ],
+    )
+
+    assert result.exit_code == exit_code
+
+
+def test_status_socket_skipped_checks(status_server):
+    server, current_status = status_server
+    current_status.update(_status(age=3600, lag=3600, connected=False, ready=False))
+
+    result = runner.invoke(
+        app,
+        [
+            "worker-health-check",
+            "--status-socket",
+            str(server.path),
+            "--max-lag",
+            "1",
+            "--skip-event-loop-liveness",
+            "--skip-ping",
+        ],
+    )
+
+    assert result.exit_code == 0
+
+
+def test_status_socket_does_not_exist(tmp_path: Path):
+    result = runner.invoke(
+        app,
+        ["worker-health-check", "--status-socket", str(tmp_path / "worker.sock")],
+    )
+
+    assert result.exit_code == _WORKER_EXIT_CODE_EVENT_LOOP_BROKEN
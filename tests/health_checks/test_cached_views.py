@@ -0,0 +1,184 @@
+import asyncio
+import dataclasses
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import patch
+
+from django.core.cache import cache
+from django.core.cache.backends.locmem import LocMemCache
+from django.test import RequestFactory
+
+import pytest
+from asgiref.sync import async_to_sync
+from health_check.base import HealthCheck
+from health_check.exceptions import ServiceUnavailable
+
+from maykin_common.health_checks import views
+from maykin_common.health_checks.views import CachedHealthCheckView
+
+
+@dataclasses.dataclass
+class CountingCheck(HealthCheck):
+    """
+    Count the evaluations, optionally taking some time or failing.
+    """
+
+    runs = 0
+    lock = threading.Lock()
+
+    duration: float = 0
+    fail: bool = False
+
+    def run(self):
+        with CountingCheck.lock:
+            CountingCheck.runs += 1
+        time.sleep(self.duration)
+        if self.fail:
+            raise ServiceUnavailable("Down")
+
+
+@pytest.fixture(autouse=True)
+def clear_results():
+    CountingCheck.runs = 0
+    views._results.clear()
+    cache.clear()
+    yield
+    views._results.clear()
+
+
+def _get(view, **headers):
+    request = RequestFactory().get("/_healthz/", **headers)
+    return async_to_sync(view)(request)
+
+
+def test_results_are_reused_within_timeout():
+    view = CachedHealthCheckView.as_view(checks=[CountingCheck], cache_timeout=60)
+
+    first = _get(view, HTTP_ACCEPT="application/json")
+    second = _get(view, HTTP_ACCEPT="application/json")
+
+    assert CountingCheck.runs == 1
+    assert first.status_code == second.status_code == 200
+    assert first.content == second.content
+
+
+def test_results_expire(settings):
+    settings.MKN_HEALTH_CHECKS_CACHE_TIMEOUT = 5
+    view = CachedHealthCheckView.as_view(checks=[CountingCheck])
+    _get(view)
+
+    with patch.object(views.time, "monotonic", return_value=time.monotonic() + 6):
+        _get(view)
+
+    assert CountingCheck.runs == 2
+
+
+def test_caching_disabled(settings):
+    settings.MKN_HEALTH_CHECKS_CACHE_TIMEOUT = 0
+    view = CachedHealthCheckView.as_view(checks=[CountingCheck])
+
+    _get(view)
+    _get(view)
+
+    assert CountingCheck.runs == 2
+
+
+def test_failures_are_reused():
+    view = CachedHealthCheckView.as_view(
+        checks=[(CountingCheck, {"fail": True})], cache_timeout=60
+    )
+
+    first = _get(view, HTTP_ACCEPT="text/plain")
+    second = _get(view, HTTP_ACCEPT="text/plain")
+
+    assert CountingCheck.runs == 1
+    assert first.status_code == second.status_code == 500
+    assert b"Unavailable: Down" in second.content
+
+
+def test_views_with_different_checks_do_not_share_results():
+    _get(CachedHealthCheckView.as_view(checks=[CountingCheck], cache_timeout=60))
+    _get(
+        CachedHealthCheckView.as_view(
+            checks=[(CountingCheck, {"duration": 0.01})], cache_timeout=60
+        )
+    )
+
+    assert CountingCheck.runs == 2
+
+
+def test_concurrent_requests_in_threads_share_one_evaluation():
+    view = CachedHealthCheckView.as_view(
+        checks=[(CountingCheck, {"duration": 0.2})], cache_timeout=60
+    )
+
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        responses = list(executor.map(lambda _: _get(view), range(8)))
+
+    assert CountingCheck.runs == 1
+    assert {response.status_code for response in responses} == {200}
+
+
+def test_concurrent_requests_in_event_loop_share_one_evaluation():
+    view = CachedHealthCheckView.as_view(
+        checks=[(CountingCheck, {"duration": 0.2})], cache_timeout=60
+    )
+    factory = RequestFactory()
+
+    async def probe_storm():
+        return await asyncio.gather(
+            *(view(factory.get("/_healthz/")) for _ in range(8))
+        )
+
+    responses = asyncio.run(probe_storm())
+
+    assert CountingCheck.runs == 1
+    assert {response.status_code for response in responses} == {200}
+
+
+def test_cancelled_leader_does_not_cancel_the_evaluation():
+    view = CachedHealthCheckView.as_view(
+        checks=[(CountingCheck, {"duration": 0.5})], cache_timeout=60
+    )
+    factory = RequestFactory()
+
+    async def leader_disconnects():
+        leader = asyncio.ensure_future(view(factory.get("/_healthz/")))
+        await asyncio.sleep(0.1)
+        follower = asyncio.ensure_future(view(factory.get("/_healthz/")))
+        await asyncio.sleep(0.1)
+        leader.cancel()
+        return leader, await follower
+
+    leader, response = asyncio.run(leader_disconnects())
+
+    assert leader.cancelled()
+    assert response.status_code == 200
+    assert CountingCheck.runs == 1
+
+
+def test_shared_results(settings):
+    settings.MKN_HEALTH_CHECKS_CACHE_ALIAS = "default"
+    view = CachedHealthCheckView.as_view(checks=[CountingCheck], cache_timeout=60)
+    _get(view)
+
+    response = _get(view)
+
+    assert CountingCheck.runs == 1
+    assert response.status_code == 200
+
+
+def test_shared_cache_unavailable(settings, caplog):
+    settings.MKN_HEALTH_CHECKS_CACHE_ALIAS = "default"
+    view = CachedHealthCheckView.as_view(checks=[CountingCheck], cache_timeout=60)
+
+    with (
+        patch.object(LocMemCache, "aget", side_effect=ConnectionError),
+        patch.object(LocMemCache, "aset", side_effect=ConnectionError),
+    ):
+        response = _get(view)
+
+    assert CountingCheck.runs == 1
+    assert response.status_code == 200
+    assert caplog.messages.count("health_check_cache_unavailable") == 2
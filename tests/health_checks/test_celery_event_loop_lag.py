@@ -0,0 +1,86 @@
+import json
+from pathlib import Path
+from types import SimpleNamespace
+from unittest.mock import Mock, patch
+
+from maykin_common.health_checks.celery import probes
+from maykin_common.health_checks.celery.lag import LagHistogram
+from maykin_common.health_checks.celery.probes import EventLoopProbe
+
+
+def test_lag_histogram_summary():
+    histogram = LagHistogram(size=100)
+    for lag in range(1, 101):
+        histogram.add(lag / 1000)
+
+    assert histogram.summary() == {
+        "p50": 0.05,
+        "p99": 0.099,
+        "max": 0.1,
+        "samples": 100,
+    }
+
+
+def test_lag_histogram_keeps_recent_samples():
+    histogram = LagHistogram(size=3)
+    for lag in (10.0, 0.1, 0.2, 0.3):
+        histogram.add(lag)
+
+    summary = histogram.summary()
+
+    assert summary["max"] == 0.3
+    assert summary["samples"] == 3
+
+
+def test_lag_histogram_without_samples():
+    assert LagHistogram(size=3).summary() == {
+        "p50": 0.0,
+        "p99": 0.0,
+        "max": 0.0,
+        "samples": 0,
+    }
+
+
+def _start_probe(settings, tmp_path: Path) -> tuple[EventLoopProbe, Mock]:
+    settings.MKN_HEALTH_CHECKS_WORKER_EVENT_LOOP_LIVENESS_FILE = tmp_path / "live"
+    settings.MKN_HEALTH_CHECKS_WORKER_EVENT_LOOP_PROBE_FREQUENCY_SECONDS = 60
+    settings.MKN_HEALTH_CHECKS_WORKER_EVENT_LOOP_LAG_INTERVAL_SECONDS = 1
+    timer = Mock()
+    probe = EventLoopProbe(parent=SimpleNamespace(), timer=timer)
+    probe.start(SimpleNamespace(timer=timer))
+    return probe, timer
+
+
+def test_probe_schedules_lag_measurement(settings, tmp_path: Path):
+    probe, timer = _start_probe(settings, tmp_path)
+
+    timer.call_repeatedly.assert_any_call(1, probe.measure_lag, priority=10)
+    assert json.loads((tmp_path / "live").read_text()) == {
+        "lag": {"p50": 0.0, "p99": 0.0, "max": 0.0, "samples": 0}
+    }
+
+
+def test_probe_measures_lag(settings, tmp_path: Path):
+    probe, _ = _start_probe(settings, tmp_path)
+    scheduled_at = probe.next_sample
+
+    with (
+        patch.object(probes.time, "monotonic", return_value=scheduled_at + 2.5),
+        patch.object(probes, "record_event_loop_lag") as record_event_loop_lag,
+    ):
+        probe.measure_lag()
+    probe.tick()
+
+    record_event_loop_lag.assert_called_once_with(2.5)
+    assert probe.next_sample == scheduled_at + 3.5
+    lag = json.loads((tmp_path / "live").read_text())["lag"]
+    assert lag == {"p50": 2.5, "p99": 2.5, "max": 2.5, "samples": 1}
+
+
+def test_probe_timer_fires_early(settings, tmp_path: Path):
+    probe, _ = _start_probe(settings, tmp_path)
+
+    with patch.object(probes.time, "monotonic", return_value=probe.next_sample - 0.1):
+        probe.measure_lag()
+
+    assert probe.lag.summary()["max"] == 0
@@ -10,6 +10,7 @@ from pathlib import Path
 import pytest
 from celery import Celery
 
+from maykin_common.cli.worker_status import get_worker_status
 from maykin_common.health_checks.celery.probes import (
     EventLoopProbe,
     connect_worker_signals,
@@ -53,9 +54,16 @@ def worker_readiness_file(request, tmp_path: Path) -> Path:
     return dir_path / "worker_ready"
 
 
+@pytest.fixture
+def worker_status_socket(tmp_path: Path) -> Path:
+    return tmp_path / "worker.sock"
+
+
 @pytest.fixture
 def start_worker_process(
-    worker_event_loop_liveness_file: Path, worker_readiness_file: Path
+    worker_event_loop_liveness_file: Path,
+    worker_readiness_file: Path,
+    worker_status_socket: Path,
 ):
     """
     Start a subprocess running worker and stop it when the test exits.
@@ -83,6 +91,7 @@ def start_worker_process(
         worker_event_loop_liveness_file
     )
     env["MKN_HEALTH_CHECKS_WORKER_READINESS_FILE"] = str(worker_readiness_file)
+    env["MKN_HEALTH_CHECKS_WORKER_STATUS_SOCKET"] = str(worker_status_socket)
 
     # start the process and let it run in the background - it should not exit by itself.
     proc = subprocess.Popen(
@@ -176,6 +185,25 @@ def test_worker_removes_probe_files_on_exit(
     assert not worker_event_loop_liveness_file.exists()
 
 
+def test_worker_serves_status(
+    start_worker_process: subprocess.Popen[bytes],
+    worker_readiness_file: Path,
+    worker_status_socket: Path,
+):
+    _wait_until(worker_readiness_file.exists, timeout=5)
+
+    status = get_worker_status(worker_status_socket, timeout=1)
+
+    assert status["ready"] is True
+    assert status["event_loop"]["age"] < 2
+    assert status["consumer"] == {"state": "running", "connected": True}
+    assert status["pool"]["concurrency"] > 0
+
+    start_worker_process.terminate()
+    start_worker_process.wait(timeout=10)
+    assert not worker_status_socket.exists()
+
+
 @pytest.mark.worker_event_loop_liveness_file(subpath="subpath-to-create")
 @pytest.mark.worker_readiness_file(subpath="other-subpath-to-create")
 def test_intermediate_directories_are_created(
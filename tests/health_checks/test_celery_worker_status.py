@@ -0,0 +1,82 @@
+import time
+from pathlib import Path
+from types import SimpleNamespace
+from unittest.mock import patch
+
+from celery import bootsteps
+
+from maykin_common.cli.worker_status import get_worker_status as fetch_worker_status
+from maykin_common.health_checks.celery.status import StatusServer, get_worker_status
+
+
+def _worker(*, state=bootsteps.RUN, connected=True, concurrency=4):
+    connection = SimpleNamespace(connected=connected)
+    consumer = SimpleNamespace(
+        blueprint=SimpleNamespace(state=state), connection=connection
+    )
+    return SimpleNamespace(consumer=consumer, concurrency=concurrency)
+
+
+def test_get_worker_status():
+    last_tick = time.time() - 10
+
+    with (
+        patch("celery.worker.state.active_requests", {"request-1"}),
+        patch("celery.worker.state.reserved_requests", {"request-1", "request-2"}),
+    ):
+        status = get_worker_status(
+            _worker(),
+            ready=True,
+            last_tick=last_tick,
+            lag={"p50": 0.01, "p99": 0.02, "max": 0.02, "samples": 60},
+        )
+
+    assert status["ready"] is True
+    assert status["event_loop"]["last_tick"] == last_tick
+    assert status["event_loop"]["lag"] == {
+        "p50": 0.01,
+        "p99": 0.02,
+        "max": 0.02,
+        "samples": 60,
+    }
+    assert 10 <= status["event_loop"]["age"] < 11
+    assert status["consumer"] == {"state": "running", "connected": True}
+    assert status["pool"] == {
+        "concurrency": 4,
+        "active": 1,
+        "reserved": 2,
+        "utilization": 0.25,
+    }
+
+
+def test_get_worker_status_while_starting():
+    worker = SimpleNamespace(concurrency=None)
+
+    status = get_worker_status(worker, ready=False, last_tick=time.time())
+
+    assert status["ready"] is False
+    assert status["consumer"] == {"state": "starting", "connected": False}
+    assert status["pool"]["utilization"] is None
+
+
+def test_status_server_roundtrip(tmp_path: Path):
+    socket_path = tmp_path / "subpath-to-create" / "worker.sock"
+    # a stale socket of a previous worker
+    socket_path.parent.mkdir()
+    socket_path.touch()
+    server = StatusServer(
+        socket_path,
+        lambda: get_worker_status(
+            _worker(connected=False), ready=True, last_tick=time.time()
+        ),
+    )
+
+    server.start()
+    try:
+        status = fetch_worker_status(socket_path, timeout=1)
+    finally:
+        server.stop()
+
+    assert status["consumer"] == {"state": "running", "connected": False}
+    assert status["ready"] is True
+    assert not socket_path.exists()
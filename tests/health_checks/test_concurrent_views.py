@@ -0,0 +1,127 @@
+import dataclasses
+import re
+import threading
+import time
+from unittest.mock import patch
+
+from django.test import RequestFactory
+
+import pytest
+from asgiref.sync import async_to_sync
+from health_check.base import HealthCheck
+from health_check.exceptions import ServiceUnavailable
+
+from maykin_common.health_checks import views
+from maykin_common.health_checks.views import ConcurrentHealthCheckView
+
+
+@dataclasses.dataclass
+class SleepingCheck(HealthCheck):
+    """
+    Take some time, optionally failing afterwards.
+    """
+
+    duration: float = 0
+    fail: bool = False
+
+    def run(self):
+        time.sleep(self.duration)
+        if self.fail:
+            raise ServiceUnavailable("Down")
+
+
+@dataclasses.dataclass
+class BlockingCheck(HealthCheck):
+    """
+    Hang until the test releases it, like a check on a stuck dependency.
+    """
+
+    release = threading.Event()
+
+    def run(self):
+        BlockingCheck.release.wait(timeout=5)
+
+
+@pytest.fixture(autouse=True)
+def release_blocked_checks():
+    BlockingCheck.release.clear()
+    yield
+    BlockingCheck.release.set()
+
+
+def _get(view, **headers):
+    request = RequestFactory().get("/_healthz/", **headers)
+    return async_to_sync(view)(request)
+
+
+def test_checks_run_concurrently():
+    view = ConcurrentHealthCheckView.as_view(
+        checks=[(SleepingCheck, {"duration": 0.2})] * 3
+        + [(SleepingCheck, {"duration": 0.21})]
+    )
+
+    start = time.monotonic()
+    response = _get(view)
+
+    assert response.status_code == 200
+    assert time.monotonic() - start < 0.6
+
+
+def test_check_timeout_is_reported():
+    view = ConcurrentHealthCheckView.as_view(
+        checks=[BlockingCheck, SleepingCheck], check_timeout=0.1
+    )
+
+    start = time.monotonic()
+    response = _get(view, HTTP_ACCEPT="text/plain")
+
+    assert time.monotonic() - start < 1
+    assert response.status_code == 500
+    content = response.content.decode()
+    assert "BlockingCheck" in content
+    assert "Timed out after 0.1 seconds" in content
+
+
+def test_overall_timeout_caps_check_timeout(settings):
+    settings.MKN_HEALTH_CHECKS_CHECK_TIMEOUT = 5
+    view = ConcurrentHealthCheckView.as_view(checks=[BlockingCheck], timeout=0.1)
+
+    start = time.monotonic()
+    response = _get(view, HTTP_ACCEPT="text/plain")
+
+    assert time.monotonic() - start < 1
+    assert b"Timed out after 0.1 seconds" in response.content
+
+
+def test_server_timing_header():
+    view = ConcurrentHealthCheckView.as_view(
+        checks=[(SleepingCheck, {"duration": 0.01}), (SleepingCheck, {"fail": True})]
+    )
+
+    response = _get(view)
+
+    entries = re.findall(
+        r'(\w+);dur=([\d.]+);desc="([^"]*)"', response.headers["Server-Timing"]
+    )
+    assert len(entries) == 2
+    name, duration, description = entries[0]
+    assert name == "sleepingcheck"
+    assert float(duration) >= 10
+    assert description == "SleepingCheck(duration=0.01, fail=False)"
+
+
+def test_durations_are_recorded():
+    view = ConcurrentHealthCheckView.as_view(
+        checks=[SleepingCheck, (SleepingCheck, {"fail": True}), BlockingCheck],
+        check_timeout=0.1,
+    )
+
+    with patch.object(views, "record_check") as record_check:
+        _get(view)
+
+    outcomes = {call.args[:2] for call in record_check.call_args_list}
+    assert outcomes == {
+        ("SleepingCheck", "ok"),
+        ("SleepingCheck", "error"),
+        ("BlockingCheck", "timeout"),
+    }
@@ -0,0 +1,139 @@
+import asyncio
+from unittest.mock import patch
+from wsgiref.util import setup_testing_defaults
+
+from django.core.asgi import get_asgi_application
+from django.core.wsgi import get_wsgi_application
+
+import pytest
+
+from maykin_common.health_checks.liveness import (
+    LivenessASGIMiddleware,
+    LivenessWSGIMiddleware,
+)
+
+pytestmark = pytest.mark.urls("tests.health_checks.test_endpoints")
+
+
+def _wsgi_get(application, path: str, method: str = "GET", **environ):
+    environ = {
+        "PATH_INFO": path,
+        "REQUEST_METHOD": method,
+        "HTTP_HOST": "testserver",
+        **environ,
+    }
+    setup_testing_defaults(environ)
+    response = {}
+
+    def start_response(status, headers):
+        response.update(status=status, headers=dict(headers))
+
+    response["body"] = b"".join(application(environ, start_response))
+    return response
+
+
+def _asgi_get(application, path: str, method: str = "GET", **scope):
+    messages = []
+    requests = [{"type": "http.request", "body": b"", "more_body": False}]
+
+    async def receive():
+        if requests:
+            return requests.pop()
+        # the client stays connected
+        await asyncio.Future()
+
+    async def send(message):
+        messages.append(message)
+
+    scope = {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": method,
+        "scheme": "http",
+        "path": path,
+        "query_string": b"",
+        "headers": [],
+        "server": ("testserver", 80),
+        **scope,
+    }
+    asyncio.run(application(scope, receive, send))
+    return messages
+
+
+def test_wsgi_answers_liveness_without_django():
+    application = LivenessWSGIMiddleware(get_wsgi_application())
+
+    with patch("django.core.handlers.wsgi.WSGIHandler.__call__") as handler:
+        response = _wsgi_get(application, "/_healthz/livez/")
+
+    handler.assert_not_called()
+    assert response["status"] == "200 OK"
+    assert response["headers"]["Content-Length"] == "0"
+    assert response["body"] == b""
+
+
+@pytest.mark.django_db
+def test_wsgi_passes_other_requests_on():
+    application = LivenessWSGIMiddleware(get_wsgi_application())
+
+    response = _wsgi_get(application, "/_healthz/livez/", method="POST")
+
+    # handled by Django, where the CSRF middleware rejects it
+    assert response["status"] == "403 Forbidden"
+
+
+def test_wsgi_custom_path(settings):
+    settings.MKN_HEALTH_CHECKS_LIVENESS_PATH = "/livez"
+    application = LivenessWSGIMiddleware(get_wsgi_application())
+
+    response = _wsgi_get(application, "/livez", SCRIPT_NAME="/app")
+
+    assert response["status"] == "200 OK"
+
+
+@pytest.mark.django_db
+def test_wsgi_liveness_through_django_is_equivalent():
+    application = LivenessWSGIMiddleware(
+        get_wsgi_application(), path="/does-not-match/"
+    )
+
+    response = _wsgi_get(application, "/_healthz/livez/")
+
+    assert response["status"] == "200 OK"
+
+
+def test_asgi_answers_liveness_without_django():
+    application = LivenessASGIMiddleware(get_asgi_application())
+
+    with patch("django.core.handlers.asgi.ASGIHandler.__call__") as handler:
+        messages = _asgi_get(application, "/app/_healthz/livez/", root_path="/app")
+
+    handler.assert_not_called()
+    assert messages[0]["status"] == 200
+    assert (b"content-length", b"0") in messages[0]["headers"]
+    assert messages[1] == {
+        "type": "http.response.body",
+        "body": b"",
+        "more_body": False,
+    }
+
+
+@pytest.mark.django_db
+def test_asgi_passes_other_requests_on():
+    application = LivenessASGIMiddleware(get_asgi_application())
+
+    messages = _asgi_get(application, "/_healthz/livez/", method="POST")
+
+    assert messages[0]["status"] == 403
+
+
+def test_asgi_passes_lifespan_on():
+    downstream = []
+
+    async def application(scope, receive, send):
+        downstream.append(scope["type"])
+
+    asyncio.run(LivenessASGIMiddleware(application)({"type": "lifespan"}, None, None))
+
+    assert downstream == ["lifespan"]
@@ -0,0 +1,101 @@
+import time
+from unittest.mock import patch
+
+from django.db import connection
+from django.db.migrations.executor import MigrationExecutor
+
+import pytest
+from health_check.exceptions import ServiceUnavailable
+
+from maykin_common.health_checks import checks
+from maykin_common.health_checks.checks import Migrations
+
+pytestmark = pytest.mark.django_db
+
+
+@pytest.fixture(autouse=True)
+def clear_states():
+    checks._states.clear()
+    yield
+    checks._states.clear()
+
+
+def test_no_pending_migrations():
+    Migrations().run()
+
+
+def test_pending_migrations():
+    with (
+        patch.object(
+            MigrationExecutor, "migration_plan", return_value=[("plan", False)] * 2
+        ),
+        pytest.raises(ServiceUnavailable) as exc_info,
+    ):
+        Migrations().run()
+
+    assert str(exc_info.value) == "Unavailable: There are 2 migrations to apply"
+
+
+def test_plan_is_computed_once(django_assert_num_queries):
+    Migrations().run()
+
+    with (
+        patch.object(MigrationExecutor, "migration_plan") as migration_plan,
+        # only the applied migrations are counted
+        django_assert_num_queries(1),
+    ):
+        Migrations().run()
+
+    migration_plan.assert_not_called()
+
+
+def test_plan_is_computed_when_applied_migrations_change():
+    Migrations().run()
+    # a migration was unapplied since
+    checks._states["default"].applied += 1
+
+    with patch.object(MigrationExecutor, "migration_plan", return_value=[]) as plan:
+        Migrations().run()
+
+    plan.assert_called_once()
+
+
+def test_plan_is_computed_when_expired():
+    Migrations().run()
+
+    with (
+        patch.object(checks.time, "monotonic", return_value=time.monotonic() + 601),
+        patch.object(MigrationExecutor, "migration_plan", return_value=[]) as plan,
+    ):
+        Migrations().run()
+
+    plan.assert_called_once()
+
+
+def test_lock_is_not_held_while_querying():
+    # probes of other databases aren't blocked by a slow database
+    locked = []
+
+    def execute(execute, *args):
+        locked.append(checks._lock.locked())
+        return execute(*args)
+
+    def migration_plan(*args):
+        locked.append(checks._lock.locked())
+        return []
+
+    with (
+        patch.object(MigrationExecutor, "migration_plan", side_effect=migration_plan),
+        connection.execute_wrapper(execute),
+    ):
+        Migrations().run()
+
+    assert len(locked) > 1
+    assert not any(locked)
+
+
+def test_unknown_database_alias():
+    with pytest.raises(ServiceUnavailable) as exc_info:
+        Migrations(alias="does-not-exist").run()
+
+    assert str(exc_info.value) == "Unavailable: Database alias does not exist"
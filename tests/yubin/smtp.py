@@ -0,0 +1,133 @@
+"""
+A local SMTP server that accepts and discards messages, for benchmarks.
+"""
+
+import socketserver
+import threading
+import time
+
+
+class _SMTPHandler(socketserver.StreamRequestHandler):
+    server: "_SMTPServer"
+
+    def _reply(self, *lines: str) -> None:
+        # multiline replies use a dash after the code on all but the last line
+        *head, last = lines
+        response = "".join(f"{line[:3]}-{line[4:]}\r\n" for line in head)
+        self.wfile.write(f"{response}{last}\r\n".encode("ascii"))
+
+    def setup(self) -> None:
+        super().setup()
+        self.server.sink.session_started()
+
+    def finish(self) -> None:
+        self.server.sink.session_ended()
+        super().finish()
+
+    def handle(self) -> None:
+        self._reply("220 localhost SMTP sink")
+        while line := self.rfile.readline():
+            match line[:4].upper():
+                case b"EHLO":
+                    self._reply("250 localhost", "250 8BITMIME")
+                case b"HELO" | b"MAIL" | b"RCPT" | b"RSET" | b"NOOP":
+                    self._reply("250 OK")
+                case b"DATA":
+                    self._reply("354 End data with <CR><LF>.<CR><LF>")
+                    data = []
+                    while (line := self.rfile.readline()) not in (b".\r\n", b""):
+                        # undo the dot-stuffing
+                        data.append(line[1:] if line.startswith(b"..") else line)
+                    self._reply(self.server.sink.deliver(b"".join(data)))
+                case b"QUIT":
+                    self._reply("221 Bye")
+                    return
+                case _:
+                    self._reply("502 Command not implemented")
+
+
+class _SMTPServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+    # many concurrent clients connect at once
+    request_queue_size = 128
+
+    def __init__(self, sink: "SMTPSink"):
+        self.sink = sink
+        super().__init__(("127.0.0.1", 0), _SMTPHandler)
+
+
+class SMTPSink:
+    """
+    Run an SMTP server in a background thread while active.
+
+    :param latency: Seconds to wait before accepting every message, like a remote mail
+      server would.
+    :param temporary_failure_rate: Fraction of the messages rejected with a ``451``
+      reply. The rejections are spread evenly rather than randomly, for reproducible
+      numbers.
+    :param permanent_failure_rate: Fraction of the messages rejected with a ``554``
+      reply.
+    :param keep_messages: Keep the accepted messages in :attr:`messages`.
+    """
+
+    def __init__(
+        self,
+        latency: float = 0,
+        temporary_failure_rate: float = 0,
+        permanent_failure_rate: float = 0,
+        keep_messages: bool = False,
+    ):
+        self.latency = latency
+        self.temporary_failure_rate = temporary_failure_rate
+        self.permanent_failure_rate = permanent_failure_rate
+        self.keep_messages = keep_messages
+        self.received = 0
+        self.accepted = 0
+        self.messages: list[bytes] = []
+        self.sessions = 0
+        self.max_sessions = 0
+        self._lock = threading.Lock()
+
+    def session_started(self) -> None:
+        with self._lock:
+            self.sessions += 1
+            self.max_sessions = max(self.max_sessions, self.sessions)
+
+    def session_ended(self) -> None:
+        with self._lock:
+            self.sessions -= 1
+
+    def _fails(self, rate: float, index: int) -> bool:
+        return int((index + 1) * rate) > int(index * rate)
+
+    def deliver(self, data: bytes) -> str:
+        with self._lock:
+            index = self.received
+            self.received += 1
+        if self.latency:
+            time.sleep(self.latency)
+        if self._fails(self.temporary_failure_rate, index):
+            return "451 Try again later"
+        if self._fails(self.permanent_failure_rate, index):
+            return "554 Transaction failed"
+        with self._lock:
+            self.accepted += 1
+            if self.keep_messages:
+                self.messages.append(data)
+        return "250 OK"
+
+    @property
+    def port(self) -> int:
+        return self._server.server_address[1]
+
+    def __enter__(self):
+        self._server = _SMTPServer(self)
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._server.shutdown()
+        self._server.server_close()
+        self._thread.join()
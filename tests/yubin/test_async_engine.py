@@ -0,0 +1,147 @@
+import contextlib
+from email import message_from_bytes
+
+from django import VERSION as DJANGO_VERSION
+from django.core import mail
+
+import pytest
+from django_yubin.models import Blacklist, Message
+
+from maykin_common.yubin.engine import send_all
+from maykin_common.yubin.models import MessageDelivery
+
+from .smtp import SMTPSink
+
+pytestmark = [
+    pytest.mark.django_db,
+    pytest.mark.skipif(
+        DJANGO_VERSION >= (6, 0),
+        reason="django-yubin appears broken on Django 6.0+, producing multiple "
+        "Content-Transfer-Encoding headers",
+    ),
+]
+
+
+@pytest.fixture
+def smtp_sink(settings):
+    with contextlib.ExitStack() as stack:
+
+        def _start(**kwargs) -> SMTPSink:
+            sink = stack.enter_context(SMTPSink(**kwargs))
+            settings.EMAIL_HOST = "127.0.0.1"
+            settings.EMAIL_PORT = sink.port
+            return sink
+
+        yield _start
+
+
+@pytest.fixture(autouse=True)
+def async_engine(settings):
+    settings.MKN_YUBIN_ENGINE = "asyncio"
+    settings.MKN_YUBIN_ASYNC_CONCURRENCY = 4
+    settings.MKN_YUBIN_BATCH_SIZE = 5
+
+
+def _queue_messages(count: int) -> None:
+    mail.get_connection().send_messages(
+        mail.EmailMessage(
+            f"Message {index}",
+            "Lorem ipsum",
+            "sender@example.com",
+            [f"recipient{index}@example.com"],
+            bcc=["archive@example.com"],
+        )
+        for index in range(count)
+    )
+
+
+@pytest.mark.usefixtures("lock_file")
+def test_send_all(smtp_sink):
+    sink = smtp_sink(keep_messages=True)
+    _queue_messages(12)
+
+    send_all()
+
+    assert Message.objects.filter(status=Message.STATUS_SENT).count() == 12
+    assert sink.received == 12
+    assert 1 < sink.max_sessions <= 4
+    subjects = {message_from_bytes(data)["Subject"] for data in sink.messages}
+    assert subjects == {f"Message {index}" for index in range(12)}
+    message = Message.objects.get(subject="Message 3")
+    actions = list(message.log_set.order_by("pk").values_list("action", flat=True))
+    assert actions[-2:] == [Message.STATUS_IN_PROCESS, Message.STATUS_SENT]
+
+
+@pytest.mark.usefixtures("lock_file")
+def test_send_all_records_rejections(smtp_sink):
+    # the 4th and 8th messages are deferred, the 2nd and 6th fail
+    smtp_sink(temporary_failure_rate=0.25, permanent_failure_rate=0.5)
+    _queue_messages(8)
+
+    send_all()
+
+    statuses = dict.fromkeys(
+        [Message.STATUS_SENT, Message.STATUS_QUEUED, Message.STATUS_FAILED], 0
+    )
+    for status in Message.objects.values_list("status", flat=True):
+        statuses[status] += 1
+    assert statuses == {
+        Message.STATUS_SENT: 4,
+        Message.STATUS_QUEUED: 2,
+        Message.STATUS_FAILED: 2,
+    }
+    # deferred messages back off
+    assert (
+        MessageDelivery.objects.filter(next_attempt_at__isnull=False).count()
+        == statuses[Message.STATUS_QUEUED]
+    )
+
+
+@pytest.mark.usefixtures("lock_file")
+def test_send_all_skips_blacklisted(smtp_sink):
+    sink = smtp_sink()
+    Blacklist.objects.create(email="recipient1@example.com")
+    _queue_messages(3)
+
+    send_all()
+
+    assert sink.received == 2
+    assert Message.objects.get(subject="Message 1").status == (
+        Message.STATUS_BLACKLISTED
+    )
+
+
+@pytest.mark.usefixtures("lock_file")
+def test_send_all_max_messages(smtp_sink):
+    sink = smtp_sink()
+    _queue_messages(12)
+
+    send_all(max_messages=7)
+
+    assert sink.received == 7
+    assert Message.objects.filter(status=Message.STATUS_QUEUED).count() == 5
+
+
+def test_send_all_database_claim_mode(settings, smtp_sink):
+    sink = smtp_sink()
+    settings.MKN_YUBIN_CLAIM_MODE = "database"
+    _queue_messages(12)
+
+    send_all()
+
+    assert Message.objects.filter(status=Message.STATUS_SENT).count() == 12
+    assert sink.received == 12
+    assert not MessageDelivery.objects.exists()
+
+
+def test_send_all_recycles_connections(settings, smtp_sink):
+    sink = smtp_sink()
+    settings.MKN_YUBIN_MESSAGES_PER_CONNECTION = 2
+    settings.MKN_YUBIN_ASYNC_CONCURRENCY = 1
+    settings.MKN_YUBIN_CLAIM_MODE = "database"
+    _queue_messages(5)
+
+    send_all()
+
+    assert Message.objects.filter(status=Message.STATUS_SENT).count() == 5
+    assert sink.max_sessions == 1
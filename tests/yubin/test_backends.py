@@ -1,9 +1,12 @@
 from unittest.mock import patch
 
-from django.core.mail import send_mail
+from django.core.mail import EmailMessage, send_mail
 
 import pytest
-from django_yubin.models import Message
+from django_yubin.models import Log, Message
+
+from maykin_common.yubin.backends import QueuedEmailBackend
+from maykin_common.yubin.utils import queue_email_messages
 
 pytestmark = [
     pytest.mark.django_db,
@@ -32,3 +35,83 @@ def test_send_email_uses_maykin_common_backend(settings):
 
     message = Message.objects.get()
     assert message.status == Message.STATUS_QUEUED
+
+
+def test_send_messages_queues_in_bulk(django_assert_max_num_queries):
+    backend = QueuedEmailBackend()
+    email_messages = (
+        EmailMessage(
+            f"Subject {index}",
+            "Body",
+            from_email="sender@example.com",
+            to=[f"recipient_{index}@example.com"],
+        )
+        for index in range(50)
+    )
+
+    # savepoint + messages insert + logs insert + savepoint release + notify (only on
+    # PostgreSQL)
+    with django_assert_max_num_queries(5):
+        result = backend.send_messages(email_messages)
+
+    assert result == 50
+    assert Message.objects.filter(status=Message.STATUS_QUEUED).count() == 50
+    message = Message.objects.get(subject="Subject 7")
+    assert message.to() == ["recipient_7@example.com"]
+    assert message.enqueued_count == 1
+    assert message.date_enqueued is not None
+    assert list(
+        Log.objects.filter(message=message)
+        .order_by("action")
+        .values_list("action", "log_message")
+    ) == [
+        (Message.STATUS_CREATED, "Message created"),
+        (Message.STATUS_QUEUED, "Enqueued from a Backend or django-yubin itself."),
+    ]
+
+
+def test_send_messages_skips_messages_without_recipients():
+    backend = QueuedEmailBackend()
+
+    result = backend.send_messages(
+        [
+            EmailMessage("subject", "body", to=[], from_email="garry@example.com"),
+            EmailMessage(
+                "subject", "body", to=["barry@example.com"], from_email="g@example.com"
+            ),
+        ]
+    )
+
+    assert result == 1
+    assert Message.objects.count() == 1
+
+
+def test_send_messages_in_batches():
+    email_messages = [
+        EmailMessage("subject", "body", to=[f"{index}@example.com"])
+        for index in range(5)
+    ]
+
+    result = queue_email_messages(email_messages, batch_size=2)
+
+    assert result == 5
+    assert Message.objects.count() == 5
+    assert Log.objects.count() == 10
+
+
+def test_send_messages_uses_test_mailer_emails_in_test_mode(monkeypatch):
+    # yubin does not correctly use django settings
+    from django_yubin import settings
+
+    monkeypatch.setattr(settings, "MAILER_TEST_MODE", True)
+    monkeypatch.setattr(settings, "MAILER_TEST_EMAIL", "test_mailer@example.com")
+
+    result = queue_email_messages(
+        [EmailMessage("subject", "body", to=["barry@example.com"])]
+    )
+
+    assert result == 1
+    message = Message.objects.get()
+    assert message.to() == ["test_mailer@example.com"]
+    msg = message.get_message_parser()
+    assert msg.headers["X-Yubin-Test-Original"] == "barry@example.com"
@@ -0,0 +1,115 @@
+import os
+import signal
+import threading
+import time
+
+from django import VERSION as DJANGO_VERSION
+from django.core import mail
+from django.core.management import call_command
+from django.db import connection
+
+import pytest
+from django_yubin.models import Message
+
+from maykin_common.yubin import daemon as daemon_module
+from maykin_common.yubin.daemon import (
+    NOTIFY_CHANNEL,
+    SenderDaemon,
+    can_listen,
+    notify_queued,
+)
+from maykin_common.yubin.utils import queue_email_message
+
+requires_postgres = pytest.mark.skipif(
+    connection.vendor != "postgresql", reason="LISTEN/NOTIFY requires PostgreSQL"
+)
+
+
+@pytest.mark.skipif(
+    DJANGO_VERSION >= (6, 0),
+    reason="django-yubin appears broken on Django 6.0+, producing multiple "
+    "Content-Transfer-Encoding headers",
+)
+@pytest.mark.django_db(transaction=True)
+@pytest.mark.parametrize("listens", [True, False])
+def test_daemon_sends_queued_messages(lock_file, monkeypatch, listens):
+    if not listens:
+        monkeypatch.setattr(daemon_module, "can_listen", lambda connection: False)
+    daemon = SenderDaemon(poll_interval=0.05)
+    thread = threading.Thread(target=daemon.run)
+    thread.start()
+    try:
+        queue_email_message(
+            mail.EmailMessage(
+                "Subject", "Body", "sender@example.com", ["test@example.com"]
+            )
+        )
+        deadline = time.monotonic() + 5
+        while time.monotonic() < deadline and not mail.outbox:
+            time.sleep(0.01)
+    finally:
+        daemon.stop()
+        thread.join(timeout=5)
+
+    assert not thread.is_alive()
+    assert len(mail.outbox) == 1
+    assert Message.objects.get().status == Message.STATUS_SENT
+
+
+@pytest.mark.django_db(transaction=True)
+def test_daemon_keeps_running_after_errors(monkeypatch):
+    calls = []
+
+    def failing_send_all(threads, **limits):
+        calls.append(threads)
+        if len(calls) == 2:
+            daemon.stop()
+        raise RuntimeError("oops")
+
+    monkeypatch.setattr(daemon_module, "send_all", failing_send_all)
+    daemon = SenderDaemon(poll_interval=0.01, threads=2)
+
+    daemon.run()
+
+    assert calls == [2, 2]
+
+
+@pytest.mark.django_db(transaction=True)
+def test_command_daemon_stops_on_sigterm(monkeypatch):
+    calls = []
+
+    def send_all(threads, **limits):
+        calls.append(threads)
+        os.kill(os.getpid(), signal.SIGTERM)
+
+    monkeypatch.setattr(daemon_module, "send_all", send_all)
+    previous_handler = signal.getsignal(signal.SIGTERM)
+
+    call_command("send_all_mail", "--daemon", "--poll-interval=60")
+
+    # the first run completes, then the daemon stops without waiting for the poll
+    # interval
+    assert calls == [None]
+    assert signal.getsignal(signal.SIGTERM) is previous_handler
+
+
+@requires_postgres
+@pytest.mark.django_db(transaction=True)
+def test_notify_queued_wakes_up_listener():
+    with connection.cursor() as cursor:
+        cursor.execute(f"LISTEN {NOTIFY_CHANNEL}")
+
+    notify_queued()
+
+    notifications = list(connection.connection.notifies(timeout=1, stop_after=1))
+    assert [notification.channel for notification in notifications] == [NOTIFY_CHANNEL]
+
+
+@requires_postgres
+@pytest.mark.parametrize(
+    "version,expected", [("3.1.19", False), ("3.2.0", True), ("3.10.1", True)]
+)
+def test_can_listen_requires_psycopg_3_2(monkeypatch, version, expected):
+    monkeypatch.setattr("psycopg.__version__", version)
+
+    assert can_listen(connection) is expected
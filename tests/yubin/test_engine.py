@@ -0,0 +1,535 @@
+import smtplib
+import threading
+from datetime import timedelta
+
+from django import VERSION as DJANGO_VERSION
+from django.core.mail.backends.locmem import EmailBackend as LocmemEmailBackend
+from django.db import connection as db_connection
+from django.utils import timezone
+
+import pytest
+from django_yubin import settings as yubin_settings
+from django_yubin.models import Blacklist, Message
+from filelock import FileLock
+
+from maykin_common.yubin import engine as engine_module
+from maykin_common.yubin.engine import (
+    DeliveryBudget,
+    PersistentConnection,
+    RateLimiter,
+    TokenBucket,
+    backoff_delay,
+    claim_messages,
+    is_temporary_failure,
+    send_all,
+)
+from maykin_common.yubin.models import MessageDelivery
+
+from .utils import create_message
+
+pytestmark = [
+    pytest.mark.skipif(
+        DJANGO_VERSION >= (6, 0),
+        reason="django-yubin appears broken on Django 6.0+, producing multiple "
+        "Content-Transfer-Encoding headers",
+    ),
+]
+
+
+class RecordingEmailBackend(LocmemEmailBackend):
+    """
+    Track the connections that are opened and the messages sent over them.
+    """
+
+    lock = threading.Lock()
+    opened: int = 0
+    sent: list[tuple[int, str]] = []
+    # number of sends that should fail as if the server dropped the connection
+    disconnects: int = 0
+    # number of sends that should be rejected temporarily
+    deferrals: int = 0
+
+    def open(self):
+        with self.lock:
+            RecordingEmailBackend.opened += 1
+        self.connection_id = RecordingEmailBackend.opened
+        return True
+
+    def send_messages(self, email_messages):
+        with self.lock:
+            if RecordingEmailBackend.disconnects > 0:
+                RecordingEmailBackend.disconnects -= 1
+                raise smtplib.SMTPServerDisconnected("Connection unexpectedly closed")
+            if RecordingEmailBackend.deferrals > 0:
+                RecordingEmailBackend.deferrals -= 1
+                raise smtplib.SMTPDataError(
+                    451, b"Rate limit exceeded, try again later"
+                )
+            for message in email_messages:
+                RecordingEmailBackend.sent.append((self.connection_id, message.to[0]))
+        return super().send_messages(email_messages)
+
+    @classmethod
+    def reset(cls) -> None:
+        cls.opened = 0
+        cls.sent = []
+        cls.disconnects = 0
+        cls.deferrals = 0
+
+
+@pytest.fixture(autouse=True)
+def recording_backend(monkeypatch):
+    monkeypatch.setattr(
+        yubin_settings,
+        "USE_BACKEND",
+        "tests.yubin.test_engine.RecordingEmailBackend",
+    )
+    RecordingEmailBackend.reset()
+    yield RecordingEmailBackend
+    RecordingEmailBackend.reset()
+
+
+def _queue_messages(count: int) -> list[Message]:
+    return [
+        create_message(
+            to_address=f"test{index}@example.com",
+            status=Message.STATUS_QUEUED,
+        )
+        for index in range(count)
+    ]
+
+
+@pytest.mark.django_db
+def test_send_all_reuses_connection(settings, lock_file):
+    settings.MKN_YUBIN_MESSAGES_PER_CONNECTION = 4
+    _queue_messages(10)
+
+    send_all()
+
+    assert Message.objects.filter(status=Message.STATUS_SENT).count() == 10
+    assert RecordingEmailBackend.opened == 3
+    connection_ids = [connection_id for connection_id, _ in RecordingEmailBackend.sent]
+    assert connection_ids == [1, 1, 1, 1, 2, 2, 2, 2, 3, 3]
+
+
+@pytest.mark.django_db
+def test_send_all_reconnects_after_disconnect(lock_file):
+    RecordingEmailBackend.disconnects = 1
+    (message,) = _queue_messages(1)
+
+    send_all()
+
+    message.refresh_from_db()
+    assert message.status == Message.STATUS_SENT
+    assert RecordingEmailBackend.opened == 2
+    assert RecordingEmailBackend.sent == [(2, "test0@example.com")]
+
+
+@pytest.mark.django_db
+def test_send_all_marks_failed_when_reconnect_fails(lock_file):
+    RecordingEmailBackend.disconnects = 2
+    first, second = _queue_messages(2)
+
+    send_all()
+
+    first.refresh_from_db()
+    second.refresh_from_db()
+    assert first.status == Message.STATUS_FAILED
+    assert second.status == Message.STATUS_SENT
+
+
+@pytest.mark.django_db
+def test_send_all_discards_when_paused(monkeypatch, lock_file):
+    monkeypatch.setattr(yubin_settings, "PAUSE_SEND", True)
+    (message,) = _queue_messages(1)
+
+    send_all()
+
+    message.refresh_from_db()
+    assert message.status == Message.STATUS_DISCARDED
+    assert RecordingEmailBackend.sent == []
+
+
+@pytest.mark.django_db(transaction=True)
+def test_send_all_threaded(settings, lock_file):
+    settings.MKN_YUBIN_DELIVERY_THREADS = 4
+    messages = _queue_messages(20)
+
+    send_all()
+
+    assert Message.objects.filter(status=Message.STATUS_SENT).count() == 20
+    # every message is sent exactly once
+    recipients = sorted(to for _, to in RecordingEmailBackend.sent)
+    assert recipients == sorted(message.to_address for message in messages)
+    assert RecordingEmailBackend.opened <= 4
+    for message in messages:
+        actions = list(message.log_set.order_by("pk").values_list("action", flat=True))
+        assert actions[-2:] == [Message.STATUS_IN_PROCESS, Message.STATUS_SENT]
+
+
+@pytest.mark.django_db
+def test_send_all_uses_fixed_number_of_queries_per_batch(
+    settings, lock_file, django_assert_max_num_queries
+):
+    settings.MKN_YUBIN_BATCH_SIZE = 50
+    _queue_messages(50)
+
+    # pks + savepoint + lock and fetch batch + mark in process + savepoint release +
+    # blacklist + savepoint + update sent + logs insert + savepoint release
+    with django_assert_max_num_queries(10):
+        send_all()
+
+    assert Message.objects.filter(status=Message.STATUS_SENT).count() == 50
+    message = Message.objects.first()
+    assert message is not None
+    assert message.sent_count == 1
+    assert message.date_sent is not None
+
+
+@pytest.mark.django_db
+def test_send_all_records_outcome_per_message(lock_file):
+    RecordingEmailBackend.disconnects = 2
+    first, second, third = _queue_messages(3)
+    Blacklist.objects.create(email=third.to_address)
+
+    send_all()
+
+    for message in (first, second, third):
+        message.refresh_from_db()
+    assert first.status == Message.STATUS_FAILED
+    assert second.status == Message.STATUS_SENT
+    assert third.status == Message.STATUS_BLACKLISTED
+    assert list(first.log_set.order_by("pk").values_list("action", "log_message")) == [
+        (Message.STATUS_IN_PROCESS, "Trying to send the message."),
+        (Message.STATUS_FAILED, "Connection unexpectedly closed"),
+    ]
+
+
+@pytest.mark.django_db
+def test_send_all_crash_leaves_batch_in_process(lock_file, monkeypatch):
+    first, second = _queue_messages(2)
+    send_messages = RecordingEmailBackend.send_messages
+
+    def crash_on_second(self, email_messages):
+        if RecordingEmailBackend.sent:
+            raise KeyboardInterrupt
+        return send_messages(self, email_messages)
+
+    monkeypatch.setattr(RecordingEmailBackend, "send_messages", crash_on_second)
+
+    with pytest.raises(KeyboardInterrupt):
+        send_all()
+
+    assert len(RecordingEmailBackend.sent) == 1
+    # not queued again, so the next run doesn't send the first message twice
+    for message in (first, second):
+        message.refresh_from_db()
+        assert message.status == Message.STATUS_IN_PROCESS
+
+
+@pytest.mark.django_db
+def test_send_all_max_messages(settings, lock_file):
+    settings.MKN_YUBIN_BATCH_SIZE = 2
+    _queue_messages(5)
+
+    send_all(max_messages=3)
+
+    assert Message.objects.filter(status=Message.STATUS_SENT).count() == 3
+    assert Message.objects.filter(status=Message.STATUS_QUEUED).count() == 2
+
+
+@pytest.mark.django_db
+def test_send_all_max_messages_database_claim_mode(settings):
+    settings.MKN_YUBIN_CLAIM_MODE = "database"
+    settings.MKN_YUBIN_BATCH_SIZE = 2
+    _queue_messages(5)
+
+    send_all(max_messages=3)
+
+    assert Message.objects.filter(status=Message.STATUS_SENT).count() == 3
+    assert Message.objects.filter(status=Message.STATUS_QUEUED).count() == 2
+    assert not MessageDelivery.objects.exists()
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize("claim_mode", ["filelock", "database"])
+def test_send_all_time_budget(settings, lock_file, monkeypatch, claim_mode):
+    settings.MKN_YUBIN_CLAIM_MODE = claim_mode
+    settings.MKN_YUBIN_BATCH_SIZE = 10
+    _queue_messages(5)
+    # run out of time after sending three messages
+    monkeypatch.setattr(
+        engine_module.DeliveryBudget,
+        "expired",
+        property(lambda budget: len(RecordingEmailBackend.sent) >= 3),
+    )
+
+    send_all(time_budget=10)
+
+    assert Message.objects.filter(status=Message.STATUS_SENT).count() == 3
+    assert Message.objects.filter(status=Message.STATUS_QUEUED).count() == 2
+    assert not MessageDelivery.objects.exists()
+
+
+def test_persistent_connection_closes_on_exit():
+    with PersistentConnection(max_messages=10) as connection:
+        assert connection._connection is None
+        connection._get_connection()
+        assert connection._connection is not None
+
+    assert connection._connection is None
+
+
+@pytest.mark.django_db
+def test_claim_messages_marks_in_process():
+    first, second, third = _queue_messages(3)
+
+    claimed = claim_messages("sender-1", batch_size=2, lease_seconds=60)
+
+    assert claimed == [first.pk, second.pk]
+    first.refresh_from_db()
+    assert first.status == Message.STATUS_IN_PROCESS
+    delivery = MessageDelivery.objects.get(message=first)
+    assert delivery.claimed_by == "sender-1"
+    assert delivery.lease_expires_at > timezone.now()
+    # other senders only get what is left
+    assert claim_messages("sender-2", batch_size=2, lease_seconds=60) == [third.pk]
+    assert claim_messages("sender-2", batch_size=2, lease_seconds=60) == []
+
+
+@pytest.mark.django_db
+def test_claim_messages_reclaims_expired_lease():
+    (message,) = _queue_messages(1)
+    claim_messages("crashed-sender", batch_size=10, lease_seconds=60)
+    MessageDelivery.objects.update(lease_expires_at=timezone.now() - timedelta(1))
+
+    assert claim_messages("sender", batch_size=10, lease_seconds=60) == [message.pk]
+
+    delivery = MessageDelivery.objects.get(message=message)
+    assert delivery.claimed_by == "sender"
+
+
+@pytest.mark.django_db
+def test_send_all_skips_lost_claims(settings):
+    settings.MKN_YUBIN_CLAIM_MODE = "database"
+    (message,) = _queue_messages(1)
+    claim_messages("crashed-sender", batch_size=10, lease_seconds=60)
+
+    send_all()
+
+    # the claim is still valid, so the message is left alone
+    assert RecordingEmailBackend.sent == []
+    message.refresh_from_db()
+    assert message.status == Message.STATUS_IN_PROCESS
+
+
+@pytest.mark.django_db
+def test_send_all_database_claim_mode(settings, lock_file):
+    settings.MKN_YUBIN_CLAIM_MODE = "database"
+    settings.MKN_YUBIN_BATCH_SIZE = 3
+    messages = _queue_messages(7)
+    # the lock file is not involved
+    lock = FileLock(lock_file)
+
+    with lock:
+        send_all()
+
+    assert Message.objects.filter(status=Message.STATUS_SENT).count() == 7
+    assert len(RecordingEmailBackend.sent) == 7
+    assert not MessageDelivery.objects.exists()
+    actions = list(messages[0].log_set.order_by("pk").values_list("action", flat=True))
+    assert actions[-3:] == [
+        Message.STATUS_IN_PROCESS,
+        Message.STATUS_IN_PROCESS,
+        Message.STATUS_SENT,
+    ]
+
+
+@pytest.mark.django_db(transaction=True)
+def test_send_all_database_claim_mode_threaded(settings):
+    settings.MKN_YUBIN_CLAIM_MODE = "database"
+    settings.MKN_YUBIN_BATCH_SIZE = 2
+    messages = _queue_messages(20)
+
+    send_all(threads=4)
+
+    assert Message.objects.filter(status=Message.STATUS_SENT).count() == 20
+    recipients = sorted(to for _, to in RecordingEmailBackend.sent)
+    assert recipients == sorted(message.to_address for message in messages)
+
+
+def test_delivery_budget():
+    budget = DeliveryBudget(max_messages=5, time_budget=None)
+    assert budget.take(3) == 3
+    assert budget.take(3) == 2
+    assert budget.take(3) == 0
+    assert not budget.expired
+
+    assert DeliveryBudget(max_messages=None, time_budget=0).expired
+    assert DeliveryBudget(max_messages=None, time_budget=0).take(3) == 0
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize("claim_mode", ["filelock", "database"])
+def test_send_all_defers_temporarily_rejected_messages(settings, lock_file, claim_mode):
+    settings.MKN_YUBIN_CLAIM_MODE = claim_mode
+    settings.MKN_YUBIN_RETRY_BACKOFF = 60
+    RecordingEmailBackend.deferrals = 1
+    deferred, sent = _queue_messages(2)
+    Message.objects.update(enqueued_count=1)
+
+    send_all()
+
+    deferred.refresh_from_db()
+    assert deferred.status == Message.STATUS_QUEUED
+    assert deferred.enqueued_count == 2
+    assert deferred.log_set.filter(
+        action=Message.STATUS_QUEUED,
+        log_message__startswith="Deferred by the mail server: (451",
+    ).exists()
+    delivery = MessageDelivery.objects.get(message=deferred)
+    assert delivery.claimed_by == ""
+    assert delivery.next_attempt_at > timezone.now() + timedelta(seconds=29)
+    sent.refresh_from_db()
+    assert sent.status == Message.STATUS_SENT
+
+    # not due yet
+    send_all()
+
+    assert RecordingEmailBackend.sent == [(1, sent.to_address)]
+
+    MessageDelivery.objects.update(next_attempt_at=timezone.now())
+    send_all()
+
+    deferred.refresh_from_db()
+    assert deferred.status == Message.STATUS_SENT
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize("claim_mode", ["filelock", "database"])
+def test_send_all_fails_messages_deferred_too_often(settings, lock_file, claim_mode):
+    settings.MKN_YUBIN_CLAIM_MODE = claim_mode
+    settings.MKN_YUBIN_RETRY_BACKOFF = 0
+    settings.MKN_YUBIN_MAX_DEFERRALS = 2
+    RecordingEmailBackend.deferrals = 10
+    (message,) = _queue_messages(1)
+    Message.objects.update(enqueued_count=1)
+
+    for _ in range(3):
+        send_all()
+
+    message.refresh_from_db()
+    assert message.status == Message.STATUS_FAILED
+    assert message.enqueued_count == 3
+    error = "(451, b'Rate limit exceeded, try again later')"
+    assert list(
+        message.log_set.filter(
+            action__in=[Message.STATUS_QUEUED, Message.STATUS_FAILED]
+        )
+        .order_by("pk")
+        .values_list("action", "log_message")
+    ) == [
+        (Message.STATUS_QUEUED, f"Deferred by the mail server: {error}"),
+        (Message.STATUS_QUEUED, f"Deferred by the mail server: {error}"),
+        (Message.STATUS_FAILED, error),
+    ]
+
+
+@pytest.mark.django_db
+def test_send_all_waits_for_rate_limiter(settings, lock_file, monkeypatch):
+    settings.MKN_YUBIN_RATE_LIMITS = {"*": 1}
+    sleeps = []
+    monkeypatch.setattr(engine_module.time, "sleep", sleeps.append)
+    _queue_messages(3)
+
+    send_all()
+
+    assert len(RecordingEmailBackend.sent) == 3
+    # the first message is sent right away
+    assert len(sleeps) == 2
+    assert sleeps[1] > sleeps[0] > 0
+
+
+@pytest.mark.django_db(transaction=True)
+@pytest.mark.parametrize("claim_mode", ["filelock", "database"])
+def test_send_all_waits_for_rate_limiter_outside_transaction(
+    settings, lock_file, monkeypatch, claim_mode
+):
+    settings.MKN_YUBIN_CLAIM_MODE = claim_mode
+    settings.MKN_YUBIN_RATE_LIMITS = {"*": 1}
+    in_transaction = []
+    monkeypatch.setattr(
+        engine_module.time,
+        "sleep",
+        lambda delay: in_transaction.append(db_connection.in_atomic_block),
+    )
+    _queue_messages(3)
+
+    send_all()
+
+    # waiting must not keep the rows of the batch locked
+    assert in_transaction == [False, False]
+
+
+def test_token_bucket(monkeypatch):
+    now = 100.0
+    monkeypatch.setattr(engine_module.time, "monotonic", lambda: now)
+    bucket = TokenBucket(rate=2, capacity=2)
+
+    assert bucket.reserve() == 0
+    assert bucket.reserve() == 0
+    assert bucket.reserve() == 0.5
+    assert bucket.reserve() == 1.0
+
+    now += 1
+    assert bucket.reserve() == 0.5
+
+
+def test_rate_limiter_per_domain(monkeypatch):
+    sleeps = []
+    monkeypatch.setattr(engine_module.time, "sleep", sleeps.append)
+    limiter = RateLimiter({"Example.com": 1})
+
+    limiter.wait("Sender <noreply@example.com>")
+    limiter.wait("other@example.org")
+    limiter.wait("noreply@EXAMPLE.com")
+
+    assert len(sleeps) == 1
+
+
+@pytest.mark.parametrize(
+    "exc,expected",
+    [
+        (smtplib.SMTPDataError(451, b"Try again later"), True),
+        (smtplib.SMTPSenderRefused(421, b"Too many messages", "a@example.com"), True),
+        (smtplib.SMTPDataError(554, b"Rejected"), False),
+        (
+            smtplib.SMTPRecipientsRefused({"a@example.com": (450, b"Mailbox busy")}),
+            True,
+        ),
+        (
+            smtplib.SMTPRecipientsRefused(
+                {
+                    "a@example.com": (450, b"Mailbox busy"),
+                    "b@example.com": (550, b"No such user"),
+                }
+            ),
+            False,
+        ),
+        (ValueError("oops"), False),
+    ],
+)
+def test_is_temporary_failure(exc, expected):
+    assert is_temporary_failure(exc) is expected
+
+
+def test_backoff_delay(settings):
+    settings.MKN_YUBIN_RETRY_BACKOFF = 10
+    settings.MKN_YUBIN_RETRY_BACKOFF_MAX = 100
+
+    for attempt, delay in [(0, 10), (1, 10), (2, 20), (4, 80), (5, 100), (500, 100)]:
+        assert timedelta(seconds=delay / 2) <= backoff_delay(attempt)
+        assert backoff_delay(attempt) <= timedelta(seconds=delay)
+
+    settings.MKN_YUBIN_RETRY_BACKOFF = 0
+    assert backoff_delay(3) == timedelta(0)
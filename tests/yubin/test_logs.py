@@ -0,0 +1,101 @@
+import pytest
+from django_yubin import settings as yubin_settings
+from django_yubin.models import Log, Message
+
+from maykin_common.yubin.engine import send_all
+from maykin_common.yubin.logs import add_log, buffered_logs
+from maykin_common.yubin.utils import enqueue, retry_messages
+
+from .utils import create_message
+
+pytestmark = [
+    pytest.mark.django_db,
+]
+
+
+def test_add_log_without_buffer_creates_the_entry():
+    message = create_message()
+
+    add_log(message, "Log message")
+
+    log = Log.objects.get()
+    assert log.message == message
+    assert log.action == Message.STATUS_CREATED
+    assert log.log_message == "Log message"
+
+
+def test_buffered_logs_are_created_in_bulk(django_assert_max_num_queries):
+    messages = [create_message() for _ in range(5)]
+
+    # per message: an update, a refresh and a NOTIFY on PostgreSQL, and a single insert
+    # of the logs
+    with django_assert_max_num_queries(len(messages) * 3 + 1):
+        with buffered_logs() as logs:
+            for message in messages:
+                enqueue(message, "Queued")
+            assert len(logs) == 5
+
+    assert Log.objects.filter(
+        action=Message.STATUS_QUEUED, log_message="Queued"
+    ).count() == len(messages)
+
+
+def test_nested_buffered_logs_share_the_outer_buffer():
+    message = create_message()
+
+    with buffered_logs() as outer:
+        with buffered_logs() as inner:
+            add_log(message, "Log message")
+        assert inner is outer
+        assert Log.objects.count() == 0
+
+    assert Log.objects.count() == 1
+
+
+def test_buffered_logs_flush_when_full():
+    message = create_message()
+
+    with buffered_logs(max_size=2):
+        for _ in range(3):
+            add_log(message, "Log message")
+        assert Log.objects.count() == 2
+
+    assert Log.objects.count() == 3
+
+
+def test_buffered_logs_are_discarded_on_error():
+    message = create_message()
+
+    with pytest.raises(RuntimeError), buffered_logs():
+        add_log(message, "Log message")
+        raise RuntimeError
+
+    assert Log.objects.count() == 0
+    # the buffer is no longer active
+    add_log(message, "Log message")
+    assert Log.objects.count() == 1
+
+
+def test_send_all_creates_logs_before_its_transaction_ends(lock_file, monkeypatch):
+    monkeypatch.setattr(
+        yubin_settings, "USE_BACKEND", "django.core.mail.backends.locmem.EmailBackend"
+    )
+    message = create_message(status=Message.STATUS_QUEUED)
+
+    # an enclosing buffer doesn't postpone the logs until after the commit
+    with buffered_logs():
+        send_all()
+        assert list(
+            message.log_set.order_by("pk").values_list("action", flat=True)
+        ) == [
+            Message.STATUS_IN_PROCESS,
+            Message.STATUS_SENT,
+        ]
+
+
+def test_retry_messages_creates_logs_before_its_transaction_ends():
+    message = create_message(status=Message.STATUS_FAILED)
+
+    with buffered_logs():
+        retry_messages(max_retries=0)
+        assert message.log_set.filter(action=Message.STATUS_QUEUED).exists()
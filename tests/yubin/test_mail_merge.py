@@ -0,0 +1,76 @@
+from django import VERSION as DJANGO_VERSION
+
+import pytest
+from django_yubin.models import Log, Message
+
+from maykin_common.yubin.mail_merge import MailMerge, Recipient
+
+pytestmark = pytest.mark.skipif(
+    DJANGO_VERSION >= (6, 0),
+    reason="django-yubin appears broken on Django 6.0+, producing multiple "
+    "Content-Transfer-Encoding headers",
+)
+
+
+def test_render_per_recipient():
+    mail_merge = MailMerge(
+        subject="Hello\n{{ name }}",
+        body="Dear {{ name }}",
+        html_body="<p>Dear {{ name }}</p>",
+        from_email="sender@example.com",
+    )
+
+    email_message = mail_merge.render(
+        Recipient("john@example.com", {"name": "John & Jane"}, cc=["cc@example.com"])
+    )
+
+    assert email_message.subject == "HelloJohn & Jane"
+    assert email_message.body == "Dear John & Jane"
+    assert email_message.alternatives[0][0] == "<p>Dear John &amp; Jane</p>"
+    assert email_message.from_email == "sender@example.com"
+    assert email_message.to == ["john@example.com"]
+    assert email_message.cc == ["cc@example.com"]
+
+
+def test_attachments_are_shared():
+    mail_merge = MailMerge(
+        subject="Invoice",
+        body="Dear {{ name }}",
+        attachments=[("terms.pdf", b"%PDF-terms", None)],
+    )
+
+    first, second = mail_merge.messages(
+        [Recipient("john@example.com"), Recipient("jane@example.com")]
+    )
+
+    assert first.attachments[0] is second.attachments[0]
+    (attachment,) = first.message().get_payload()[1:]
+    assert attachment.get_content_type() == "application/pdf"
+    assert attachment.get_filename() == "terms.pdf"
+    assert attachment.get_payload(decode=True) == b"%PDF-terms"
+
+
+@pytest.mark.django_db
+def test_queue_in_bulk(django_assert_max_num_queries):
+    mail_merge = MailMerge(
+        subject="Invoice {{ number }}",
+        body="Invoice {{ number }}",
+        attachments=[("terms.txt", "Terms", "text/plain")],
+    )
+    recipients = (
+        Recipient(f"customer{number}@example.com", {"number": number})
+        for number in range(25)
+    )
+
+    # per batch: the bulk inserts of the messages and of their logs, in a savepoint,
+    # and a NOTIFY on PostgreSQL
+    with django_assert_max_num_queries(3 * 4 + 1):
+        queued = mail_merge.queue(recipients, batch_size=10)
+
+    assert queued == 25
+    assert Message.objects.filter(status=Message.STATUS_QUEUED).count() == 25
+    assert Log.objects.count() == 50
+    message = Message.objects.get(to_address="customer7@example.com")
+    email_message = message.get_email_message()
+    assert email_message.subject == "Invoice 7"
+    assert email_message.attachments[0].get_payload(decode=True) == b"Terms"
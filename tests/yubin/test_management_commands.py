@@ -6,12 +6,16 @@ from pathlib import Path
 
 from django import VERSION as DJANGO_VERSION
 from django.core.management import call_command
+from django.db import connection
 
 import pytest
 import time_machine
-from django_yubin.models import Message
+from django_yubin.models import Log, Message
 from filelock import FileLock
 
+from maykin_common.partitioning import get_monthly_partitions, partition_table_by_month
+from maykin_common.yubin.models import MessageDelivery
+
 from .utils import create_message
 
 pytestmark = [
@@ -95,6 +99,81 @@ def test_delete_old_output_days_param():
     assert Message.objects.count() == 1
 
 
+def test_delete_old_in_batches(monkeypatch):
+    with time_machine.travel("2026-02-04"):
+        old_messages = [create_message(status=Message.STATUS_SENT) for _ in range(5)]
+        for message in old_messages:
+            message.add_log("Message sent")
+    recent_message = create_message(status=Message.STATUS_SENT)
+    sleeps = []
+    monkeypatch.setattr("maykin_common.yubin.utils.time.sleep", sleeps.append)
+    out = StringIO()
+
+    with time_machine.travel("2026-06-01"):
+        call_command("delete_old_emails", "--batch-size=2", "--sleep=0.5", stdout=out)
+
+    output = out.getvalue()
+    assert "Deleted 2 emails so far..." in output
+    assert "Deleted 4 emails so far..." in output
+    assert "Deleted old emails: deleted=5, cutoff_date=2026-03-03" in output
+    # only in between the three batches
+    assert sleeps == [0.5, 0.5]
+    assert list(Message.objects.all()) == [recent_message]
+    assert not Log.objects.filter(message__in=old_messages).exists()
+
+
+def test_delete_old_dry_run():
+    with time_machine.travel("2026-02-04"):
+        create_message(status=Message.STATUS_SENT)
+    out = StringIO()
+
+    with time_machine.travel("2026-06-01"):
+        call_command("delete_old_emails", "--dry-run", stdout=out)
+
+    assert "Would delete old emails: count=1, cutoff_date=2026-03-03" in out.getvalue()
+    assert Message.objects.count() == 1
+
+
+@pytest.mark.skipif(
+    connection.vendor != "postgresql", reason="Partitioning requires PostgreSQL"
+)
+def test_delete_old_drops_partitions():
+    with time_machine.travel("2026-01-10"):
+        partition_table_by_month(connection, "django_yubin_message", "date_created")
+        partition_table_by_month(connection, "django_yubin_log", "date")
+    with time_machine.travel("2026-01-15"):
+        january = create_message(status=Message.STATUS_SENT)
+        january.add_log("Message sent")
+    with time_machine.travel("2026-02-04"):
+        february = create_message(status=Message.STATUS_QUEUED)
+        MessageDelivery.objects.create(message=february)
+    with time_machine.travel("2026-03-02"):
+        march = create_message(status=Message.STATUS_SENT)
+    with time_machine.travel("2026-03-05"):
+        # logged after the cutoff, so not in a dropped partition
+        february.add_log("Still queued")
+    recent = create_message(status=Message.STATUS_SENT)
+    recent.add_log("Message sent")
+    out = StringIO()
+
+    with time_machine.travel("2026-06-01"):
+        call_command("delete_old_emails", stdout=out)
+
+    assert "Deleted old emails: deleted=3, cutoff_date=2026-03-03" in out.getvalue()
+    assert list(Message.objects.all()) == [recent]
+    assert not Log.objects.filter(message_id__in=[january.pk, february.pk]).exists()
+    assert not MessageDelivery.objects.exists()
+    assert not Message.objects.filter(pk=march.pk).exists()
+    assert Log.objects.filter(message_id=recent.pk).exists()
+    partitions = [
+        partition.name
+        for partition in get_monthly_partitions(connection, "django_yubin_message")
+    ]
+    # the old partitions are gone, the upcoming ones are there
+    assert partitions[0] == "django_yubin_message_p202603"
+    assert partitions[-1] == "django_yubin_message_p202609"
+
+
 @pytest.mark.skipif(
     DJANGO_VERSION >= (6, 0),
     reason="django-yubin appears broken on Django 6.0+, producing multiple "
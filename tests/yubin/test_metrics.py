@@ -0,0 +1,148 @@
+from django import VERSION as DJANGO_VERSION
+from django.core.management import call_command
+from django.db import connection
+
+import pytest
+from django_yubin import settings as yubin_settings
+from django_yubin.models import Message
+from opentelemetry.sdk.metrics import MeterProvider
+from opentelemetry.sdk.metrics.export import InMemoryMetricReader
+from opentelemetry.sdk.trace import TracerProvider
+from opentelemetry.sdk.trace.export import SimpleSpanProcessor
+from opentelemetry.sdk.trace.export.in_memory_span_exporter import (
+    InMemorySpanExporter,
+)
+
+from maykin_common.yubin import engine as engine_module, metrics as metrics_module
+from maykin_common.yubin.engine import send_all
+from maykin_common.yubin.metrics import count_queue_depth
+
+from .utils import create_message
+
+pytestmark = [
+    pytest.mark.django_db,
+    pytest.mark.skipif(
+        DJANGO_VERSION >= (6, 0),
+        reason="django-yubin appears broken on Django 6.0+, producing multiple "
+        "Content-Transfer-Encoding headers",
+    ),
+]
+
+
+@pytest.fixture
+def metric_reader(monkeypatch):
+    reader = InMemoryMetricReader()
+    meter = MeterProvider(metric_readers=[reader]).get_meter("test")
+    monkeypatch.setattr(
+        metrics_module, "deliveries", meter.create_counter("yubin.deliveries")
+    )
+    monkeypatch.setattr(
+        metrics_module,
+        "delivery_latency",
+        meter.create_histogram("yubin.delivery.latency"),
+    )
+    return reader
+
+
+@pytest.fixture
+def span_exporter(monkeypatch):
+    exporter = InMemorySpanExporter()
+    provider = TracerProvider()
+    provider.add_span_processor(SimpleSpanProcessor(exporter))
+    monkeypatch.setattr(engine_module, "tracer", provider.get_tracer("test"))
+    return exporter
+
+
+def _data_points(reader: InMemoryMetricReader) -> dict[str, list]:
+    metrics_data = reader.get_metrics_data()
+    assert metrics_data is not None
+    return {
+        metric.name: list(metric.data.data_points)
+        for resource_metrics in metrics_data.resource_metrics
+        for scope_metrics in resource_metrics.scope_metrics
+        for metric in scope_metrics.metrics
+    }
+
+
+def test_count_queue_depth(django_assert_num_queries):
+    create_message(status=Message.STATUS_QUEUED)
+    create_message(status=Message.STATUS_QUEUED)
+    create_message(status=Message.STATUS_FAILED)
+    create_message(status=Message.STATUS_SENT)
+
+    with django_assert_num_queries(1):
+        observations = list(count_queue_depth(None))  # pyright: ignore[reportArgumentType]
+
+    assert all(
+        observation.attributes and observation.attributes["scope"] == "global"
+        for observation in observations
+    )
+    assert {
+        observation.attributes["status"]: observation.value  # pyright: ignore[reportOptionalSubscript]
+        for observation in observations
+    } == {"created": 0, "queued": 2, "in_process": 0, "failed": 1}
+
+
+@pytest.mark.django_db(transaction=True)
+def test_count_queue_depth_closes_connection():
+    count_queue_depth(None)  # pyright: ignore[reportArgumentType]
+
+    assert connection.connection is None
+
+
+@pytest.fixture
+def queue_depth_reader(monkeypatch):
+    reader = InMemoryMetricReader()
+    monkeypatch.setattr(
+        metrics_module,
+        "meter",
+        MeterProvider(metric_readers=[reader]).get_meter("test"),
+    )
+    metrics_module.register_queue_depth.cache_clear()
+    yield reader
+    metrics_module.register_queue_depth.cache_clear()
+
+
+def test_send_all_mail_reports_queue_depth(lock_file, queue_depth_reader):
+    create_message(status=Message.STATUS_FAILED)
+
+    call_command("send_all_mail")
+    call_command("send_all_mail")
+
+    # registered once
+    data_points = _data_points(queue_depth_reader)["yubin.queue.depth"]
+    assert {
+        data_point.attributes["status"]: data_point.value  # pyright: ignore[reportOptionalSubscript]
+        for data_point in data_points
+    } == {"created": 0, "queued": 0, "in_process": 0, "failed": 1}
+    assert len(data_points) == 4
+
+
+def test_send_all_records_metrics_and_span(
+    lock_file, monkeypatch, metric_reader, span_exporter
+):
+    monkeypatch.setattr(
+        yubin_settings, "USE_BACKEND", "django.core.mail.backends.locmem.EmailBackend"
+    )
+    for _ in range(3):
+        message = create_message()
+        message.mark_as(Message.STATUS_QUEUED)
+
+    send_all()
+
+    data_points = _data_points(metric_reader)
+    (deliveries,) = data_points["yubin.deliveries"]
+    assert deliveries.attributes == {"outcome": "sent"}
+    assert deliveries.value == 3
+    (latency,) = data_points["yubin.delivery.latency"]
+    assert latency.count == 3
+    assert latency.min >= 0
+
+    (span,) = span_exporter.get_finished_spans()
+    assert span.name == "yubin.send_all"
+    assert span.attributes == {
+        "yubin.claim_mode": "filelock",
+        "yubin.engine": "threads",
+        "yubin.threads": 1,
+        "yubin.processed": 3,
+    }
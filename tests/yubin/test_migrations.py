@@ -0,0 +1,25 @@
+from django.db import connection
+
+import pytest
+from django_test_migrations.migrator import Migrator
+
+
+def _indexes() -> set[str]:
+    with connection.cursor() as cursor:
+        constraints = connection.introspection.get_constraints(
+            cursor, "django_yubin_message"
+        )
+    return {name for name, constraint in constraints.items() if constraint["index"]}
+
+
+@pytest.mark.django_db
+def test_queue_index_migration(migrator: Migrator):
+    migrator.apply_initial_migration(("yubin", "0002_messagedelivery_next_attempt_at"))
+    assert "maykin_yubin_message_queue" not in _indexes()
+
+    # on PostgreSQL, CREATE INDEX CONCURRENTLY fails inside a transaction
+    migrator.apply_tested_migration(("yubin", "0003_message_queue_index"))
+    assert "maykin_yubin_message_queue" in _indexes()
+
+    migrator.apply_initial_migration(("yubin", "0002_messagedelivery_next_attempt_at"))
+    assert "maykin_yubin_message_queue" not in _indexes()
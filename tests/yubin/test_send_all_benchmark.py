@@ -0,0 +1,105 @@
+"""
+Measure the end-to-end throughput of the email queue.
+
+Run with ``pytest -m benchmark -s tests/yubin/test_send_all_benchmark.py``. Messages are
+queued with the ``QueuedEmailBackend`` and delivered by ``send_all`` to a local SMTP
+server (:class:`tests.yubin.smtp.SMTPSink`), with injected latency and failures. Both
+phases report the messages per second, the database queries per message and the peak
+memory.
+
+The number of messages can be tuned with the ``BENCHMARK_MESSAGES`` environment
+variable, a comma separated list of message counts.
+"""
+
+import os
+from dataclasses import dataclass
+
+from django.core import mail
+
+import pytest
+from django_yubin import settings as yubin_settings
+from django_yubin.models import Message
+
+from maykin_common.yubin.engine import send_all
+
+from ..benchmark import measure_throughput
+from .smtp import SMTPSink
+
+pytestmark = pytest.mark.benchmark
+
+MESSAGE_COUNTS = [
+    int(count)
+    for count in os.environ.get("BENCHMARK_MESSAGES", "1000,10000").split(",")
+]
+
+
+@dataclass
+class Scenario:
+    label: str
+    threads: int = 1
+    claim_mode: str = "filelock"
+    engine: str = "threads"
+    latency: float = 0
+    temporary_failure_rate: float = 0
+    permanent_failure_rate: float = 0
+
+
+SCENARIOS = [
+    Scenario("local"),
+    Scenario("local, 8 threads", threads=8),
+    Scenario("local, database claims, 8 threads", threads=8, claim_mode="database"),
+    Scenario("5ms latency, 8 threads", threads=8, latency=0.005),
+    Scenario("asyncio", engine="asyncio"),
+    Scenario("5ms latency, asyncio", engine="asyncio", latency=0.005),
+    Scenario(
+        "5% deferred, 1% failed",
+        temporary_failure_rate=0.05,
+        permanent_failure_rate=0.01,
+    ),
+]
+
+
+def _email_messages(count: int):
+    for index in range(count):
+        yield mail.EmailMessage(
+            f"Message {index}",
+            "Lorem ipsum dolor sit amet, consectetur adipiscing elit. " * 20,
+            "sender@example.com",
+            [f"recipient{index}@example.com"],
+        )
+
+
+@pytest.mark.django_db(transaction=True)
+@pytest.mark.parametrize("scenario", SCENARIOS, ids=lambda scenario: scenario.label)
+@pytest.mark.parametrize("count", MESSAGE_COUNTS)
+def test_send_all_throughput(settings, monkeypatch, lock_file, scenario, count):
+    settings.MKN_YUBIN_CLAIM_MODE = scenario.claim_mode
+    settings.MKN_YUBIN_ENGINE = scenario.engine
+    monkeypatch.setattr(
+        yubin_settings, "USE_BACKEND", "django.core.mail.backends.smtp.EmailBackend"
+    )
+    sink = SMTPSink(
+        latency=scenario.latency,
+        temporary_failure_rate=scenario.temporary_failure_rate,
+        permanent_failure_rate=scenario.permanent_failure_rate,
+    )
+
+    with sink:
+        settings.EMAIL_HOST = "127.0.0.1"
+        settings.EMAIL_PORT = sink.port
+        queued = measure_throughput(
+            f"queue: {scenario.label}",
+            lambda: mail.get_connection().send_messages(_email_messages(count)),
+            items=count,
+        )
+        sent = measure_throughput(
+            f"send_all: {scenario.label}",
+            lambda: send_all(threads=scenario.threads),
+            items=count,
+        )
+
+    print()
+    print(queued.format())
+    print(sent.format())
+    assert sink.received == count
+    assert Message.objects.filter(status=Message.STATUS_SENT).count() == sink.accepted
@@ -0,0 +1,220 @@
+import email
+import os
+from datetime import datetime, timedelta
+from io import StringIO
+
+from django import VERSION as DJANGO_VERSION
+from django.core import mail
+from django.core.checks import Error
+from django.core.files.storage import InMemoryStorage, storages
+from django.core.management import call_command
+
+import pytest
+import time_machine
+from django_yubin import settings as yubin_settings
+from django_yubin.models import Message
+
+from maykin_common.yubin.checks import check_payload_compression
+from maykin_common.yubin.engine import send_all
+from maykin_common.yubin.storage_backends import (
+    OFFLOADING_STORAGE_BACKEND,
+    CompressedDatabaseStorageBackend,
+    offload_payloads,
+    prune_offloaded_payloads,
+    restore_payloads,
+)
+from maykin_common.yubin.utils import queue_email_message
+
+from .utils import create_message
+
+pytestmark = [
+    pytest.mark.django_db,
+    pytest.mark.skipif(
+        DJANGO_VERSION >= (6, 0),
+        reason="django-yubin appears broken on Django 6.0+, producing multiple "
+        "Content-Transfer-Encoding headers",
+    ),
+]
+
+COMPRESSED_STORAGE_BACKEND = (
+    "maykin_common.yubin.storage_backends.CompressedDatabaseStorageBackend"
+)
+
+# random bytes don't compress, like most attachments
+ATTACHMENT = bytes(range(256)) * 400
+
+
+@pytest.fixture
+def payload_storage(settings):
+    settings.STORAGES = {
+        **settings.STORAGES,
+        "yubin_payloads": {"BACKEND": "django.core.files.storage.InMemoryStorage"},
+    }
+    settings.MKN_YUBIN_PAYLOAD_STORAGE = "yubin_payloads"
+    return storages["yubin_payloads"]
+
+
+class OverwritingInMemoryStorage(InMemoryStorage):
+    """
+    Overwrite existing files on save, like most cloud storages do.
+    """
+
+    def get_available_name(self, name, max_length=None):
+        self.delete(name)
+        return name
+
+
+def _email_message(to: str, attachment: bytes = ATTACHMENT) -> mail.EmailMessage:
+    email_message = mail.EmailMessage(
+        "Invoice", "Dear customer, " * 100, "sender@example.com", [to]
+    )
+    email_message.attach("invoice.pdf", attachment, "application/pdf")
+    return email_message
+
+
+def test_compressed_storage_backend():
+    data = _email_message("test@example.com").message().as_string()
+
+    message = Message(storage=COMPRESSED_STORAGE_BACKEND, message_data=data)
+
+    assert message._message_data.startswith("maykin-common:zlib:")
+    assert len(message._message_data) < len(data)
+    assert message.message_data == data
+
+
+def test_compressed_storage_backend_reads_uncompressed_data():
+    message = create_message()
+    data = message.message_data
+
+    message.storage = COMPRESSED_STORAGE_BACKEND
+
+    assert CompressedDatabaseStorageBackend.get_message_data(message) == data
+
+
+def test_check_payload_compression(settings):
+    assert check_payload_compression(None) == []
+
+    settings.MKN_YUBIN_PAYLOAD_COMPRESSION = "zstd"
+
+    assert check_payload_compression(None) == [
+        Error(
+            "Unknown compression algorithm 'zstd' in MKN_YUBIN_PAYLOAD_COMPRESSION.",
+            hint="Use one of: zlib.",
+            id="maykin.E001",
+        )
+    ]
+
+
+def test_offloading_storage_backend_shares_payloads(settings, payload_storage):
+    settings.MKN_YUBIN_PAYLOAD_OFFLOAD_THRESHOLD = 4096
+    originals = {
+        to: _email_message(to).message().as_string()
+        for to in ("first@example.com", "second@example.com")
+    }
+    for to, data in originals.items():
+        Message.objects.create(
+            to_address=to, storage=OFFLOADING_STORAGE_BACKEND, message_data=data
+        )
+
+    first, second = Message.objects.order_by("pk")
+    # the body stays inline, the attachment is stored once
+    assert len(first._message_data) < 4096
+    assert "Dear customer" in first._message_data
+    [subdirectory], _ = payload_storage.listdir("yubin/payloads")
+    _, payloads = payload_storage.listdir(f"yubin/payloads/{subdirectory}")
+    assert len(payloads) == 1
+    assert first.message_data == originals["first@example.com"]
+    assert second.message_data == originals["second@example.com"]
+
+
+@pytest.mark.usefixtures("lock_file")
+def test_send_all_with_offloaded_payloads(settings, monkeypatch, payload_storage):
+    settings.MKN_YUBIN_PAYLOAD_OFFLOAD_THRESHOLD = 4096
+    monkeypatch.setattr(
+        yubin_settings, "MAILER_STORAGE_BACKEND", OFFLOADING_STORAGE_BACKEND
+    )
+    monkeypatch.setattr(
+        yubin_settings, "USE_BACKEND", "django.core.mail.backends.locmem.EmailBackend"
+    )
+    queue_email_message(_email_message("test@example.com"))
+
+    send_all()
+
+    (sent,) = mail.outbox
+    assert sent.attachments[0].get_payload(decode=True) == ATTACHMENT
+
+
+def test_prune_offloaded_payloads(settings, monkeypatch, payload_storage):
+    settings.MKN_YUBIN_PAYLOAD_OFFLOAD_THRESHOLD = 4096
+    monkeypatch.setattr(
+        yubin_settings, "MAILER_STORAGE_BACKEND", OFFLOADING_STORAGE_BACKEND
+    )
+    with time_machine.travel("2026-01-10"):
+        queue_email_message(_email_message("old@example.com", b"old" * 2000))
+    with time_machine.travel("2026-06-01"):
+        queue_email_message(_email_message("recent@example.com"))
+    # saved just now, possibly for a message that isn't committed yet
+    with time_machine.travel("2026-06-01"):
+        queue_email_message(_email_message("new@example.com", b"new" * 2000))
+        Message.objects.filter(to_address="new@example.com").delete()
+    out = StringIO()
+
+    with time_machine.travel("2026-06-01 12:00"):
+        call_command("delete_old_emails", stdout=out)
+
+    assert "Pruned offloaded payloads: pruned=1" in out.getvalue()
+    recent = Message.objects.get()
+    with time_machine.travel("2026-06-03"):
+        assert prune_offloaded_payloads(grace_period=timedelta(days=1)) == 1
+    (attachment,) = recent.get_email_message().attachments
+    assert attachment.get_payload(decode=True) == ATTACHMENT
+
+
+@pytest.mark.parametrize(
+    "backend,options",
+    [
+        ("django.core.files.storage.FileSystemStorage", {}),
+        (f"{__name__}.OverwritingInMemoryStorage", {}),
+        # saves a copy under another name
+        ("django.core.files.storage.InMemoryStorage", {}),
+    ],
+)
+def test_reused_payload_survives_prune(
+    settings, monkeypatch, tmp_path, backend, options
+):
+    if backend.endswith("FileSystemStorage"):
+        options = {"location": str(tmp_path)}
+    settings.STORAGES = {
+        **settings.STORAGES,
+        "yubin_payloads": {"BACKEND": backend, "OPTIONS": options},
+    }
+    settings.MKN_YUBIN_PAYLOAD_STORAGE = "yubin_payloads"
+    settings.MKN_YUBIN_PAYLOAD_OFFLOAD_THRESHOLD = 4096
+    monkeypatch.setattr(
+        yubin_settings, "MAILER_STORAGE_BACKEND", OFFLOADING_STORAGE_BACKEND
+    )
+    storage = storages["yubin_payloads"]
+    with time_machine.travel("2026-01-10"):
+        queue_email_message(_email_message("old@example.com"))
+    if backend.endswith("FileSystemStorage"):
+        # the file system does not travel in time
+        old = datetime.fromisoformat("2026-01-10T00:00:00+00:00").timestamp()
+        for root, _, files in os.walk(tmp_path):
+            for file in files:
+                os.utime(os.path.join(root, file), (old, old))
+    Message.objects.all().delete()
+
+    with time_machine.travel("2026-06-01"):
+        # a new message, not committed yet, shares the old attachment
+        data = offload_payloads(
+            _email_message("new@example.com").message().as_string(),
+            threshold=4096,
+            storage=storage,
+        )
+        prune_offloaded_payloads(grace_period=timedelta(days=1))
+
+    restored = email.message_from_string(restore_payloads(data, storage))
+    (attachment,) = [
+        part for part in restored.walk() if part.get_filename() == "invoice.pdf"
+    ]
+    assert attachment.get_payload(decode=True) == ATTACHMENT
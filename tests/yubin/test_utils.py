@@ -1,11 +1,14 @@
+from datetime import timedelta
 from unittest.mock import patch
 
 from django.core.mail import EmailMessage
+from django.utils import timezone
 
 import pytest
 from django_yubin.models import Log, Message
 
-from maykin_common.yubin.utils import enqueue, queue_email_message
+from maykin_common.yubin.models import MessageDelivery
+from maykin_common.yubin.utils import enqueue, queue_email_message, retry_messages
 
 from .utils import create_message
 
@@ -110,3 +113,61 @@ def test_queue_email_message_uses_test_mailer_emails_in_test_mode():
 
     settings.MAILER_TEST_MODE = original_mailer_test_Mode
     settings.MAILER_TEST_EMAIL = original_mailer_test_email
+
+
+def test_retry_messages_queues_retryable_messages_in_bulk(
+    django_assert_max_num_queries,
+):
+    failed = [create_message(status=Message.STATUS_FAILED) for _ in range(5)]
+    blacklisted = create_message(status=Message.STATUS_BLACKLISTED)
+    sent = create_message(status=Message.STATUS_SENT)
+    in_process = create_message(status=Message.STATUS_IN_PROCESS)
+
+    # two batches (savepoint + select + update + schedule + logs + release) and an
+    # empty one
+    with django_assert_max_num_queries(16):
+        result = retry_messages(max_retries=0, batch_size=4)
+
+    assert result == (6, 0)
+    for message in [*failed, blacklisted]:
+        message.refresh_from_db()
+        assert message.status == Message.STATUS_QUEUED
+        assert message.enqueued_count == 1
+        assert message.date_enqueued is not None
+        log = Log.objects.get(message=message)
+        assert log.action == Message.STATUS_QUEUED
+        assert log.log_message == "Retry sending the email."
+    sent.refresh_from_db()
+    assert sent.status == Message.STATUS_SENT
+    in_process.refresh_from_db()
+    assert in_process.status == Message.STATUS_IN_PROCESS
+
+
+def test_retry_messages_backs_off(settings):
+    settings.MKN_YUBIN_RETRY_BACKOFF = 60
+    settings.MKN_YUBIN_RETRY_BACKOFF_MAX = 100
+    first = create_message(status=Message.STATUS_FAILED)
+    second = create_message(status=Message.STATUS_FAILED)
+    Message.objects.filter(pk=second.pk).update(enqueued_count=3)
+    before = timezone.now()
+
+    retry_messages(max_retries=5)
+
+    first_delay = MessageDelivery.objects.get(message=first).next_attempt_at - before
+    assert timedelta(seconds=30) <= first_delay <= timedelta(seconds=61)
+    # 240 seconds, capped
+    second_delay = MessageDelivery.objects.get(message=second).next_attempt_at - before
+    assert timedelta(seconds=50) <= second_delay <= timedelta(seconds=101)
+
+
+def test_retry_messages_respects_max_retries():
+    message = create_message(status=Message.STATUS_FAILED)
+    Message.objects.filter(pk=message.pk).update(enqueued_count=3)
+    retried = create_message(status=Message.STATUS_FAILED)
+
+    assert retry_messages(max_retries=3) == (1, 0)
+
+    message.refresh_from_db()
+    assert message.status == Message.STATUS_FAILED
+    retried.refresh_from_db()
+    assert retried.status == Message.STATUS_QUEUED